@@ -1,8 +1,15 @@
+import ctypes
+import os
+import tempfile
+import threading
+import time
 import unittest
-from kfifo import KFifoAps
+
+import log
+from kfifo import KFifoAps, OverflowPolicy
 # 1. 初始化测试（test_initialization）
-# 默认初始化：验证创建 KFifoAps 实例时，默认容量（32*256）、初始长度（0）和缓冲区（全0初始化）是否正确。
-# 自定义初始化：验证通过参数指定容量（如100）时，容量、初始长度和缓冲区是否符合预期。
+# 默认初始化：验证创建 KFifoAps 实例时，默认容量（FIFO_QUEUE_LEN）、初始长度（0）和缓冲区（全0初始化）是否正确。
+# 自定义初始化：验证通过参数指定容量（如100）时，容量向上取整为2的幂（128），初始长度和缓冲区是否符合预期。
 # 2. 容量与剩余空间测试（test_get_remaining_length）
 # 验证初始状态下剩余空间等于总容量。
 # 验证添加数据后，剩余空间 = 总容量 - 已添加数据长度。
@@ -31,28 +38,54 @@ from kfifo import KFifoAps
 # 指定索引读取：验证从指定索引（如索引2）读取指定长度（如3个元素）的子数据是否正确。
 # 越界索引/非法长度：验证索引越界（如负数索引、超出数据长度）或传入负数长度时返回空列表。
 # 9. 字符串表示测试（test_str）
-# 验证FIFO的字符串表示（str(fifo)）包含正确的容量、长度和数据内容（如 KFifoAps(size=8192, length=3, data=[1, 2, 3])）。
+# 验证FIFO的字符串表示（str(fifo)）包含正确的容量、长度和数据内容（如 KFifoAps(size=16384, length=3, data=[1, 2, 3])）。
+# 10. 回绕测试（test_wraparound）
+# 验证读写位置跨越缓冲区末尾时，put/get/read/read_index 的数据仍然连续正确。
+# 11. 输入类型测试（test_put_buffer_types）
+# 验证 bytes/bytearray/memoryview 可直接写入，非法列表元素和不支持的类型返回0。
+# 12. 零拷贝接口测试（test_peek_views / test_readinto_commit）
+# 验证 peek_views 在回绕时返回两段 memoryview；readinto 可直接填充 bytearray/ctypes 数组且不移动读指针；commit 消费数据。
+# 13. 查找测试（test_find / test_discard_until）
+# 验证单字节与多字节模式的查找（含起始索引、跨回绕边界匹配），以及丢弃到帧头、未找到时保留可能不完整的模式尾部。
+# 14. 同步模式测试（TestKFifoApsSync）
+# 验证 get(n, timeout) 被生产者写入唤醒、超时返回空列表；wait_for(min_len) 的满足/超时；wakeup() 打断等待。
+# 15. 溢出策略测试（TestKFifoApsOverflow）
+# 验证 TRUNCATE/REJECT/DROP_OLDEST/BLOCK/GROW 各策略下写入结果与队列内容，以及 stats() 统计的写入/丢弃字节数、最高水位和溢出次数。
+
+QUEUE_LEN = KFifoAps.FIFO_QUEUE_LEN
+
 
 class TestKFifoAps(unittest.TestCase):
     def setUp(self):
+        # 日志写到临时目录（写入不支持的类型时记录日志），不在工作目录留下log.txt
+        self.log_tmp = tempfile.TemporaryDirectory()
+        self.saved_log = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS))
+        for cmd, path in log._CMD_FILE_PATHS.items():
+            log._CMD_FILE_PATHS[cmd] = os.path.join(self.log_tmp.name, os.path.basename(path))
+        log.LOG_FILE_PATH = log._CMD_FILE_PATHS[log.LOG_OPT_CMD]
         self.fifo = KFifoAps()
 
+    def tearDown(self):
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS = self.saved_log
+        self.log_tmp.cleanup()
+
     def test_initialization(self):
         # 测试默认初始化
-        self.assertEqual(self.fifo.size, 32 * 256)
+        self.assertEqual(self.fifo.size, QUEUE_LEN)
         self.assertEqual(self.fifo.length, 0)
-        self.assertEqual(self.fifo.buffer, [0] * (32 * 256))
+        self.assertEqual(self.fifo.buffer, bytearray(QUEUE_LEN))
 
-        # 测试自定义大小初始化
+        # 测试自定义大小初始化（向上取整为2的幂）
         custom_fifo = KFifoAps(100)
-        self.assertEqual(custom_fifo.size, 100)
+        self.assertEqual(custom_fifo.size, 128)
         self.assertEqual(custom_fifo.length, 0)
-        self.assertEqual(custom_fifo.buffer, [0] * 100)
+        self.assertEqual(custom_fifo.buffer, bytearray(128))
 
     def test_get_remaining_length(self):
-        self.assertEqual(self.fifo.get_remaining_length(), 32 * 256)
+        self.assertEqual(self.fifo.get_remaining_length(), QUEUE_LEN)
         self.fifo.put([1, 2, 3])
-        self.assertEqual(self.fifo.get_remaining_length(), 32 * 256 - 3)
+        self.assertEqual(self.fifo.get_remaining_length(), QUEUE_LEN - 3)
 
     def test_put(self):
         # 测试正常添加
@@ -63,15 +96,16 @@ class TestKFifoAps(unittest.TestCase):
         self.assertEqual(self.fifo.put([]), 0)
 
         # 测试超过容量
-        large_data = [0] * (32 * 256 + 1)
-        self.assertEqual(self.fifo.put(large_data), 32 * 256 - 3)
-        self.assertEqual(self.fifo.length, 32 * 256)
+        large_data = [0] * (QUEUE_LEN + 1)
+        self.assertEqual(self.fifo.put(large_data), QUEUE_LEN - 3)
+        self.assertEqual(self.fifo.length, QUEUE_LEN)
 
         # 测试刚好填满
-        full_fifo = KFifoAps(10)
-        self.assertEqual(full_fifo.put([1, 2, 3, 4, 5, 6, 7, 8, 9, 10]), 10)
-        # 修正：FIFO已满时添加元素返回实际添加数量（此处假设允许覆盖，返回1）
-        self.assertEqual(full_fifo.put([11]), 1)  # 原错误：预期0，实际返回1
+        full_fifo = KFifoAps(16)
+        self.assertEqual(full_fifo.put(list(range(1, 17))), 16)
+        # FIFO已满时不覆盖旧数据，返回0
+        self.assertEqual(full_fifo.put([17]), 0)
+        self.assertEqual(full_fifo.read(16), list(range(1, 17)))
 
     def test_get(self):
         self.fifo.put([1, 2, 3, 4, 5])
@@ -96,7 +130,7 @@ class TestKFifoAps(unittest.TestCase):
         # 测试正常释放
         self.fifo.free(2)
         self.assertEqual(self.fifo.length, 3)
-        self.assertEqual(self.fifo.buffer[:3], [3, 4, 5])
+        self.assertEqual(self.fifo.read(3), [3, 4, 5])
 
         # 测试释放全部
         self.fifo.free(10)
@@ -147,9 +181,231 @@ class TestKFifoAps(unittest.TestCase):
 
     def test_str(self):
         self.fifo.put([1, 2, 3])
-        expected_str = f"KFifoAps(size={32 * 256}, length=3, data=[1, 2, 3])"
+        expected_str = f"KFifoAps(size={QUEUE_LEN}, length=3, data=[1, 2, 3])"
         self.assertEqual(str(self.fifo), expected_str)
 
+    def test_wraparound(self):
+        fifo = KFifoAps(8)
+        fifo.put([1, 2, 3, 4, 5, 6])
+        self.assertEqual(fifo.get(5), [1, 2, 3, 4, 5])
+
+        # 写入位置跨越缓冲区末尾
+        self.assertEqual(fifo.put(bytes([7, 8, 9, 10, 11, 12, 13])), 7)
+        self.assertEqual(fifo.length, 8)
+        self.assertEqual(fifo.put([14]), 0)
+        self.assertEqual(fifo.read_index(1, 4), [7, 8, 9, 10])
+        self.assertEqual(fifo.read(8), [6, 7, 8, 9, 10, 11, 12, 13])
+        self.assertEqual(fifo.get(3), [6, 7, 8])
+        self.assertEqual(fifo.get(10), [9, 10, 11, 12, 13])
+        self.assertEqual(fifo.length, 0)
+
+    def test_put_buffer_types(self):
+        self.assertEqual(self.fifo.put(b'\x01\x02'), 2)
+        self.assertEqual(self.fifo.put(bytearray(b'\x03')), 1)
+        self.assertEqual(self.fifo.put(memoryview(b'\x00\x04\x05')[1:]), 2)
+        self.assertEqual(self.fifo.get(10), [1, 2, 3, 4, 5])
+
+        # 非法列表元素与不支持的类型
+        self.assertEqual(self.fifo.put([1, 256]), 0)
+        self.assertEqual(self.fifo.put([1, 'a']), 0)
+        self.assertEqual(self.fifo.put("abc"), 0)
+        self.assertEqual(self.fifo.length, 0)
+
+    def test_peek_views(self):
+        fifo = KFifoAps(8)
+        self.assertEqual(fifo.peek_views(), [])
+
+        fifo.put([1, 2, 3, 4, 5, 6])
+        fifo.commit(5)
+        fifo.put([7, 8, 9, 10])
+        views = fifo.peek_views()
+        self.assertEqual(len(views), 2)
+        self.assertEqual([bytes(v) for v in views], [bytes([6, 7, 8]), bytes([9, 10])])
+        self.assertEqual([bytes(v) for v in fifo.peek_views(2)], [bytes([6, 7])])
+        self.assertEqual(fifo.length, 5)
+
+    def test_readinto_commit(self):
+        fifo = KFifoAps(8)
+        fifo.put([1, 2, 3, 4, 5, 6])
+        fifo.commit(4)
+        fifo.put([7, 8, 9, 10, 11])
+
+        buf = bytearray(4)
+        self.assertEqual(fifo.readinto(buf), 4)
+        self.assertEqual(buf, bytearray([5, 6, 7, 8]))
+        self.assertEqual(fifo.length, 7)
+
+        # 直接填充ctypes数组，可指定起始索引
+        arr = (ctypes.c_uint8 * 16)()
+        self.assertEqual(fifo.readinto(arr, index=2), 5)
+        self.assertEqual(list(arr[:5]), [7, 8, 9, 10, 11])
+        self.assertEqual(fifo.readinto(arr, index=7), 0)
+
+        self.assertEqual(fifo.commit(3), 3)
+        self.assertEqual(fifo.read(10), [8, 9, 10, 11])
+        self.assertEqual(fifo.commit(10), 4)
+        self.assertEqual(fifo.length, 0)
+
+    def test_find(self):
+        fifo = KFifoAps(8)
+        fifo.put([0xFE, 0xFE, 0x68, 0x01, 0x16, 0x00])
+        self.assertEqual(fifo.find(0x68), 2)
+        self.assertEqual(fifo.find(b'\x01\x16'), 3)
+        self.assertEqual(fifo.find(0xFE, start=1), 1)
+        self.assertEqual(fifo.find(0xFE, start=2), -1)
+        self.assertEqual(fifo.find(0x77), -1)
+        self.assertEqual(fifo.find(0x68, start=-1), -1)
+
+        # 数据回绕：[... 0x68 | 0x10 0x16 ...]，模式跨越缓冲区末尾
+        fifo.commit(6)
+        fifo.put([0, 0, 0, 0, 0, 0, 0x68])
+        fifo.commit(6)
+        fifo.put([0x10, 0x16, 0x68])
+        self.assertEqual(fifo.find(b'\x68\x10\x16'), 0)
+        self.assertEqual(fifo.find(b'\x16\x68'), 2)
+        self.assertEqual(fifo.find(0x68, start=1), 3)
+
+    def test_discard_until(self):
+        fifo = KFifoAps(16)
+        fifo.put([0xFE, 0xFE, 0xFE, 0x68, 0x0F])
+        self.assertEqual(fifo.discard_until(0x68), 3)
+        self.assertEqual(fifo.read(2), [0x68, 0x0F])
+        self.assertEqual(fifo.discard_until(0x68), 0)
+
+        # 未找到时保留末尾可能不完整的模式
+        fifo.commit(2)
+        fifo.put([1, 2, 3, 0x68])
+        self.assertEqual(fifo.discard_until(b'\x68\x16'), 3)
+        self.assertEqual(fifo.read(4), [0x68])
+        self.assertEqual(fifo.discard_until(0x16), 1)
+        self.assertEqual(fifo.length, 0)
+
+
+class TestKFifoApsSync(unittest.TestCase):
+    def setUp(self):
+        self.fifo = KFifoAps(64, sync=True)
+
+    def _put_later(self, data, delay=0.05):
+        timer = threading.Timer(delay, self.fifo.put, args=(data,))
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def test_get_timeout(self):
+        # 无数据时等待超时返回空列表
+        start = time.monotonic()
+        self.assertEqual(self.fifo.get(4, timeout=0.05), [])
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+        # 默认不等待，与非同步模式行为一致
+        self.assertEqual(self.fifo.get(4), [])
+
+    def test_get_wakes_on_put(self):
+        self._put_later([1, 2, 3])
+        self.assertEqual(self.fifo.get(4, timeout=2), [1, 2, 3])
+
+    def test_wait_for(self):
+        self.fifo.put([1])
+        self.assertTrue(self.fifo.wait_for(1, timeout=0))
+        self.assertFalse(self.fifo.wait_for(3, timeout=0.02))
+
+        self._put_later([2, 3])
+        self.assertTrue(self.fifo.wait_for(3, timeout=2))
+        self.assertEqual(self.fifo.get_data_length(), 3)
+
+    def test_wakeup(self):
+        timer = threading.Timer(0.05, self.fifo.wakeup)
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertFalse(self.fifo.wait_for(1))
+
+    def test_producer_consumer(self):
+        payload = bytes(range(256)) * 40
+        received = bytearray()
+
+        def producer():
+            for i in range(0, len(payload), 7):
+                chunk = payload[i:i + 7]
+                while chunk:
+                    chunk = chunk[self.fifo.put(chunk):]
+
+        thread = threading.Thread(target=producer)
+        thread.start()
+        while len(received) < len(payload):
+            received += bytes(self.fifo.get(32, timeout=2))
+        thread.join()
+        self.assertEqual(bytes(received), payload)
+
+
+class TestKFifoApsOverflow(unittest.TestCase):
+    def test_truncate(self):
+        fifo = KFifoAps(8)
+        self.assertEqual(fifo.put(bytes(range(6))), 6)
+        self.assertEqual(fifo.put(bytes(range(6, 12))), 2)
+        stats = fifo.stats()
+        self.assertEqual(stats['accepted'], 8)
+        self.assertEqual(stats['dropped'], 4)
+        self.assertEqual(stats['high_water'], 8)
+        self.assertEqual(stats['overflow_events'], 1)
+        self.assertEqual(stats['policy'], 'TRUNCATE')
+
+    def test_reject(self):
+        fifo = KFifoAps(8, policy=OverflowPolicy.REJECT)
+        fifo.put(bytes(range(6)))
+        self.assertEqual(fifo.put(bytes(3)), 0)
+        self.assertEqual(fifo.put(bytes(2)), 2)
+        self.assertEqual(fifo.stats()['dropped'], 3)
+
+    def test_drop_oldest(self):
+        fifo = KFifoAps(8, policy=OverflowPolicy.DROP_OLDEST)
+        fifo.put(bytes(range(6)))
+        self.assertEqual(fifo.put(bytes(range(6, 10))), 4)
+        self.assertEqual(fifo.read(8), list(range(2, 10)))
+
+        # 单次写入超过容量时只保留最后8字节
+        self.assertEqual(fifo.put(bytes(range(10, 20))), 8)
+        self.assertEqual(fifo.read(8), list(range(12, 20)))
+        stats = fifo.stats()
+        self.assertEqual(stats['dropped'], 2 + 10)
+        self.assertEqual(stats['overflow_events'], 2)
+
+    def test_grow(self):
+        fifo = KFifoAps(8, policy=OverflowPolicy.GROW, max_size=32)
+        fifo.put(bytes(range(6)))
+        fifo.commit(4)
+        self.assertEqual(fifo.put(bytes(range(6, 16))), 10)
+        self.assertEqual(fifo.size, 16)
+        self.assertEqual(fifo.read(16), list(range(4, 16)))
+
+        # 超过max_size后截断
+        self.assertEqual(fifo.put(bytes(30)), 20)
+        self.assertEqual(fifo.size, 32)
+        self.assertEqual(fifo.stats()['dropped'], 10)
+
+    def test_block(self):
+        with self.assertRaises(ValueError):
+            KFifoAps(8, policy=OverflowPolicy.BLOCK)
+
+        fifo = KFifoAps(8, sync=True, policy=OverflowPolicy.BLOCK, put_timeout=2)
+        fifo.put(bytes(range(8)))
+        timer = threading.Timer(0.05, fifo.get, args=(4,))
+        timer.start()
+        self.addCleanup(timer.join)
+        self.assertEqual(fifo.put(bytes(range(8, 12))), 4)
+        self.assertEqual(fifo.read(8), list(range(4, 12)))
+
+        # 超时后丢弃剩余部分
+        fifo.put_timeout = 0.02
+        self.assertEqual(fifo.put(bytes(3)), 0)
+        self.assertEqual(fifo.stats()['dropped'], 3)
+
+    def test_reset_stats(self):
+        fifo = KFifoAps(8)
+        fifo.put(bytes(10))
+        fifo.commit(3)
+        fifo.reset_stats()
+        self.assertEqual(fifo.stats(), {'accepted': 0, 'dropped': 0, 'high_water': 5, 'overflow_events': 0,
+                                        'size': 8, 'length': 5, 'policy': 'TRUNCATE'})
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+gw13762_parse / gw13762_check 帧率测试：调试跟踪关闭/只跟踪错误/跟踪全部时每秒校验的帧数
+
+运行方式（在工程根目录）：python Test/gw13762_bench.py [帧数]
+gw13762_parse直接解析bytes；gw13762_check为兼容接口，解析后还要把结果填入SApsAffair的ctypes结构。
+跟踪信息写入临时目录下的debug.txt（不回显到控制台），TRACE_DEBUG的帧率包含入队开销，不含写文件（由日志线程完成）。
+构帧测试：升级帧（AFN=15H F1）数据域64/512/2048字节时，gw13762_build_frame与FrameTemplate13762.build每秒构帧数。
+批量测试：一块数据中连续存放的帧（帧间夹无效数据），gw13762_batch_check与FrameDecoder + gw13762_parse逐帧处理对比（需要NumPy）。
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import log
+from comport.parse_process import load_frame_bytes
+from comport.parse_process import FrameDecoder
+from protocol import gw13762_batch
+from protocol.gw13762 import (SApsAffair, create_default_frame, create_default_template, gw13762_check,
+                              gw13762_parse)
+
+LEVELS = (("TRACE_OFF", log.TRACE_OFF), ("TRACE_ERROR", log.TRACE_ERROR), ("TRACE_DEBUG", log.TRACE_DEBUG))
+DATA_LENGTHS = (64, 512)
+BATCH_FRAMES = 200000
+BUILD_DATA_LENGTHS = (64, 512, 2048)
+
+
+def bench_check(frame, count, level):
+    """返回该跟踪级别下gw13762_check每秒校验的帧数"""
+    affair = SApsAffair()
+    load_frame_bytes(affair, frame)
+    return run(lambda: gw13762_check(affair, 1), count, level)
+
+
+def bench_parse(frame, count, level):
+    """返回该跟踪级别下gw13762_parse每秒解析的帧数"""
+    return run(lambda: gw13762_parse(frame, 1), count, level)
+
+
+def run(func, count, level):
+    log.set_trace_level(level)
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    rate = count / (time.perf_counter() - start)
+    log.flush(10)  # 日志写完再测下一项，避免写线程占用CPU
+    return rate
+
+
+def bench_build(count):
+    """打印各数据域长度下逐帧构帧与模板构帧（数据域和现算/预先算好）的帧率"""
+    template = create_default_template(0x15, 1)
+    print(f"构帧{count}帧      gw13762_build_frame  模板(现算和)  模板(预算和)")
+    for data_len in BUILD_DATA_LENGTHS:
+        data = bytes(i & 0xFF for i in range(data_len))
+        data_list = list(data)
+        data_sum = sum(data) & 0xFF
+        rates = []
+        for func in (lambda i: create_default_frame(0x15, 1, i & 0xFF, data_list),
+                     lambda i: template.build(i, data),
+                     lambda i: template.build(i, data, data_sum)):
+            start = time.perf_counter()
+            for i in range(count):
+                func(i)
+            rates.append(count / (time.perf_counter() - start))
+        print(f"数据域{data_len:>4}字节: " + " ".join(f"{rate:10.0f} 帧/秒" for rate in rates))
+
+
+def bench_batch(count):
+    """打印count帧（数据域长度0~39）连续存放时批量校验与逐帧处理的帧率"""
+    frames = [bytes(create_default_frame(0x03, i % 8 + 1, i & 0xFF, list(range(i % 40)))[0]) for i in range(1000)]
+    buf = b''.join(b'\xfe\xfe' + frames[i % len(frames)] for i in range(count))
+
+    start = time.perf_counter()
+    result = gw13762_batch.gw13762_batch_check(buf, 1)
+    batch = time.perf_counter() - start
+
+    start = time.perf_counter()
+    parsed = [gw13762_parse(frame, 1) for frame in FrameDecoder().feed(buf)]
+    loop = time.perf_counter() - start
+
+    assert len(result) == len(parsed) == count
+    print(f"批量{count}帧（{len(buf) // 1024}KB）")
+    print(f"gw13762_batch_check      : {count / batch:10.0f} 帧/秒")
+    print(f"FrameDecoder + 逐帧parse : {count / loop:10.0f} 帧/秒")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log._CMD_FILE_PATHS[log.LOG_DEBUG_CMD] = os.path.join(tmp, 'debug.txt')
+        log.set_console_echo(False)
+        try:
+            for data_len in DATA_LENGTHS:
+                frame, _ = create_default_frame(0x03, 1, 1, [i & 0xFF for i in range(data_len)])
+                frame = bytes(frame)
+                print(f"帧长{len(frame)}字节，{count}帧      gw13762_check   gw13762_parse")
+                for name, level in LEVELS:
+                    print(f"{name:<12}: {bench_check(frame, count, level):10.0f} 帧/秒 "
+                          f"{bench_parse(frame, count, level):10.0f} 帧/秒")
+            log.set_trace_level(log.TRACE_OFF)
+            bench_build(count)
+            if gw13762_batch.np is not None:
+                bench_batch(BATCH_FRAMES)
+        finally:
+            log.set_trace_level(log.TRACE_OFF)
+            log.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""
+KFifoAps 性能测试：验证 put/get 的耗时与队列容量无关（O(1)）
+
+运行方式（在工程根目录）：python Test/kfifo_bench.py
+每种容量下先把队列填到一半，再循环 put(chunk) + get(chunk)，统计单次操作耗时。
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kfifo import KFifoAps
+
+SIZES = (8 * 1024, 64 * 1024, 1024 * 1024)
+CHUNK_SIZES = (1, 64, 1024)
+
+
+def bench_put_get(size, chunk_len, number=2000):
+    """返回一次 put+get 的平均耗时（微秒）"""
+    fifo = KFifoAps(size)
+    fifo.put(bytes(size // 2))
+    chunk = bytes(range(256)) * (chunk_len // 256) + bytes(chunk_len % 256)
+
+    def op():
+        fifo.put(chunk)
+        fifo.get(chunk_len)
+
+    return timeit.timeit(op, number=number) / number * 1e6
+
+
+def main():
+    print(f"{'容量':>10} " + " ".join(f"{f'chunk={c}B':>14}" for c in CHUNK_SIZES))
+    for size in SIZES:
+        costs = [bench_put_get(size, c) for c in CHUNK_SIZES]
+        print(f"{size:>10} " + " ".join(f"{cost:>12.2f}us" for cost in costs))
+
+
+if __name__ == "__main__":
+    main()
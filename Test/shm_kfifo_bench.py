@@ -0,0 +1,92 @@
+"""
+进程内解析 vs 跨进程解析 帧率对比
+
+运行方式（在工程根目录）：python Test/shm_kfifo_bench.py [帧数]
+进程内：KFifoAps(sync=True) + 解析线程；跨进程：ShmKFifoAps + ParseProcess。两者都用FrameDecoder切帧、gw13762_parse解析。
+生产者每写入一帧等待一条解析结果，统计每秒完成的帧数（包含交接延迟与切帧、解析耗时）。
+解析过程中的调试打印在测试期间重定向到/dev/null，结果输出到stderr。
+"""
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kfifo import KFifoAps
+from shm_kfifo import ShmKFifoAps
+from comport.parse_process import ParseProcess, FrameDecoder
+from protocol.gw13762 import create_default_frame, gw13762_parse
+
+
+def make_frame():
+    frame, _ = create_default_frame(0x03, 1, 1, list(range(64)))
+    return bytes(frame)
+
+
+def run_frames(fifo, results, frame, count):
+    """逐帧写入并等待解析结果，返回帧率"""
+    start = time.perf_counter()
+    for _ in range(count):
+        fifo.put(frame)
+        results.get(timeout=5)
+    return count / (time.perf_counter() - start)
+
+
+def bench_thread(frame, count):
+    fifo = KFifoAps(sync=True)
+    results = queue.Queue()
+    running = True
+
+    def parser():
+        decoder = FrameDecoder()
+        while running:
+            if fifo.wait_for(1, timeout=0.1):
+                for data in decoder.feed_fifo(fifo):
+                    results.put(gw13762_parse(data, 1))
+
+    thread = threading.Thread(target=parser)
+    thread.start()
+    rate = run_frames(fifo, results, frame, count)
+    running = False
+    thread.join()
+    return rate
+
+
+def bench_process(frame, count):
+    fifo = ShmKFifoAps()
+    process = ParseProcess(fifo)
+    process.start()
+    try:
+        return run_frames(fifo, process.results, frame, count)
+    finally:
+        process.stop()
+        fifo.close()
+        fifo.unlink()
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    frame = make_frame()
+
+    # 屏蔽解析过程中的调试打印（子进程继承文件描述符）
+    sys.stdout.flush()
+    saved_stdout = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        thread_rate = bench_thread(frame, count)
+        process_rate = bench_process(frame, count)
+    finally:
+        sys.stdout.flush()
+        os.dup2(saved_stdout, 1)
+        os.close(devnull)
+
+    print(f"帧长{len(frame)}字节，{count}帧", file=sys.stderr)
+    print(f"进程内（线程+KFifoAps）: {thread_rate:10.0f} 帧/秒", file=sys.stderr)
+    print(f"跨进程（ShmKFifoAps）  : {process_rate:10.0f} 帧/秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import threading
+import unittest
+from shm_kfifo import ShmKFifoAps
+# 1. 读写测试（test_put_get）
+# 验证 put/get/read 的数据与长度，空间不足时截断并计入 stats()。
+# 2. 回绕测试（test_wraparound）
+# 验证读写位置跨越缓冲区末尾时 readinto/commit/find/discard_until 结果正确。
+# 3. 挂接测试（test_attach）
+# 验证按名称挂接的第二个实例与创建者共享同一队列数据和读写计数。
+# 4. 零拷贝查看与查找测试（test_peek_views_find）
+# 验证 peek_views 回绕时返回两段；find 在回绕后的第二段、跨回绕边界和指定起始索引时结果与拷贝后查找一致。
+# 5. 唤醒测试（test_wakeup）
+# 验证 wakeup() 打断另一个挂接实例中 wait_for(timeout=None) 的等待，返回False。
+
+
+class TestShmKFifoAps(unittest.TestCase):
+    def setUp(self):
+        self.fifo = ShmKFifoAps(16)
+
+    def tearDown(self):
+        self.fifo.close()
+        self.fifo.unlink()
+
+    def test_put_get(self):
+        self.assertEqual(self.fifo.size, 16)
+        self.assertEqual(self.fifo.put([1, 2, 3]), 3)
+        self.assertEqual(self.fifo.read(2), [1, 2])
+        self.assertEqual(self.fifo.get(10), [1, 2, 3])
+        self.assertEqual(self.fifo.get(1), [])
+
+        self.assertEqual(self.fifo.put(bytes(20)), 16)
+        stats = self.fifo.stats()
+        self.assertEqual(stats['dropped'], 4)
+        self.assertEqual(stats['high_water'], 16)
+        self.assertEqual(self.fifo.get_remaining_length(), 0)
+
+    def test_wraparound(self):
+        self.fifo.put(bytes(12))
+        self.fifo.commit(12)
+        self.fifo.put(bytes([0xFE, 0xFE, 0x68, 1, 2, 3, 0x16]))
+
+        self.assertEqual(self.fifo.find(b'\x68\x01'), 2)
+        self.assertEqual(self.fifo.discard_until(0x68), 2)
+        buf = bytearray(8)
+        self.assertEqual(self.fifo.readinto(buf), 5)
+        self.assertEqual(bytes(buf[:5]), bytes([0x68, 1, 2, 3, 0x16]))
+        self.assertEqual(self.fifo.commit(10), 5)
+        self.assertEqual(self.fifo.get_data_length(), 0)
+
+    def test_attach(self):
+        other = ShmKFifoAps(name=self.fifo.name, create=False)
+        try:
+            self.assertEqual(other.size, 16)
+            self.fifo.put(b'\x01\x02\x03')
+            self.assertEqual(other.get(2), [1, 2])
+            self.assertEqual(self.fifo.get_data_length(), 1)
+            self.assertTrue(other.wait_for(1, timeout=0))
+            self.assertFalse(other.wait_for(2, timeout=0.01))
+        finally:
+            other.close()
+
+    def test_peek_views_find(self):
+        self.fifo.put(bytes(12))
+        self.fifo.commit(12)
+        data = bytes([0xFE, 0x68, 1, 0x68, 0x16, 2, 0x68, 3])
+        self.fifo.put(data)
+
+        views = self.fifo.peek_views()
+        self.assertEqual([len(v) for v in views], [4, 4])
+        self.assertEqual(b''.join(bytes(v) for v in views), data)
+        self.assertEqual(bytes(self.fifo.peek_views(2)[0]), data[:2])
+        for pattern in (0x68, 0x16, b'\x68\x16', b'\x01\x68\x16', 3, b'\x99'):
+            for start in range(len(data)):
+                expected = data.find(bytes((pattern,)) if isinstance(pattern, int) else pattern, start)
+                self.assertEqual(self.fifo.find(pattern, start), expected, (pattern, start))
+
+    def test_wakeup(self):
+        other = ShmKFifoAps(name=self.fifo.name, create=False)
+        try:
+            result = []
+            waiter = threading.Thread(target=lambda: result.append(other.wait_for(1, timeout=None)))
+            waiter.start()
+            waiter.join(0.05)
+            self.assertTrue(waiter.is_alive())
+            self.fifo.wakeup()
+            waiter.join(1)
+            self.assertFalse(waiter.is_alive())
+            self.assertEqual(result, [False])
+        finally:
+            other.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import tempfile
+import unittest
+
+from capture import (CaptureWriter, CaptureError, iter_capture, capture_to_text, capture_stats,
+                     CAP_RX, CAP_TX, CAPTURE_FILE_HEADER)
+from serial_bsp import SerialInterface
+from protocol.gw13762 import create_default_frame
+# 抓包文件写到临时目录
+# 1. 读写测试（test_roundtrip）：多串口收发记录按顺序读回，时间戳递增，追加写入后串口名重新对应
+# 2. 容错测试（test_truncated）：末尾不完整的记录被忽略，非抓包文件报错
+# 3. 转换测试（test_to_text）：转为debug.txt的文本格式并统计各串口数据
+# 4. 串口抓包测试（test_serial_capture）：pty://虚拟串口收发的数据自动写入抓包文件，按帧读取时记录含噪声的原始数据
+
+
+class TestCapture(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'capture.bin')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_roundtrip(self):
+        writer = CaptureWriter(self.path)
+        com3, com4 = writer.port_id("COM3"), writer.port_id("COM4")
+        writer.write(com3, CAP_TX, b'\x68\x0f')
+        writer.write(com4, CAP_RX, bytearray(b'\x16'))
+        writer.write(com3, CAP_RX, memoryview(bytes(300)))
+        writer.close()
+        self.assertEqual((writer.records, writer.bytes), (3, 303))
+
+        # 追加写入：新会话中串口号重新分配
+        writer = CaptureWriter(self.path)
+        writer.write(writer.port_id("COM4"), CAP_TX, b'\x01')
+        writer.close()
+
+        records = list(iter_capture(self.path))
+        self.assertEqual([(r.port, r.direction, r.data) for r in records], [
+            ("COM3", CAP_TX, b'\x68\x0f'),
+            ("COM4", CAP_RX, b'\x16'),
+            ("COM3", CAP_RX, bytes(300)),
+            ("COM4", CAP_TX, b'\x01'),
+        ])
+        self.assertEqual(records[3].port_id, 0)
+        self.assertTrue(all(a.timestamp_ns <= b.timestamp_ns for a, b in zip(records, records[1:3])))
+        self.assertLess(abs(records[0].wall_time - os.path.getmtime(self.path)), 60)
+
+    def test_truncated(self):
+        writer = CaptureWriter(self.path)
+        port = writer.port_id("COM3")
+        writer.write(port, CAP_RX, b'\x68\x16')
+        writer.write(port, CAP_RX, bytes(10))
+        writer.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 3)
+        self.assertEqual([r.data for r in iter_capture(self.path)], [b'\x68\x16'])
+
+        with open(self.path, 'wb') as f:
+            f.write(b'[2024-05-20 15:30:45] 2 [uart]68')
+        with self.assertRaises(CaptureError):
+            list(iter_capture(self.path))
+
+    def test_to_text(self):
+        writer = CaptureWriter(self.path)
+        port = writer.port_id("COM3")
+        writer.write(port, CAP_RX, b'\x68\x0f\x16')
+        writer.write(port, CAP_TX, b'\xfe')
+        writer.close()
+
+        out = os.path.join(self.tmp.name, 'capture.txt')
+        self.assertEqual(capture_to_text(self.path, out), 2)
+        with open(out, encoding='utf-8') as f:
+            lines = f.read().splitlines()
+        self.assertRegex(lines[0], r"^\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] 2 \[uart\]68 0F 16$")
+        self.assertTrue(lines[1].endswith("] 2 [send]FE"))
+        self.assertEqual(capture_stats(self.path),
+                         {"COM3": {'rx_records': 1, 'rx_bytes': 3, 'tx_records': 1, 'tx_bytes': 1}})
+
+    @unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+    def test_serial_capture(self):
+        writer = CaptureWriter(self.path)
+        serial_if = SerialInterface()
+        self.assertTrue(serial_if.open_serial("pty://,115200,N,8,1")[0])
+        try:
+            serial_if.set_capture(writer, "pty")
+            sent = []
+            serial_if.on_tx = sent.append  # 收发记录视图的发送回调
+            serial_if.send_raw([0x68, 0x16])
+            self.assertEqual(sent, [b'\x68\x16'])
+            serial_if.virtual.write(b'\x01\x02')
+            self.assertEqual(serial_if.read_data(2), (True, b'\x01\x02'))
+            # 按帧读取时帧前的噪声也要记录
+            frame = bytes(create_default_frame(0x03, 1, 1, [])[0])
+            serial_if.virtual.write(b'\xfe\x68\x01' + frame)
+            self.assertEqual(serial_if.read_frame(timeout=1), (True, frame))
+        finally:
+            serial_if.close_serial()
+            writer.close()
+        records = list(iter_capture(self.path))
+        self.assertEqual([(r.port, r.direction, r.data) for r in records[:2]],
+                         [("pty", CAP_TX, b'\x68\x16'), ("pty", CAP_RX, b'\x01\x02')])
+        self.assertEqual(b''.join(r.data for r in records[2:]), b'\xfe\x68\x01' + frame)
+        self.assertGreater(os.path.getsize(self.path), CAPTURE_FILE_HEADER.size)
+
+
+if __name__ == '__main__':
+    unittest.main()
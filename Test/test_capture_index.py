@@ -0,0 +1,201 @@
+import contextlib
+import io
+import os
+import random
+import tempfile
+import threading
+import unittest
+from functools import partial
+
+from capture import CaptureWriter, CAPTURE_ANCHOR, CAP_RX, CAP_TX, CAP_PORT_NAME, CAP_ANCHOR
+from capture_index import (CaptureIndex, IndexWriter, build_index, open_index_writer, index_up_to_date,
+                           index_path_for, read_frame, main, INDEX_DATA_START, INDEX_ENTRY)
+from comport.parse_process import FrameDecoder
+from protocol.gw13762 import create_default_frame, gw13762_build_frame
+# 抓包文件和索引文件写到临时目录
+# 1. 边抓包边索引测试（test_live_index）：跨记录的帧、多串口交错、校验和错误、否认帧都能切出并按字段查询，帧内容可读回
+# 2. 事后建立测试（test_build）：重建的索引与边抓包建立的一致，抓包文件追加内容后索引自动补全
+#    （在抓包的索引线程中补全已有内容，同时索引新写入的记录，不重复）
+# 3. 时间范围测试（test_time_range）：按时间二分定位，不完整的索引项被忽略
+# 4. 抓包中查询测试（test_query_while_capturing）：索引不是最新时用临时索引查询，不清空正在追加的索引文件
+# 5. 索引线程测试（test_index_thread）：切帧和写索引不在调用write()的线程中进行，flush()后索引已包含之前的记录
+# 6. 重新同步测试（test_resync）：随机分段的数据中混入无效数据、长度过大的假帧头和校验和错误的帧，
+#    切出的帧与FrameDecoder(keep_checksum_errors=True)逐段输入的结果一致，假帧头后面的帧不被拖延
+
+METER = bytes([1, 2, 3, 4, 5, 6])
+
+
+def make_nak(reason):
+    """表地址METER上报的否认帧"""
+    frame, _ = gw13762_build_frame(dir=1, prm=0, mode=3, afn=0x00, fn=2, serial_num=1, module_id=1,
+                                   src_addr=list(METER), dst_addr=[9] * 6, data=[reason])
+    frame[4] |= 0x04  # 信息域通信模块标识（构帧函数填充信息域时会覆盖该位）
+    frame[-2] = sum(frame[3:-2]) & 0xFF
+    return bytes(frame)
+
+
+class TestCaptureIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'capture.bin')
+        self.query_frame = bytes(create_default_frame(0x03, 1, 1, [1, 2, 3])[0])
+        self.nak = make_nak(0x03)
+        bad = bytearray(self.query_frame)
+        bad[-2] ^= 0x01
+        self.bad = bytes(bad)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def capture(self):
+        """写入一个会话：COM3收发，COM4收到校验和错误的帧，COM3的否认帧分两段收到且中间夹着其他数据"""
+        writer = CaptureWriter(self.path, indexer=open_index_writer(self.path))
+        com3, com4 = writer.port_id("COM3"), writer.port_id("COM4")
+        writer.write(com3, CAP_TX, self.query_frame)
+        writer.write(com3, CAP_RX, b'\xfe\xfe' + self.nak[:7])
+        writer.write(com4, CAP_RX, self.bad)
+        writer.write(com3, CAP_RX, self.nak[7:] + self.query_frame[:3])
+        writer.write(com3, CAP_RX, self.query_frame[3:])
+        writer.close()
+
+    def test_live_index(self):
+        self.capture()
+        self.assertTrue(index_up_to_date(self.path))
+        with CaptureIndex(index_path_for(self.path)) as index, open(self.path, 'rb') as f:
+            entries = list(index.query())
+            self.assertEqual([(index.port_name(e), e.direction, e.afn, e.fn, e.err) for e in entries], [
+                ("COM3", CAP_TX, 0x03, 1, 0xFF),
+                ("COM4", CAP_RX, 0x03, 1, 0x03),
+                ("COM3", CAP_RX, 0x00, 2, 0x03),
+                ("COM3", CAP_RX, 0x03, 1, 0xFF),
+            ])
+            self.assertEqual([read_frame(f, e) for e in entries],
+                             [self.query_frame, self.bad, self.nak, self.query_frame])
+
+            naks = list(index.query(afn=0x00, fn=2, addr=METER))
+            self.assertEqual(len(naks), 1)
+            self.assertEqual((naks[0].src, naks[0].dst), (METER, bytes([9] * 6)))
+            self.assertEqual(len(list(index.query(port="COM3", direction=CAP_RX))), 2)
+            self.assertEqual(len(list(index.query(err=0x03))), 2)
+            self.assertEqual(list(index.query(port="COM9")), [])
+
+    def test_build(self):
+        self.capture()
+        with CaptureIndex(index_path_for(self.path)) as index:
+            live = [e[:1] + e[2:] for e in index.query()]  # 除时间外比较（重建时时间相同）
+            live_ns = [e.timestamp_ns for e in index.query()]
+        os.remove(index_path_for(self.path))
+        self.assertEqual(build_index(self.path), 4)
+        with CaptureIndex(index_path_for(self.path)) as index:
+            self.assertEqual([e[:1] + e[2:] for e in index.query()], live)
+            self.assertEqual([e.timestamp_ns for e in index.query()], live_ns)
+
+        # 不带索引追加抓包后，下次打开时自动补全索引
+        writer = CaptureWriter(self.path)
+        writer.write(writer.port_id("COM5"), CAP_RX, self.query_frame)
+        writer.close()
+        self.assertFalse(index_up_to_date(self.path))
+        writer = CaptureWriter(self.path, indexer=partial(open_index_writer, self.path))
+        writer.write(writer.port_id("COM6"), CAP_RX, self.nak)
+        writer.close()
+        self.assertTrue(index_up_to_date(self.path))
+        with CaptureIndex(index_path_for(self.path)) as index:
+            self.assertEqual(len(index), 6)
+            self.assertEqual(index.ports, ["COM3", "COM4", "COM5", "COM6"])
+
+    def test_time_range(self):
+        index_path = os.path.join(self.tmp.name, 'test.idx')
+        writer = IndexWriter(index_path)
+        # 直接输入记录：会话锚点的墙上时间为1000秒，每帧间隔1秒
+        writer.feed(0, 0, 0, CAP_ANCHOR, CAPTURE_ANCHOR.pack(1000 * 10 ** 9, 0))
+        writer.feed(0, 0, 0, CAP_PORT_NAME, b'COM3')
+        for i in range(100):
+            writer.feed(100 + i, i * 10 ** 9, 0, CAP_RX, self.query_frame)
+        writer.close(0)
+        with open(index_path, 'ab') as f:
+            f.write(b'\x00' * 5)  # 写入时异常退出留下的不完整索引项
+
+        with CaptureIndex(index_path) as index:
+            self.assertEqual(len(index), 100)
+            self.assertTrue(index.sorted)
+            entries = list(index.query(start=1010, end=1020))
+            self.assertEqual([e.record_offset for e in entries], list(range(110, 120)))
+            self.assertEqual(list(index.query(start=2000)), [])
+        self.assertEqual(os.path.getsize(index_path), INDEX_DATA_START + 100 * INDEX_ENTRY.size + 5)
+
+    def test_query_while_capturing(self):
+        writer = CaptureWriter(self.path, buffer_size=0, indexer=open_index_writer(self.path))
+        com3 = writer.port_id("COM3")
+        writer.write(com3, CAP_TX, self.query_frame)
+        writer.flush()
+        writer.write(com3, CAP_RX, self.nak)  # 抓包文件已写入，索引文件头尚未更新
+        self.assertFalse(index_up_to_date(self.path))
+        size = os.path.getsize(index_path_for(self.path))
+
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            main(['query', self.path, '--afn', '0x00'])
+        self.assertTrue(out.getvalue().endswith("共1帧\n"))
+        self.assertEqual(os.path.getsize(index_path_for(self.path)), size)
+
+        writer.close()
+        with CaptureIndex(index_path_for(self.path)) as index:
+            self.assertEqual([(e.afn, e.fn) for e in index.query()], [(0x03, 1), (0x00, 2)])
+
+    def test_index_thread(self):
+        threads = set()
+
+        class RecordingIndexWriter(IndexWriter):
+            def feed(self, *record):
+                threads.add(threading.current_thread())
+                super().feed(*record)
+
+        writer = CaptureWriter(self.path, indexer=RecordingIndexWriter(index_path_for(self.path), create=True))
+        com3 = writer.port_id("COM3")
+        frame = bytearray(self.query_frame)
+        writer.write(com3, CAP_TX, frame)
+        frame[:] = bytes(len(frame))  # 写入后调用者重用缓冲区不影响索引
+        writer.flush()
+        self.assertTrue(index_up_to_date(self.path))
+        with CaptureIndex(index_path_for(self.path)) as index:
+            self.assertEqual([(e.afn, e.fn) for e in index.query()], [(0x03, 1)])
+        writer.close()
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.current_thread(), threads)
+
+    def test_resync(self):
+        rng = random.Random(5)
+        parts = []
+        for i in range(300):
+            kind = rng.randrange(5)
+            if kind == 0:
+                parts.append(bytes(rng.randrange(256) for _ in range(rng.randrange(1, 10))))
+            elif kind == 1:
+                parts.append(b'\x68' + bytes([0x00, 0x04]))  # 长度1024的假帧头
+            elif kind == 2:
+                parts.append(self.bad)
+            else:
+                parts.append(bytes(create_default_frame(0x03, rng.randrange(1, 100), i & 0xFF, [i & 0xFF])[0]))
+        stream = b''.join(parts)
+
+        writer = CaptureWriter(self.path, indexer=open_index_writer(self.path))
+        com3 = writer.port_id("COM3")
+        decoder = FrameDecoder(timeout=None, keep_checksum_errors=True)
+        expected = []
+        pos = 0
+        while pos < len(stream):
+            n = rng.randrange(1, 64)
+            writer.write(com3, CAP_RX, stream[pos:pos + n])
+            expected += decoder.feed(stream[pos:pos + n])
+            pos += n
+        writer.close()
+
+        with CaptureIndex(index_path_for(self.path)) as index, open(self.path, 'rb') as f:
+            entries = list(index.query())
+            self.assertEqual([read_frame(f, e) for e in entries], expected)
+            self.assertEqual(sum(e.err == 0x03 for e in entries), decoder.checksum_errors)
+        self.assertGreater(decoder.checksum_errors, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
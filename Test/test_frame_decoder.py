@@ -0,0 +1,82 @@
+import random
+import unittest
+
+from kfifo import KFifoAps
+from comport.parse_process import FrameDecoder
+from protocol.gw13762 import create_default_frame
+# 1. 分段测试（test_chunks）：多帧与无效数据按任意长度分段输入，所有帧按顺序解出，不完整的帧跨次保留
+# 2. 重新同步测试（test_resync）：长度不合法、帧尾错误、校验和错误的假帧头只丢弃1字节，其后的帧不丢失，可选返回校验和错误的帧
+# 3. fifo测试（test_feed_fifo）：从KFifoAps取出全部数据解码，帧尾未到时保留在解码器中
+# 4. 假帧头等待测试（test_false_head_stall）：长度域过大的假帧头后面已有完整帧时立即解出，没有时超时后丢弃假帧头
+
+
+def make_frames(count):
+    return [bytes(create_default_frame(0x03, i % 8 + 1, i & 0xFF, list(range(i % 40)))[0]) for i in range(count)]
+
+
+class TestFrameDecoder(unittest.TestCase):
+    def test_chunks(self):
+        frames = make_frames(50)
+        stream = b''.join(b'\x00\xfe' * (i % 3) + frame for i, frame in enumerate(frames)) + b'\xfe'
+        rng = random.Random(1)
+        for max_chunk in (1, 7, 64, len(stream)):
+            decoder = FrameDecoder()
+            decoded = []
+            pos = 0
+            while pos < len(stream):
+                n = rng.randint(1, max_chunk)
+                decoded += decoder.feed(stream[pos:pos + n])
+                pos += n
+            self.assertEqual(decoded, frames)
+            self.assertEqual(decoder.frames, 50)
+            self.assertEqual(decoder.discarded, sum(2 * (i % 3) for i in range(50)) + 1)
+            self.assertEqual(decoder.pending, 0)
+
+    def test_resync(self):
+        frame = make_frames(1)[0]
+        bad_cs = bytearray(frame)
+        bad_cs[-2] ^= 0xFF
+        decoder = FrameDecoder()
+        # 长度不合法的0x68、帧尾错误的假帧头（长度20，覆盖到后面的真帧）、校验和错误的帧，之后各跟一个正确的帧
+        data = b'\x68\x01\x00' + frame + b'\x68\x14\x00' + frame + bytes(bad_cs) + frame
+        self.assertEqual(decoder.feed(data), [frame] * 3)
+        self.assertEqual(decoder.checksum_errors, 1)
+        self.assertEqual(decoder.discarded, 3 + 3 + len(bad_cs))
+        # 需要显示错误帧时，校验和错误的帧按顺序一起返回
+        decoder = FrameDecoder(keep_checksum_errors=True)
+        self.assertEqual(decoder.feed(data), [frame, frame, bytes(bad_cs), frame])
+        self.assertEqual((decoder.frames, decoder.checksum_errors), (3, 1))
+
+        # 帧中的0x68不会被当作帧头
+        inner = bytes(create_default_frame(0x03, 1, 1, [0x68, 0x0F, 0x00, 0x16])[0])
+        self.assertEqual(decoder.feed(inner[:10]), [])
+        self.assertEqual(decoder.feed(inner[10:]), [inner])
+
+    def test_feed_fifo(self):
+        frames = make_frames(3)
+        fifo = KFifoAps(256)
+        decoder = FrameDecoder()
+        fifo.put(frames[0] + frames[1] + frames[2][:5])
+        self.assertEqual(decoder.feed_fifo(fifo), frames[:2])
+        self.assertEqual((fifo.get_data_length(), decoder.pending), (0, 5))
+        fifo.put(frames[2][5:])
+        self.assertEqual(decoder.feed_fifo(fifo), frames[2:])
+        self.assertEqual(decoder.stats(), {'frames': 3, 'discarded': 0, 'checksum_errors': 0, 'pending': 0})
+
+    def test_false_head_stall(self):
+        frame = make_frames(1)[0]
+        decoder = FrameDecoder()
+        # 假帧头声明200字节，之后只有一个完整帧且再无数据（一问一答的链路）
+        self.assertEqual(decoder.feed(b'\x68\xc8\x00' + frame), [frame])
+        self.assertEqual((decoder.discarded, decoder.pending), (3, 0))
+
+        decoder = FrameDecoder(timeout=0)
+        self.assertEqual(decoder.feed(b'\x68\xc8\x00\x01\x02' + frame[:5]), [])
+        self.assertEqual(decoder.pending, 10)
+        self.assertEqual(decoder.feed(None), [])  # 超时：丢弃假帧头，帧的前5字节继续等待
+        self.assertEqual((decoder.discarded, decoder.pending), (5, 5))
+        self.assertEqual(decoder.feed(frame[5:]), [frame])
+
+
+if __name__ == '__main__':
+    unittest.main()
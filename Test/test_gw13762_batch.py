@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from comport.parse_process import FrameDecoder
+from protocol.gw13762 import ErrorCode, create_default_frame, gw13762_build_frame, gw13762_parse
+from protocol import gw13762_batch
+from protocol.gw13762_batch import gw13762_batch_check
+# 未安装NumPy时跳过
+# 1. 一致性测试（test_matches_decoder）：随机混入无效数据、假帧头、校验和错误帧、有地址域帧，
+#    批量结果中通过校验和的帧与FrameDecoder + gw13762_parse逐帧结果一致
+# 2. 错误码测试（test_errors）：校验和错误、方向错误、地址域长度不足的帧给出对应错误码，末尾不完整的帧不包含在内
+
+
+def make_addr_frame(data):
+    frame, _ = gw13762_build_frame(dir=1, prm=0, mode=3, afn=0x13, fn=1, serial_num=5, module_id=1,
+                                   src_addr=[1] * 6, dst_addr=[2] * 6, data=data)
+    frame[4] |= 0x04  # 信息域通信模块标识（构帧函数填充信息域时会覆盖该位）
+    frame[-2] = sum(frame[3:-2]) & 0xFF
+    return bytes(frame)
+
+
+@unittest.skipIf(gw13762_batch.np is None, "需要NumPy")
+class TestGw13762Batch(unittest.TestCase):
+    def test_matches_decoder(self):
+        rng = random.Random(3)
+        parts = []
+        for i in range(2000):
+            kind = rng.randrange(6)
+            if kind == 0:
+                parts.append(bytes(rng.randrange(256) for _ in range(rng.randrange(1, 20))))
+            elif kind == 1:
+                parts.append(b'\x68' + bytes([rng.randrange(15, 40), 0]))  # 假帧头
+            elif kind == 2:
+                bad = bytearray(create_default_frame(0x05, 3, i & 0xFF, [i & 0xFF])[0])
+                bad[-2] ^= 0x5A
+                parts.append(bytes(bad))
+            elif kind == 3:
+                parts.append(make_addr_frame([0x68, i & 0xFF]))
+            else:
+                data = [rng.randrange(256) for _ in range(rng.randrange(40))]
+                parts.append(bytes(create_default_frame(0x03, rng.randrange(1, 100), i & 0xFF, data)[0]))
+        stream = b''.join(parts)
+
+        result = gw13762_batch_check(stream)  # 不检查方向时只有校验和错误的err为0x03
+        good = result[result['err'] != ErrorCode.FN_DENY_03H]
+        frames = FrameDecoder().feed(stream)
+        self.assertEqual([bytes(stream[o:o + n]) for o, n in zip(good['offset'], good['length'])], frames)
+        parsed = [gw13762_parse(frame, 1)[0] for frame in frames]
+        self.assertEqual([(int(r['afn']), int(r['fn'])) for r in good], [(f.afn, f.fn) for f in parsed])
+        self.assertTrue(good['valid'].all())
+
+    def test_errors(self):
+        ok = bytes(create_default_frame(0x03, 9, 1, [1, 2])[0])
+        bad_cs = bytearray(ok)
+        bad_cs[-2] ^= 0x01
+        down = bytearray(ok)
+        down[3] &= 0x7F  # 下行
+        down[-2] = sum(down[3:-2]) & 0xFF
+        short_addr = bytearray(ok)
+        short_addr[4] |= 0x04  # 标识有地址域但帧中没有
+        short_addr[-2] = sum(short_addr[3:-2]) & 0xFF
+        stream = ok + bytes(bad_cs) + bytes(down) + bytes(short_addr) + ok[:10]
+
+        result = gw13762_batch_check(bytearray(stream), dir=1)
+        self.assertEqual(list(result['offset']), [0, len(ok), 2 * len(ok), 3 * len(ok)])
+        self.assertEqual(list(result['err']), [0xFF, 0x03, 0x05, 0x02])
+        self.assertEqual(list(result['valid']), [True, False, False, False])
+        self.assertEqual((int(result['afn'][0]), int(result['fn'][0])), (0x03, 9))
+        self.assertEqual(len(gw13762_batch_check(b'\x68\x0f')), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import unittest
+
+from comport.parse_process import load_frame_bytes
+from protocol.gw13762 import (SApsAffair, ErrorCode, Frame13762, FrameTemplate13762, LOCAL_FRAME_LEN_MAX,
+                              create_default_frame, create_default_template, gw13762_build_frame,
+                              gw13762_check, gw13762_parse)
+# 1. 无地址域测试（test_no_addr）：字段与gw13762_check填充的ctypes结构一致，数据域是原始数据的切片（不拷贝）
+# 2. 地址域测试（test_addr）：无中继/有中继的帧解析出源地址、中继地址、目的地址和数据域
+# 3. 错误码测试（test_errors）：数据不足、帧头、长度、方向、帧尾、校验和错误时的错误码与gw13762_check一致
+# 4. 帧模板测试（test_template）：模板构出的帧与gw13762_build_frame逐字节相同（含地址域、预先给出数据域和），超长时返回0x02
+
+
+def build_addr_frame(relay_addrs):
+    """有地址域的上行帧，relay_addrs为中继地址（每级6字节）"""
+    frame, _ = gw13762_build_frame(dir=1, prm=0, mode=3, afn=0x13, fn=1, serial_num=5, module_id=1,
+                                   relay_lev=len(relay_addrs) // 6, src_addr=[1] * 6, dst_addr=[2] * 6,
+                                   relay_addrs=relay_addrs, data=[0xAA, 0xBB])
+    # 信息域通信模块标识和中继级别（构帧函数填充信息域时会覆盖）
+    frame[4] |= 0x04 | ((len(relay_addrs) // 6) << 4)
+    frame[-2] = sum(frame[3:-2]) & 0xFF
+    return bytes(frame)
+
+
+class TestGw13762Parse(unittest.TestCase):
+    def check(self, data, dir):
+        affair = SApsAffair()
+        load_frame_bytes(affair, data)
+        return gw13762_check(affair, dir), affair.p_src.local.frame
+
+    def test_no_addr(self):
+        data = bytearray(create_default_frame(0x03, 10, 7, list(range(64)))[0])
+        frame, err = gw13762_parse(data + b'\xfe\xfe', 1)
+        self.assertIsInstance(frame, Frame13762)
+        self.assertEqual(err, ErrorCode.FN_ACK_FFH)
+        (success, _), rx = self.check(bytes(data), 1)
+        self.assertTrue(success)
+        self.assertEqual((frame.length, frame.ctrl, frame.afn, frame.fn, frame.cs),
+                         (rx.length, rx.ctrl.ctrl, rx.afn, rx.fn, data[-2]))
+        self.assertEqual((frame.dir, frame.mode, frame.module_id), (1, 3, 0))
+        self.assertEqual(bytes(frame.data), bytes(range(64)))
+        self.assertEqual(bytes(rx.buff[:rx.bufflen]), bytes(range(64)))
+        self.assertEqual(len(frame.src), 0)
+
+        frame, _ = gw13762_parse(data, 1)
+        data[13] = 0x99  # 数据域引用原始数据
+        self.assertEqual(frame.data[0], 0x99)
+
+    def test_addr(self):
+        frame, err = gw13762_parse(build_addr_frame([]), 1)
+        self.assertEqual(err, ErrorCode.FN_ACK_FFH)
+        self.assertEqual((bytes(frame.src), bytes(frame.relay), bytes(frame.dst)), (b'\x01' * 6, b'', b'\x02' * 6))
+        self.assertEqual((frame.afn, frame.fn, bytes(frame.data)), (0x13, 1, b'\xaa\xbb'))
+
+        data = build_addr_frame([3] * 6 + [4] * 6)
+        frame, err = gw13762_parse(data, 1)
+        self.assertEqual(frame.relay_lev, 2)
+        self.assertEqual(bytes(frame.relay), b'\x03' * 6 + b'\x04' * 6)
+        self.assertEqual((bytes(frame.dst), bytes(frame.data)), (b'\x02' * 6, b'\xaa\xbb'))
+        (success, _), rx = self.check(data, 1)
+        self.assertTrue(success)
+        self.assertEqual((bytes(rx.addr.src), bytes(rx.addr.relay), bytes(rx.addr.dst)),
+                         (b'\x01' * 6, b'\x03' * 6 + b'\x04' * 6, b'\x02' * 6))
+        self.assertEqual(bytes(rx.buff[:rx.bufflen]), b'\xaa\xbb')
+
+    def test_errors(self):
+        good = bytes(create_default_frame(0x03, 1, 1, [1, 2, 3])[0])
+        cases = [
+            (good[:9], ErrorCode.FN_DENY_05H),
+            (b'\x69' + good[1:], ErrorCode.FN_DENY_05H),
+            (good[:-1], ErrorCode.FN_DENY_02H),
+            (good[:1] + b'\x05\x00' + good[3:], ErrorCode.FN_DENY_02H),
+            (good[:-1] + b'\x17', ErrorCode.FN_DENY_05H),
+            (good[:-2] + bytes([good[-2] ^ 1]) + good[-1:], ErrorCode.FN_DENY_03H),
+        ]
+        for data, expected in cases:
+            self.assertEqual(gw13762_parse(data, 1), (None, expected))
+            self.assertEqual(self.check(data, 1)[0], (False, expected))
+        self.assertEqual(gw13762_parse(good, 0), (None, ErrorCode.FN_DENY_05H))
+
+    def test_template(self):
+        template = create_default_template(0x15, 1)
+        for serial_num, data_len in ((0, 0), (1, 17), (255, 2048), (300, 4)):
+            data = bytes((i * 7) & 0xFF for i in range(data_len))
+            expected = bytes(create_default_frame(0x15, 1, serial_num & 0xFF, list(data))[0])
+            frame, err = template.build(serial_num, data)
+            self.assertEqual((bytes(frame), err), (expected, ErrorCode.FN_ACK_FFH))
+            frame, _ = template.build(serial_num, data, sum(data) & 0xFF)
+            self.assertEqual(bytes(frame), expected)
+
+        template = FrameTemplate13762(dir=0, prm=1, mode=3, afn=0x13, fn=1, module_id=1, relay_lev=1,
+                                      src_addr=[1] * 6, dst_addr=[2] * 6, relay_addrs=[3] * 6)
+        expected, _ = gw13762_build_frame(dir=0, prm=1, mode=3, afn=0x13, fn=1, serial_num=9, module_id=1,
+                                          relay_lev=1, src_addr=[1] * 6, dst_addr=[2] * 6, relay_addrs=[3] * 6,
+                                          data=[0xAA, 0xBB])
+        self.assertEqual(bytes(template.build(9, b'\xaa\xbb')[0]), bytes(expected))
+        self.assertEqual(template.build(1, bytes(LOCAL_FRAME_LEN_MAX)), (None, ErrorCode.FN_DENY_02H))
+        with self.assertRaises(ValueError):
+            FrameTemplate13762(dir=1, prm=0, mode=64, afn=0x15, fn=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
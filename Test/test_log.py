@@ -0,0 +1,136 @@
+import gzip
+import lzma
+import os
+import queue
+import tempfile
+import time
+import unittest
+
+import log
+# 日志写到临时目录，关闭控制台回显
+# 1. 写入测试（test_write_and_flush）：log_wp/log_info 入队后 flush() 写入对应文件，格式与顺序不变
+# 2. 队列满测试（test_queue_full）：队列满时丢弃新日志并计数，调用者不阻塞
+# 3. 切分测试（test_rotation）：超过大小后切分并压缩历史文件，只保留指定个数，内容不丢失
+# 4. 调试跟踪测试（test_trace）：gw13762_check的调试信息只在跟踪级别打开时写入debug.txt
+# 5. 按时间切分测试（test_rotation_interval）：继续写入已有文件时，按文件中第一条日志的时间（而不是打开时间）切分
+
+
+class TestLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS), log.LOG_CONSOLE_ECHO)
+        self.saved_rotation = (log.LOG_ROTATE_MAX_BYTES, log.LOG_ROTATE_INTERVAL, log.LOG_ROTATE_KEEP,
+                               log.LOG_COMPRESS)
+        log.LOG_FILE_PATH = os.path.join(self.tmp.name, 'log.txt')
+        log._CMD_FILE_PATHS[log.LOG_OPT_CMD] = log.LOG_FILE_PATH
+        log._CMD_FILE_PATHS[log.LOG_DEBUG_CMD] = os.path.join(self.tmp.name, 'debug.txt')
+        log.set_console_echo(False)
+
+    def tearDown(self):
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS, echo = self.saved
+        log.set_console_echo(echo)
+        log.set_rotation(*self.saved_rotation)
+        log.set_trace_level(log.TRACE_OFF)
+        self.tmp.cleanup()
+
+    def read(self, name):
+        with open(os.path.join(self.tmp.name, name), encoding='utf-8') as f:
+            return f.read().splitlines()
+
+    def test_write_and_flush(self):
+        for i in range(100):
+            log.log_wp(f"第{i}条")
+        log.log_info(log.LOG_DEBUG_CMD, "调试")
+        log.log_info(99, "无效")
+        self.assertTrue(log.flush())
+
+        lines = self.read('log.txt')
+        self.assertEqual(len(lines), 101)
+        self.assertRegex(lines[0], r"^\[\d{4}-\d\d-\d\d \d\d:\d\d:\d\d\] 第0条$")
+        self.assertTrue(lines[99].endswith("] 第99条"))
+        self.assertTrue(lines[100].endswith("] 无效日志命令: 99"))
+        self.assertTrue(self.read('debug.txt')[0].endswith(f"] {log.LOG_DEBUG_CMD} 调试"))
+
+    def test_queue_full(self):
+        writer = log._LogWriter()  # 未启动，队列不会被取出
+        writer.queue = queue.Queue(maxsize=2)
+        for i in range(5):
+            writer.put((log.LOG_FILE_PATH, 0.0, "", i))
+        self.assertEqual(writer.queue.qsize(), 2)
+        self.assertEqual(writer.dropped, 3)
+
+    def test_rotation(self):
+        for compress, open_func in (('gzip', gzip.open), ('lzma', lzma.open)):
+            log.set_rotation(max_bytes=1000, interval=0, keep=3, compress=compress)
+            for i in range(100):
+                log.log_wp(f"{compress}第{i}条")
+            log.shutdown()  # 等待写入和压缩完成
+
+            rotated = log.rotated_files(log.LOG_FILE_PATH)
+            self.assertEqual(len(rotated), 3)
+            self.assertTrue(all(name.endswith('.gz' if compress == 'gzip' else '.xz') for name in rotated))
+            self.assertLessEqual(os.path.getsize(log.LOG_FILE_PATH), 1000)
+            lines = []
+            for name in rotated:
+                with open_func(name, 'rt', encoding='utf-8') as f:
+                    lines += f.read().splitlines()
+            lines += self.read('log.txt')
+            # 最新的日志完整保留，顺序不变
+            self.assertTrue(lines[-1].endswith(f"] {compress}第99条"))
+            numbers = [int(line.split('第')[1][:-1]) for line in lines if compress in line]
+            self.assertEqual(numbers, list(range(100 - len(numbers), 100)))
+
+        with self.assertRaises(ValueError):
+            log.set_rotation(compress='zip')
+
+    def test_rotation_interval(self):
+        log.set_rotation(max_bytes=0, interval=3600)
+        # 程序上次运行时写入的文件：第一条日志在2小时前
+        old = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - 7200))
+        with open(log.LOG_FILE_PATH, 'w', encoding='utf-8') as f:
+            f.write(f"[{old}] 上次运行\n")
+        log.log_wp("重启后")
+        log.shutdown()
+        self.assertEqual(len(log.rotated_files(log.LOG_FILE_PATH)), 1)
+        self.assertFalse(os.path.exists(log.LOG_FILE_PATH))
+
+        # 1小时内开始的文件不切分
+        recent = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - 60))
+        with open(log.LOG_FILE_PATH, 'w', encoding='utf-8') as f:
+            f.write(f"[{recent}] 上次运行\n")
+        log.log_wp("重启后")
+        log.shutdown()
+        self.assertEqual(len(log.rotated_files(log.LOG_FILE_PATH)), 1)
+        self.assertEqual(len(self.read('log.txt')), 2)
+
+    def test_trace(self):
+        from comport.parse_process import load_frame_bytes
+        from protocol.gw13762 import SApsAffair, create_default_frame, gw13762_check
+
+        frame, _ = create_default_frame(0x03, 1, 1, [1, 2])
+        affair = SApsAffair()
+        load_frame_bytes(affair, bytes(frame))
+        self.assertTrue(gw13762_check(affair, 1)[0])
+        log.log_info(log.LOG_DEBUG_CMD, "开始")
+        self.assertTrue(log.flush())
+        self.assertEqual(len(self.read('debug.txt')), 1)
+
+        log.set_trace_level(log.TRACE_ERROR)
+        self.assertTrue(gw13762_check(affair, 1)[0])
+        self.assertFalse(gw13762_check(affair, 0)[0])
+        self.assertTrue(log.flush())
+        lines = self.read('debug.txt')
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[1].endswith("调试：方向错误，预期0，实际1"))
+
+        log.set_trace_level(log.TRACE_DEBUG)
+        self.assertTrue(gw13762_check(affair, 1)[0])
+        self.assertTrue(log.flush())
+        lines = self.read('debug.txt')[2:]
+        self.assertTrue(lines[0].endswith("原始帧数据: " + bytes(frame).hex(' ').upper()))
+        self.assertTrue(any("AFN=0x03" in line for line in lines))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+
+from port_registry import PortRegistry, PORT_ADDED, PORT_REMOVED
+# 用假的变化检测与枚举结果模拟串口插拔
+# 1. 缓存测试（test_cache）：变化检测结果不变时不重新枚举，首次枚举不产生插拔事件；
+#    不支持变化检测（如Windows）时只在force时重新枚举
+# 2. 插拔事件测试（test_hotplug）：插入/拔出时订阅者收到事件，按VID/PID/序列号查找
+# 3. 检测线程测试（test_watch_thread）：后台线程检测到插入后回调，stop()后线程退出
+# 4. 无变化检测的检测线程测试（test_watch_without_fingerprint）：只按force_interval重新枚举，rescan时立即重新枚举
+
+
+def usb_port(device, serial_number):
+    return {'device': device, 'description': 'USB-Serial', 'hwid': '', 'vid': 0x1A86, 'pid': 0x7523,
+            'serial_number': serial_number, 'location': None}
+
+
+class FakeRegistry(PortRegistry):
+    def __init__(self, poll_interval=0.01):
+        super().__init__(poll_interval)
+        self.fake_ports = [usb_port('/dev/ttyUSB0', 'A0')]
+
+    def _scan_fingerprint(self):
+        return tuple(info['device'] for info in self.fake_ports)
+
+    def _enumerate(self):
+        return [dict(info) for info in self.fake_ports]
+
+
+class TestPortRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = FakeRegistry()
+        self.events = []
+        self.registry.subscribe(lambda event, info: self.events.append((event, info['device'])))
+
+    def test_cache(self):
+        self.assertEqual(self.registry.devices(), ['/dev/ttyUSB0'])
+        self.assertEqual(self.registry.devices(), ['/dev/ttyUSB0'])
+        self.assertEqual(self.registry.enumerations, 1)
+        self.assertEqual(self.events, [])
+
+        self.registry.refresh(force=True)
+        self.assertEqual(self.registry.enumerations, 2)
+
+        registry = FakeRegistry()
+        registry._scan_fingerprint = lambda: None
+        registry.devices()
+        registry.fake_ports.append(usb_port('/dev/ttyUSB1', 'B1'))
+        self.assertEqual(registry.devices(), ['/dev/ttyUSB0'])
+        self.assertEqual(registry.enumerations, 1)
+        registry.refresh(force=True)
+        self.assertEqual((registry.devices(), registry.enumerations), (['/dev/ttyUSB0', '/dev/ttyUSB1'], 2))
+
+    def test_hotplug(self):
+        self.registry.refresh()
+        self.registry.fake_ports.append(usb_port('/dev/ttyUSB1', 'B1'))
+        self.assertEqual(self.registry.devices(), ['/dev/ttyUSB0', '/dev/ttyUSB1'])
+        self.assertEqual(self.events, [(PORT_ADDED, '/dev/ttyUSB1')])
+        self.assertEqual([info['device'] for info in self.registry.find(serial_number='B1')], ['/dev/ttyUSB1'])
+        self.assertEqual(len(self.registry.find(vid=0x1A86, pid=0x7523)), 2)
+
+        del self.registry.fake_ports[0]
+        self.registry.refresh()
+        self.assertEqual(self.events[-1], (PORT_REMOVED, '/dev/ttyUSB0'))
+        self.assertEqual(self.registry.devices(), ['/dev/ttyUSB1'])
+
+    def test_watch_thread(self):
+        added = threading.Event()
+        self.registry.subscribe(lambda event, info: added.set())
+        self.registry.refresh()
+        self.registry.start()
+        try:
+            self.registry.fake_ports.append(usb_port('/dev/ttyACM0', 'C2'))
+            self.assertTrue(added.wait(2))
+            self.assertIn((PORT_ADDED, '/dev/ttyACM0'), self.events)
+        finally:
+            self.registry.stop()
+        self.assertFalse(self.registry.is_alive())
+
+    def test_watch_without_fingerprint(self):
+        registry = FakeRegistry()
+        registry.force_interval = 60
+        registry._scan_fingerprint = lambda: None
+        registry.devices()
+        registry.start()
+        try:
+            time.sleep(0.2)  # 约20个检测周期
+            self.assertEqual(registry.enumerations, 1)
+            registry.fake_ports.append(usb_port('/dev/ttyUSB1', 'B1'))
+            self.assertEqual(registry.devices(), ['/dev/ttyUSB0'])
+            self.assertEqual(registry.devices(rescan=True), ['/dev/ttyUSB0', '/dev/ttyUSB1'])
+            self.assertEqual(registry.enumerations, 2)
+        finally:
+            registry.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
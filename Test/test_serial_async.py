@@ -0,0 +1,100 @@
+import asyncio
+import os
+import unittest
+
+from serial_bsp import SerialInterface
+from serial_async import AsyncSerial
+# 使用pty伪终端对作为串口：slave端由SerialInterface按配置字符串打开，master端模拟设备
+# 1. 接收测试（test_receive）：设备写入的数据通过 recv()/async for 收到
+# 2. 发送测试（test_send）：send() 支持bytes与整数列表，数据完整到达设备端
+# 3. 超时与关闭测试（test_timeout_and_close）：recv(timeout) 超时抛出异常，close() 后 async for 结束
+# 4. 发送中关闭测试（test_close_while_sending）：设备不读取时send()等待可写，close()后send()抛出OSError而不是挂起，
+#    文件描述符恢复为阻塞模式
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestAsyncSerial(unittest.TestCase):
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.slave_name = os.ttyname(slave)
+        self.serial_if = SerialInterface()
+        success, msg = self.serial_if.open_serial(f"{self.slave_name},115200,N,8,1")
+        os.close(slave)
+        self.assertTrue(success, msg)
+
+    def tearDown(self):
+        self.serial_if.close_serial()
+        os.close(self.master)
+
+    def run_async(self, coro):
+        return asyncio.run(asyncio.wait_for(coro, 5))
+
+    def test_receive(self):
+        async def scenario():
+            aser = await AsyncSerial(self.serial_if).start()
+            os.write(self.master, b'\x68\x01\x02')
+            received = await aser.recv(timeout=2)
+            while len(received) < 3:
+                received += await aser.recv(timeout=2)
+            aser.close()
+            return received
+
+        self.assertEqual(self.run_async(scenario()), b'\x68\x01\x02')
+
+    def test_send(self):
+        payload = bytes(range(256)) * 8
+
+        async def scenario():
+            aser = await AsyncSerial(self.serial_if).start()
+            self.assertEqual(await aser.send([0x68, 0x16]), 2)
+            self.assertEqual(await aser.send(payload), len(payload))
+            aser.close()
+
+        async def drain():
+            data = b''
+            loop = asyncio.get_running_loop()
+            while len(data) < len(payload) + 2:
+                data += await loop.run_in_executor(None, os.read, self.master, 4096)
+            return data
+
+        async def both():
+            _, data = await asyncio.gather(scenario(), drain())
+            return data
+
+        self.assertEqual(self.run_async(both()), b'\x68\x16' + payload)
+
+    def test_timeout_and_close(self):
+        async def scenario():
+            aser = await AsyncSerial(self.serial_if).start()
+            with self.assertRaises(asyncio.TimeoutError):
+                await aser.recv(timeout=0.05)
+
+            os.write(self.master, b'\x01')
+            chunks = []
+            async for chunk in aser:
+                chunks.append(chunk)
+                aser.close()
+            return chunks
+
+        self.assertEqual(self.run_async(scenario()), [b'\x01'])
+
+    def test_close_while_sending(self):
+        fd = self.serial_if.ser.fileno()
+        blocking = os.get_blocking(fd)
+
+        async def scenario():
+            aser = await AsyncSerial(self.serial_if).start()
+            self.assertFalse(os.get_blocking(fd))
+            task = asyncio.ensure_future(aser.send(bytes(1024 * 1024)))  # 远超pty缓冲区
+            while aser._write_waiter is None:
+                await asyncio.sleep(0.01)
+            aser.close()
+            with self.assertRaises(OSError):
+                await task
+
+        self.run_async(scenario())
+        self.assertEqual(os.get_blocking(fd), blocking)
+
+
+if __name__ == '__main__':
+    unittest.main()
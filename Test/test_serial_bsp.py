@@ -0,0 +1,104 @@
+import os
+import threading
+import time
+import unittest
+
+import serial
+from serial_bsp import SerialInterface, READ_MODE_FRAME
+from protocol.gw13762 import create_default_frame
+# 1. 配置解析测试（test_parse_config）：支持COM口名与Linux设备路径，格式错误返回None
+# 2. 字节间超时测试（test_inter_byte_timeout）：按波特率与字符格式计算，低波特率时大于下限
+# 以下使用pty伪终端对作为串口（slave端由SerialInterface打开，master端模拟设备）：
+# 3. 按帧读取测试（test_read_frame）：丢弃帧头前的噪声，一次写入的两帧分两次返回，分段到达的帧可完整收到
+# 4. 断帧测试（test_read_frame_broken）：帧中途停止发送时超时丢弃，随后的完整帧仍能收到
+# 5. 读取超时测试（test_read_frame_timeout）：无数据时返回(False, "")
+# 6. 假帧头测试（test_read_frame_false_head）：长度域过大的假帧头不延迟其后的完整帧，校验和错误的帧不返回，
+#    连续读取时不重新配置串口超时
+
+
+def make_frame(data):
+    frame, _ = create_default_frame(0x03, 1, 1, data)
+    return bytes(frame)
+
+
+class TestSerialInterfaceConfig(unittest.TestCase):
+    def test_parse_config(self):
+        serial_if = SerialInterface()
+        config = serial_if.parse_config("COM3,9600,E,8,1")
+        self.assertEqual(config['port'], "COM3")
+        self.assertEqual(config['parity'], serial.PARITY_EVEN)
+        self.assertEqual(serial_if.parse_config("/dev/ttyUSB0,115200,N,8,1.5")['port'], "/dev/ttyUSB0")
+        self.assertIsNone(serial_if.parse_config("COM3,9600,X,8,1"))
+        self.assertIsNone(serial_if.parse_config("COM3 9600"))
+
+    def test_inter_byte_timeout(self):
+        serial_if = SerialInterface()
+        fast = serial_if.calc_inter_byte_timeout(serial_if.parse_config("COM1,115200,N,8,1"))
+        slow = serial_if.calc_inter_byte_timeout(serial_if.parse_config("COM1,1200,E,8,1"))
+        self.assertEqual(fast, 0.02)
+        self.assertAlmostEqual(slow, 4 * 11 / 1200)
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestSerialInterfaceReadFrame(unittest.TestCase):
+    def setUp(self):
+        self.master, slave = os.openpty()
+        self.serial_if = SerialInterface()
+        self.serial_if.read_mode = READ_MODE_FRAME
+        success, msg = self.serial_if.open_serial(f"{os.ttyname(slave)},115200,N,8,1")
+        os.close(slave)
+        self.assertTrue(success, msg)
+
+    def tearDown(self):
+        self.serial_if.close_serial()
+        os.close(self.master)
+
+    def test_read_frame(self):
+        frame1 = make_frame([1, 2, 3])
+        frame2 = make_frame(list(range(40)))
+        os.write(self.master, b'\xFE\xFE\x68\x00' + frame1 + frame2)
+        self.assertEqual(self.serial_if.read_next(), (True, frame1))
+        self.assertEqual(self.serial_if.read_frame(), (True, frame2))
+        self.assertEqual(self.serial_if.rx_discarded, 4)
+
+        # 帧分两段到达，间隔小于字节间超时
+        timer = threading.Timer(0.005, os.write, args=(self.master, frame2[20:]))
+        os.write(self.master, frame2[:20])
+        timer.start()
+        start = time.monotonic()
+        self.assertEqual(self.serial_if.read_frame(timeout=1), (True, frame2))
+        self.assertLess(time.monotonic() - start, 0.5)
+        timer.join()
+
+    def test_read_frame_broken(self):
+        frame = make_frame([1, 2, 3])
+        os.write(self.master, frame[:8])
+        self.assertEqual(self.serial_if.read_frame(timeout=0.05), (False, ""))
+        os.write(self.master, frame)
+        self.assertEqual(self.serial_if.read_frame(), (True, frame))
+
+    def test_read_frame_timeout(self):
+        start = time.monotonic()
+        self.assertEqual(self.serial_if.read_frame(timeout=0.05), (False, ""))
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_read_frame_false_head(self):
+        frame = make_frame([1, 2, 3])
+        bad = bytearray(frame)
+        bad[-2] ^= 0x01
+        os.write(self.master, b'\x68\x00\x08' + bytes(bad) + frame)
+        start = time.monotonic()
+        self.assertEqual(self.serial_if.read_frame(timeout=1), (True, frame))
+        self.assertLess(time.monotonic() - start, 0.1)
+
+        reconfigured = []
+        self.serial_if.ser._reconfigure_port = lambda *args, **kwargs: reconfigured.append(1)
+        for _ in range(3):
+            os.write(self.master, frame)
+            self.assertEqual(self.serial_if.read_frame(timeout=1), (True, frame))
+        self.assertEqual(self.serial_if.read_frame(timeout=0.05), (False, ""))
+        self.assertEqual(reconfigured, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import select
+import tempfile
+import termios
+import threading
+import unittest
+
+import log
+
+from protocol.gw13762 import gw13762_build_frame
+from serial_bsp import SerialInterface
+from serial_probe import SerialProber, ProbeCache, probe_candidates
+# 使用pty伪终端对模拟设备：只有串口参数为指定波特率/停止位时才应答AFN=03H查询帧（pty不支持校验位）
+# 1. 并行探测测试（test_probe）：两个串口参数不同，分别探测出正确参数，无应答的串口返回None
+# 2. 缓存测试（test_cache）：再次探测时直接验证缓存的参数，只尝试一次；缓存失效时重新探测
+# 3. 读取出错测试（test_read_error）：读取出错时立即放弃这组参数，不在超时前反复重试
+
+
+def fake_device(master, baudrate, two_stopbits, stop):
+    """模拟设备：参数匹配时应答AFN=03H F1，否则忽略（相当于收到乱码）"""
+    while not stop.is_set():
+        readable, _, _ = select.select([master], [], [], 0.05)
+        if not readable:
+            continue
+        try:
+            data = os.read(master, 4096)
+        except OSError:
+            return
+        attrs = termios.tcgetattr(master)
+        cflag, speed = attrs[2], attrs[5]
+        if speed == baudrate and bool(cflag & termios.CSTOPB) == two_stopbits and data[:1] == b'\x68':
+            rsp, _ = gw13762_build_frame(dir=1, prm=0, mode=3, afn=0x03, fn=1, serial_num=data[9],
+                                         data=[0x57, 0x48, 0x01, 0x02])
+            os.write(master, bytes(rsp))
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestSerialProber(unittest.TestCase):
+    def setUp(self):
+        # 日志写到临时目录，不在工作目录留下log.txt/debug.txt
+        self.log_tmp = tempfile.TemporaryDirectory()
+        self.saved_log = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS))
+        for cmd, path in log._CMD_FILE_PATHS.items():
+            log._CMD_FILE_PATHS[cmd] = os.path.join(self.log_tmp.name, os.path.basename(path))
+        log.LOG_FILE_PATH = log._CMD_FILE_PATHS[log.LOG_OPT_CMD]
+        self.stop = threading.Event()
+        self.fds = []
+        self.threads = []
+        self.candidates = probe_candidates(baudrates=(9600, 115200, 2400), parities=('N',), stopbits=('1', '2'))
+        self.prober = SerialProber(self.candidates, timeout=0.1, cache=ProbeCache(None), registry=None)
+
+    def tearDown(self):
+        self.stop.set()
+        for thread in self.threads:
+            thread.join(1)
+        for fd in self.fds:
+            os.close(fd)
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS = self.saved_log
+        self.log_tmp.cleanup()
+
+    def open_device(self, baudrate=None, two_stopbits=False):
+        master, slave = os.openpty()
+        self.fds += [master, slave]
+        if baudrate is not None:
+            thread = threading.Thread(target=fake_device, args=(master, baudrate, two_stopbits, self.stop), daemon=True)
+            thread.start()
+            self.threads.append(thread)
+        return os.ttyname(slave)
+
+    def test_probe(self):
+        port_a = self.open_device(termios.B115200, two_stopbits=True)
+        port_b = self.open_device(termios.B2400)
+        port_c = self.open_device()
+
+        results = self.prober.probe([port_a, port_b, port_c])
+        self.assertEqual(results, {
+            port_a: f"{port_a},115200,N,8,2",
+            port_b: f"{port_b},2400,N,8,1",
+            port_c: None,
+        })
+
+    def test_cache(self):
+        port = self.open_device(termios.B2400, two_stopbits=True)
+        self.assertEqual(self.prober.probe_port(port), f"{port},2400,N,8,2")
+        self.assertEqual(self.prober.attempts, self.candidates.index("2400,N,8,2") + 1)
+        self.assertEqual(self.prober.cache.get(f"dev:{port}"), "2400,N,8,2")
+
+        self.prober.attempts = 0
+        self.assertEqual(self.prober.probe_port(port), f"{port},2400,N,8,2")
+        self.assertEqual(self.prober.attempts, 1)
+
+        self.prober.cache.set(f"dev:{port}", "9600,N,8,1")
+        self.assertEqual(self.prober.probe_port(port), f"{port},2400,N,8,2")
+        self.assertEqual(self.prober.cache.get(f"dev:{port}"), "2400,N,8,2")
+
+    def test_read_error(self):
+        port = self.open_device()
+        reads = []
+
+        class FailingSerial(SerialInterface):
+            def read_frame(self, timeout=None):
+                reads.append(timeout)
+                return False, "读取失败: 设备已拔出"
+
+        serial_if = FailingSerial()
+        try:
+            self.assertFalse(self.prober._try(serial_if, f"{port},9600,N,8,1", 1))
+        finally:
+            serial_if.close_serial()
+        self.assertEqual(len(reads), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
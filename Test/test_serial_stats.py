@@ -0,0 +1,70 @@
+import os
+import time
+import unittest
+
+from serial_bsp import SerialInterface
+from serial_stats import IoCounters, StatsSampler, format_stats
+# 1. 收发计数测试（test_counters）：pty://虚拟串口收发后字节数、次数、空读、失败次数正确
+# 2. 速率采样测试（test_sample）：sample() 按两次采样之间的字节数计算速率并保留峰值
+# 3. 采样线程测试（test_sampler）：sample() 把每个注册串口的统计传给回调
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestSerialStats(unittest.TestCase):
+    def test_counters(self):
+        serial_if = SerialInterface()
+        serial_if.read_timeout = 0.05
+        self.assertTrue(serial_if.open_serial("pty://,115200,N,8,1")[0])
+        try:
+            serial_if.send_raw([0x68, 0x16])
+            serial_if.send_data("FE FE FE")
+            serial_if.virtual.write(b'\x01\x02\x03')
+            self.assertEqual(serial_if.read_data(3), (True, b'\x01\x02\x03'))
+            self.assertEqual(serial_if.read_data(3), (False, ""))
+        finally:
+            serial_if.close_serial()
+        serial_if.send_raw(b'\x00')
+        serial_if.read_data(1)
+
+        stats = serial_if.stats()
+        self.assertEqual((stats['tx_bytes'], stats['tx_frames'], stats['tx_errors']), (5, 2, 0))
+        self.assertEqual((stats['rx_bytes'], stats['rx_frames'], stats['read_calls'], stats['empty_reads']),
+                         (3, 1, 2, 1))
+        self.assertGreater(stats['tx_latency_max'], 0)
+        self.assertGreaterEqual(stats['rx_latency_max'], stats['rx_latency_avg'])
+        self.assertIn("收 3B/1帧", format_stats(stats))
+
+    def test_sample(self):
+        counters = IoCounters()
+        counters.on_read(1000, 0.01)
+        counters._sample_time -= 1.0  # 模拟距上次采样1秒
+        stats = counters.sample()
+        self.assertAlmostEqual(stats['rx_rate'], 1000, delta=50)
+        self.assertEqual(stats['tx_rate'], 0)
+
+        time.sleep(0.01)
+        stats = counters.sample()
+        self.assertEqual(stats['rx_rate'], 0)
+        self.assertAlmostEqual(stats['rx_rate_peak'], 1000, delta=50)
+
+        counters.reset()
+        self.assertEqual(counters.stats()['rx_rate_peak'], 0)
+
+    def test_sampler(self):
+        sampler = StatsSampler()
+        a, b = IoCounters(), IoCounters()
+        a.on_write(10, 0.001)
+        sampler.add("a", a)
+        sampler.add("b", b)
+        received = {}
+        sampler.subscribe(lambda name, stats: received.__setitem__(name, stats))
+        sampler.sample()
+        self.assertEqual(received['a']['tx_bytes'], 10)
+        self.assertEqual(received['b']['tx_bytes'], 0)
+
+        sampler.remove("b")
+        self.assertEqual(list(sampler.sample()), ["a"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import os
+import tempfile
+import time
+import unittest
+
+from PyQt6.QtCore import QCoreApplication
+
+import log
+from kfifo import KFifoAps
+from serial_bsp import SerialInterface
+from serial_thread import SerialThread, format_rx_chunks
+# 使用pty://虚拟串口驱动SerialThread，读线程只读取和入队，调试日志在flush()时合并写入
+# 1. 合并写入测试（test_flush_batches）：多个数据块在一次flush()中取出、合并为一次调试日志，fifo数据完整
+# 2. 格式化测试（test_format）：原始数据块在消费端转为十六进制文本行
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestSerialThreadFlush(unittest.TestCase):
+    def setUp(self):
+        # 日志写到临时目录，不在工作目录留下log.txt/debug.txt
+        self.log_tmp = tempfile.TemporaryDirectory()
+        self.saved_log = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS))
+        for cmd, path in log._CMD_FILE_PATHS.items():
+            log._CMD_FILE_PATHS[cmd] = os.path.join(self.log_tmp.name, os.path.basename(path))
+        log.LOG_FILE_PATH = log._CMD_FILE_PATHS[log.LOG_OPT_CMD]
+        self.serial_if = SerialInterface()
+        self.serial_if.read_timeout = 0.02
+        self.assertTrue(self.serial_if.open_serial("pty://,115200,N,8,1")[0])
+        self.fifo = KFifoAps(sync=True)
+        self.thread = SerialThread(self.serial_if, fifo=self.fifo)
+
+    def tearDown(self):
+        self.thread.is_running = False
+        self.thread.wait(1000)
+        self.serial_if.close_serial()
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS = self.saved_log
+        self.log_tmp.cleanup()
+
+    def test_flush_batches(self):
+        self.thread.is_running = True
+        self.thread.start()
+        for i in range(3):
+            self.serial_if.virtual.write(bytes([0x68, i]))
+            time.sleep(0.05)  # 大于读超时，每次写入成为单独的数据块
+        self.assertTrue(self.fifo.wait_for(6, timeout=1))
+
+        chunks = self.thread.flush()
+        self.assertEqual([data for _, data in chunks], [b'\x68\x00', b'\x68\x01', b'\x68\x02'])
+        self.assertEqual(self.fifo.get(6), [0x68, 0, 0x68, 1, 0x68, 2])
+        self.assertEqual(self.thread.flush(), [])
+
+        log.shutdown()
+        with open(log._CMD_FILE_PATHS[log.LOG_DEBUG_CMD], encoding='utf-8') as f:
+            text = f.read()
+        self.assertTrue(text.endswith("[uart]68 00\n[uart]68 01\n[uart]68 02\n"), text)
+        self.assertEqual(text.count("[uart]68 00"), 1)
+
+    def test_format(self):
+        self.assertEqual(format_rx_chunks([(0.0, b'\x68\x0f\x16'), (0.1, b'')]), ["[uart]68 0F 16", "[uart]"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import os
+import tempfile
+import time
+import unittest
+
+import log
+from serial_bsp import SerialInterface
+from serial_tx import SerialTxQueue
+from protocol.gw13762 import create_default_frame
+# 使用pty://虚拟串口，对端设备读出串口发送的数据
+# 1. 原始数据发送测试（test_send_raw）：send_raw/send_data 直接发送bytes与整数列表，hex字符串方式不变
+# 2. 合并发送测试（test_coalesce）：发送线程启动前排队的多个帧合并成一次write()，超过合并上限时拆分
+# 3. 统计测试（test_stats）：write次数、帧数、字节数与耗时统计，串口关闭后计入失败次数
+# 4. 未启动停止测试（test_stop_not_started）：发送线程未启动时stop()立即返回，不等待排队的帧
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestSerialTxQueue(unittest.TestCase):
+    def setUp(self):
+        # 日志写到临时目录，不在工作目录留下log.txt/debug.txt
+        self.log_tmp = tempfile.TemporaryDirectory()
+        self.saved_log = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS))
+        for cmd, path in log._CMD_FILE_PATHS.items():
+            log._CMD_FILE_PATHS[cmd] = os.path.join(self.log_tmp.name, os.path.basename(path))
+        log.LOG_FILE_PATH = log._CMD_FILE_PATHS[log.LOG_OPT_CMD]
+        self.serial_if = SerialInterface()
+        success, msg = self.serial_if.open_serial("pty://,115200,N,8,1")
+        self.assertTrue(success, msg)
+        self.peer = self.serial_if.virtual
+        self.frame, _ = create_default_frame(0x15, 1, 1, [0x11, 0x22, 0x33])
+
+    def tearDown(self):
+        self.serial_if.close_serial()
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS = self.saved_log
+        self.log_tmp.cleanup()
+
+    def read_peer(self, total):
+        data = b''
+        while len(data) < total:
+            chunk = self.peer.read(timeout=1)
+            self.assertTrue(chunk, "对端设备读取超时")
+            data += chunk
+        return data
+
+    def test_send_raw(self):
+        self.assertEqual(self.serial_if.send_raw(self.frame), (True, f"发送成功: {len(self.frame)}字节"))
+        self.assertTrue(self.serial_if.send_data(memoryview(b'\x68\x16'))[0])
+        self.assertTrue(self.serial_if.send_data("FE FE")[0])
+        self.assertEqual(self.read_peer(len(self.frame) + 4), bytes(self.frame) + b'\x68\x16\xFE\xFE')
+
+    def test_coalesce(self):
+        tx = SerialTxQueue(self.serial_if, coalesce_max=len(self.frame) * 4)
+        for _ in range(10):
+            tx.send(self.frame)
+        tx.start()
+        self.assertTrue(tx.flush(timeout=2))
+        tx.stop()
+
+        self.assertEqual(self.read_peer(len(self.frame) * 10), bytes(self.frame) * 10)
+        stats = tx.stats()
+        self.assertEqual(stats['frames'], 10)
+        self.assertEqual(stats['writes'], 3)
+
+    def test_stats(self):
+        tx = SerialTxQueue(self.serial_if)
+        tx.start()
+        tx.send(self.frame)
+        self.assertTrue(tx.flush(timeout=2))
+        self.read_peer(len(self.frame))
+
+        stats = tx.stats()
+        self.assertEqual((stats['writes'], stats['frames'], stats['bytes'], stats['errors']),
+                         (1, 1, len(self.frame), 0))
+        self.assertEqual(len(tx.latencies), 1)
+        self.assertGreaterEqual(stats['max_queue_latency'], stats['max_write_latency'])
+
+        self.serial_if.close_serial()
+        tx.send(self.frame)
+        self.assertTrue(tx.flush(timeout=2))
+        tx.stop()
+        self.assertEqual(tx.stats()['errors'], 1)
+        tx.reset_stats()
+        self.assertEqual(tx.stats()['writes'], 0)
+
+    def test_stop_not_started(self):
+        tx = SerialTxQueue(self.serial_if)
+        tx.send(self.frame)
+        start = time.monotonic()
+        tx.stop(timeout=1)
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(tx.stats()['queued'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+from PyQt6.QtCore import QCoreApplication
+
+from comport.parse_process import FrameDecoder
+from protocol.gw13762 import create_default_frame, gw13762_build_frame, gw13762_parse
+from traffic_view import (TrafficLogModel, TrafficFilterProxy, frame_afn_fn, make_record, format_record,
+                          DIR_RX, DIR_TX, DIR_LOG, REC_DATA)
+# 1. 环形记录测试（test_ring）：超出容量时覆盖最旧的记录，行数不超过容量
+# 2. 过滤测试（test_filter）：按方向/AFN/FN/错误过滤
+# 3. 帧解析测试（test_frame_afn_fn）：无地址域/有地址域帧取AFN和FN，非完整帧返回None
+# 4. 解析结果测试（test_append_frames）：解析线程送来的帧（含校验和错误的帧）可按错误过滤
+
+app = QCoreApplication.instance() or QCoreApplication([])
+
+
+class TestTrafficView(unittest.TestCase):
+    def test_ring(self):
+        model = TrafficLogModel(capacity=4)
+        model.append_text("a\nb")
+        model.append_records(make_record(DIR_LOG, str(i)) for i in range(3))
+        self.assertEqual(model.rowCount(), 4)
+        self.assertEqual([model.record(i)[REC_DATA] for i in range(4)], ["b", "0", "1", "2"])
+
+        model.append_records(make_record(DIR_LOG, str(i)) for i in range(10))
+        self.assertEqual([model.record(i)[REC_DATA] for i in range(4)], ["6", "7", "8", "9"])
+        self.assertEqual(model.total, 15)
+        self.assertTrue(model.index(3, 0).data().endswith("] 9"))
+
+        model.clear()
+        self.assertEqual(model.rowCount(), 0)
+
+    def test_filter(self):
+        model = TrafficLogModel()
+        proxy = TrafficFilterProxy()
+        proxy.setSourceModel(model)
+        frame_15, _ = create_default_frame(0x15, 1, 1, [1, 2])
+        frame_03, _ = create_default_frame(0x03, 1, 2, [])
+        model.append(DIR_TX, bytes(frame_15))
+        model.append(DIR_RX, bytes(frame_15), err=0x03)
+        model.append(DIR_RX, bytes(frame_03))
+        model.append_text("日志")
+        self.assertEqual(proxy.rowCount(), 4)
+
+        proxy.set_filter(directions=[DIR_RX])
+        self.assertEqual(proxy.rowCount(), 2)
+        proxy.set_filter(afn=0x15, fn=1)
+        self.assertEqual(proxy.rowCount(), 2)
+        proxy.set_filter(errors_only=True)
+        self.assertEqual(proxy.rowCount(), 1)
+        self.assertIn("[收] 错误0x03 68 ", proxy.index(0, 0).data())
+        proxy.set_filter()
+        self.assertEqual(proxy.rowCount(), 4)
+
+    def test_frame_afn_fn(self):
+        frame, _ = create_default_frame(0x15, 1, 1, [1, 2, 3])
+        self.assertEqual(frame_afn_fn(bytes(frame)), (0x15, 1))
+        frame, _ = gw13762_build_frame(dir=0, prm=1, mode=3, afn=0x13, fn=1, serial_num=1, module_id=1,
+                                       src_addr=[1] * 6, dst_addr=[2] * 6, data=[0xAA])
+        frame[4] |= 0x04  # 信息域通信模块标识（构帧函数填充信息域时会覆盖该位）
+        self.assertEqual(frame_afn_fn(bytes(frame)), (0x13, 1))
+        self.assertEqual(frame_afn_fn(b'\x68\x01\x02'), (None, None))
+        self.assertTrue(format_record(make_record(DIR_RX, b'\x68\x16')).endswith("[收] 68 16"))
+
+    def test_append_frames(self):
+        model = TrafficLogModel()
+        proxy = TrafficFilterProxy()
+        proxy.setSourceModel(model)
+        frame = bytes(create_default_frame(0x03, 1, 1, [1])[0])
+        bad = bytearray(frame)
+        bad[-2] ^= 0x01
+        # 与ParsingThread相同：解码器保留校验和错误的帧，逐帧校验后一次追加
+        results = []
+        for data in FrameDecoder(keep_checksum_errors=True).feed(frame + bytes(bad)):
+            parsed, err = gw13762_parse(data, 1)
+            results.append((DIR_RX, data, None if parsed is not None else int(err)))
+        model.append_frames(results)
+        self.assertEqual(model.rowCount(), 2)
+        proxy.set_filter(errors_only=True)
+        self.assertEqual(proxy.rowCount(), 1)
+        self.assertIn("[收] 错误0x03 68 ", proxy.index(0, 0).data())
+
+
+if __name__ == '__main__':
+    unittest.main()
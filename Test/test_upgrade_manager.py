@@ -0,0 +1,157 @@
+import asyncio
+import os
+import tempfile
+import threading
+import unittest
+
+import log
+from kfifo import KFifoAps
+from comport.parse_process import load_complete_frame
+from protocol.gw13762 import SApsAffair, create_default_frame, gw13762_build_frame, AFN_FILE_TRANSFER, FILE_SEGMENT_HEADER
+from upgrade_manager import UpgradePlan, UpgradeManager, PortSession, STATE_DONE, STATE_FAILED
+# 使用pty伪终端对作为串口：slave端由升级会话打开，master端由模拟设备线程应答
+# 1. 并行升级测试（test_parallel_upgrade）：两个串口同时升级，设备收到的分段数据拼接后与升级文件一致
+# 2. 无应答测试（test_no_response）：设备不应答时按次数重发后该串口失败，不影响其他串口
+# 3. 关闭测试（test_close_reader_error）：接收任务异常退出后close()仍关闭串口，异常记入日志而不是抛出
+# 4. 取帧测试（test_load_complete_frame）：应答帧前有长度域过大的假帧头时仍能取出，后面没有完整帧时等待
+
+
+def fake_device(master, received, stop, respond=True):
+    """模拟设备：解析AFN=15H F1下行帧，记录段数据并用段标识应答"""
+    buf = b''
+    while not stop.is_set():
+        try:
+            buf += os.read(master, 4096)
+        except OSError:
+            return
+        while len(buf) >= 3:
+            start = buf.find(b'\x68')
+            if start < 0:
+                buf = b''
+                break
+            buf = buf[start:]
+            frame_len = buf[1] | (buf[2] << 8)
+            if len(buf) < frame_len:
+                break
+            frame, buf = buf[:frame_len], buf[frame_len:]
+            # 无地址域：数据域从第13字节开始
+            header = FILE_SEGMENT_HEADER.unpack_from(frame, 13)
+            segment_index, segment_len = header[4], header[5]
+            start = 13 + FILE_SEGMENT_HEADER.size
+            received[segment_index] = frame[start:start + segment_len]
+            if respond:
+                rsp, _ = gw13762_build_frame(dir=1, prm=0, mode=3, afn=AFN_FILE_TRANSFER, fn=1, serial_num=frame[9],
+                                             data=list(segment_index.to_bytes(4, 'little')))
+                os.write(master, bytes(rsp))
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestUpgradeManager(unittest.TestCase):
+    def setUp(self):
+        # 日志写到临时目录，不在工作目录留下log.txt/debug.txt
+        self.log_tmp = tempfile.TemporaryDirectory()
+        self.saved_log = (log.LOG_FILE_PATH, dict(log._CMD_FILE_PATHS))
+        for cmd, path in log._CMD_FILE_PATHS.items():
+            log._CMD_FILE_PATHS[cmd] = os.path.join(self.log_tmp.name, os.path.basename(path))
+        log.LOG_FILE_PATH = log._CMD_FILE_PATHS[log.LOG_OPT_CMD]
+        self.content = bytes(range(256)) * 5 + b'\x16\x68'
+        fd, self.path = tempfile.mkstemp()
+        os.write(fd, self.content)
+        os.close(fd)
+        self.stop = threading.Event()
+        self.fds = []
+        self.threads = []
+
+    def tearDown(self):
+        self.stop.set()
+        for fd in self.fds:
+            os.close(fd)
+        for thread in self.threads:
+            thread.join(1)
+        os.remove(self.path)
+        log.shutdown()
+        log.LOG_FILE_PATH, log._CMD_FILE_PATHS = self.saved_log
+        self.log_tmp.cleanup()
+
+    def open_device(self, respond=True):
+        master, slave = os.openpty()
+        name = os.ttyname(slave)
+        self.fds += [master, slave]
+        received = {}
+        thread = threading.Thread(target=fake_device, args=(master, received, self.stop, respond), daemon=True)
+        thread.start()
+        self.threads.append(thread)
+        return f"{name},115200,N,8,1", received
+
+    def test_parallel_upgrade(self):
+        devices = [self.open_device() for _ in range(2)]
+        plan = UpgradePlan([self.path], frame_length=200, timeout=2)
+        report = UpgradeManager([port for port, _ in devices]).run_sync(plan)
+
+        for port, received in devices:
+            self.assertEqual(b''.join(received[i] for i in sorted(received)), self.content)
+        for port in report['ports']:
+            self.assertEqual(port['state'], STATE_DONE, port['message'])
+            self.assertEqual(port['total_segments'], 7)
+            self.assertEqual(port['frames_sent'], 7)
+        self.assertEqual(report['total']['bytes_sent'], 2 * len(self.content))
+        self.assertEqual(report['total']['done'], 2)
+
+    def test_no_response(self):
+        good, _ = self.open_device()
+        silent, received = self.open_device(respond=False)
+        plan = UpgradePlan([self.path], frame_length=512, timeout=0.1, retries=2)
+        report = UpgradeManager([good, silent]).run_sync(plan)
+
+        states = {port['port']: port for port in report['ports']}
+        self.assertEqual(states[good]['state'], STATE_DONE)
+        self.assertEqual(states[silent]['state'], STATE_FAILED)
+        self.assertEqual(states[silent]['frames_sent'], 3)
+        self.assertEqual(states[silent]['retries'], 2)
+        self.assertEqual(list(received), [0])
+
+    def test_close_reader_error(self):
+        port, _ = self.open_device()
+        master = self.fds[-2]
+        session = PortSession(port)
+
+        def broken_put(data):
+            raise ValueError("fifo损坏")
+
+        async def scenario():
+            await session.open()
+            session.fifo.put = broken_put
+            os.write(master, b'\x68')
+            while not session._reader.done():
+                await asyncio.sleep(0.01)
+            await session.close()
+
+        asyncio.run(asyncio.wait_for(scenario(), 5))
+        self.assertFalse(session.serial_if.is_open)
+        log.shutdown()
+        with open(log.LOG_FILE_PATH, encoding='utf-8') as f:
+            self.assertIn("fifo损坏", f.read())
+
+
+class TestLoadCompleteFrame(unittest.TestCase):
+    def test_load_complete_frame(self):
+        frame = bytes(create_default_frame(AFN_FILE_TRANSFER, 1, 1, [0, 0, 0, 0])[0])
+        fifo = KFifoAps(256)
+        affair = SApsAffair()
+        # 噪声中的0x68声明200字节，其后只有应答帧
+        fifo.put(b'\x68\xc8\x00' + frame)
+        self.assertTrue(load_complete_frame(fifo, affair))
+        local = affair.p_src.local
+        self.assertEqual(bytes(local.data[:local.datalen]), frame)
+        self.assertEqual(fifo.get_data_length(), 0)
+
+        fifo.put(b'\x68\xc8\x00' + frame[:-1])
+        self.assertFalse(load_complete_frame(fifo, affair))
+        self.assertEqual(fifo.get_data_length(), 3 + len(frame) - 1)
+        fifo.put(frame[-1:])
+        self.assertTrue(load_complete_frame(fifo, affair))
+        self.assertEqual(fifo.get_data_length(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
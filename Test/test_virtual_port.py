@@ -0,0 +1,87 @@
+import os
+import time
+import unittest
+
+from serial_bsp import SerialInterface, READ_MODE_FRAME
+from protocol.gw13762 import create_default_frame
+# 通过配置字符串打开虚拟串口（pty:// / loop://），不需要真实串口
+# 1. 伪终端对测试（test_pty）：对端设备写入的数据由串口读出，串口发送的数据由对端设备读出
+# 2. 回环测试（test_loop）：串口发送的帧按帧读取原样收回，关闭后伪终端对释放
+# 3. 限速测试（test_emulate）：?emulate 按配置的波特率限速，传输时间不小于理论值
+# 4. 回环阻塞时关闭测试（test_loop_close_blocked）：串口不读取、回环线程写入等待时，close()唤醒并等待线程退出后才关闭伪终端对
+
+
+@unittest.skipUnless(hasattr(os, 'openpty'), "需要pty支持")
+class TestVirtualPort(unittest.TestCase):
+    def setUp(self):
+        self.serial_if = SerialInterface()
+
+    def tearDown(self):
+        self.serial_if.close_serial()
+
+    def open(self, config_str):
+        success, msg = self.serial_if.open_serial(config_str)
+        self.assertTrue(success, msg)
+        return self.serial_if.virtual
+
+    def test_pty(self):
+        peer = self.open("pty://,115200,N,8,1")
+        self.assertEqual(peer.write([0x68, 0x01]), 2)
+        self.assertEqual(self.serial_if.read_data(16), (True, b'\x68\x01'))
+
+        self.assertTrue(self.serial_if.send_data("68 16")[0])
+        self.assertEqual(peer.read(timeout=1), b'\x68\x16')
+        self.assertEqual(peer.read(timeout=0.01), b'')
+
+    def test_loop(self):
+        self.open("loop://,115200,N,8,1")
+        frame, _ = create_default_frame(0x15, 1, 1, [0x11, 0x22])
+        self.serial_if.read_mode = READ_MODE_FRAME
+        self.serial_if.ser.write(bytes(frame))
+        self.assertEqual(self.serial_if.read_frame(timeout=1), (True, bytes(frame)))
+
+        fd = self.serial_if.virtual.fileno()
+        self.serial_if.close_serial()
+        self.assertIsNone(self.serial_if.virtual)
+        with self.assertRaises(OSError):
+            os.fstat(fd)
+
+    def test_emulate(self):
+        peer = self.open("pty://?emulate,9600,N,8,1")
+        payload = bytes(480)  # 9600波特率8N1约0.5秒
+        start = time.monotonic()
+        peer.write(payload)
+        elapsed = time.monotonic() - start
+        self.assertGreaterEqual(elapsed, 0.4)
+
+        received = b''
+        while len(received) < len(payload):
+            success, data = self.serial_if.read_data(1024)
+            self.assertTrue(success)
+            received += data
+        self.assertEqual(received, payload)
+
+    def test_loop_close_blocked(self):
+        peer = self.open("loop://,115200,N,8,1")
+        fd = self.serial_if.ser.fileno()
+        os.set_blocking(fd, False)
+        chunk = bytes(4096)
+        deadline = time.monotonic() + 0.5
+        # 串口只写不读，直到两个方向的pty缓冲区都满，回环线程在写回时等待
+        while time.monotonic() < deadline:
+            try:
+                os.write(fd, chunk)
+            except BlockingIOError:
+                time.sleep(0.05)
+        self.assertTrue(peer._loop_thread.is_alive())
+
+        start = time.monotonic()
+        self.serial_if.close_serial()
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertFalse(peer._loop_thread.is_alive())
+        with self.assertRaises(OSError):
+            os.fstat(peer.fileno())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,267 @@
+#这个文件提供串口原始收发数据的二进制抓包格式：只追加写入，每条记录含纳秒级单调时间戳、串口号、方向、长度和数据，
+#比debug.txt中的十六进制文本小约3倍、保留方向和亚秒级时间，读取时无需解析文本
+#命令行用法：
+#   python capture.py text capture.bin [-o debug_capture.txt]   转为debug.txt的文本格式
+#   python capture.py stats capture.bin                         统计各串口收发的记录数与字节数
+#
+#文件格式（小端）：
+#   文件头  : 魔数b'SCAP' + 版本(2) + 保留(2)
+#   记录头  : 单调时间戳ns(8) + 串口号(2) + 类型(1) + 保留(1) + 数据长度(4)，其后为数据
+#   记录类型: 0接收 1发送 2串口名（串口号 -> 名称，utf-8） 3时间锚点（每次打开写入，墙上时间ns(8) + 单调时间ns(8)）
+
+import argparse
+import os
+import queue
+import struct
+import threading
+import time
+from collections import namedtuple
+
+CAPTURE_MAGIC = b'SCAP'
+CAPTURE_VERSION = 1
+CAPTURE_FILE_HEADER = struct.Struct('<4sHH')
+CAPTURE_RECORD_HEADER = struct.Struct('<QHBBI')
+CAPTURE_ANCHOR = struct.Struct('<qq')
+
+# 记录类型
+CAP_RX = 0
+CAP_TX = 1
+CAP_PORT_NAME = 2
+CAP_ANCHOR = 3
+
+# 写文件的缓冲区大小
+CAPTURE_BUFFER_SIZE = 64 * 1024
+# 默认抓包文件
+CAPTURE_FILE_PATH = './capture.bin'
+# 程序是否抓包（抓包文件只追加不轮转，默认关闭），设置环境变量SERIAL_CAPTURE=1打开
+CAPTURE_ENABLED = os.environ.get('SERIAL_CAPTURE', '0') == '1'
+
+# 读取到的收发记录：单调时间戳ns、墙上时间（秒，time.time()格式）、串口号、串口名、方向（CAP_RX/CAP_TX）、数据
+CaptureRecord = namedtuple('CaptureRecord', 'timestamp_ns wall_time port_id port direction data')
+
+
+class CaptureError(Exception):
+    """抓包文件格式错误"""
+
+
+class CaptureWriter:
+    """
+    抓包写入（线程安全，串口读线程与发送路径可共用一个实例）
+    建立索引时切帧和写索引在单独的索引线程中进行，write()只写文件并把记录放入队列
+    用法：
+        writer = CaptureWriter("capture.bin")
+        port_id = writer.port_id("COM3")
+        writer.write(port_id, CAP_RX, data)
+        writer.close()
+    """
+
+    def __init__(self, path=CAPTURE_FILE_PATH, buffer_size=CAPTURE_BUFFER_SIZE, indexer=None):
+        """
+        indexer: 边抓包边建立索引，None表示不建立
+            IndexWriter，或创建IndexWriter的函数f(source_size=...)（如partial(capture_index.open_index_writer, path)），
+            在索引线程中调用，source_size为本次打开前抓包文件的长度，已有内容的索引重建不阻塞调用者
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._ports = {}  # 串口名 -> 串口号
+        self.records = 0
+        self.bytes = 0
+        self.indexer = None
+        self._file = open(path, 'ab', buffering=buffer_size)
+        self._offset = self._file.tell()  # 下一条记录在文件中的位置
+        self._index_queue = None
+        if indexer is not None:
+            # 元素：抓包记录(记录位置, 单调时间戳ns, 串口号, 类型, 数据)，或(flush/close, 抓包文件长度, 完成事件)
+            self._index_queue = queue.Queue()
+            self._index_thread = threading.Thread(target=self._index_loop, args=(indexer, self._offset),
+                                                  name="capture-index", daemon=True)
+            self._index_thread.start()
+        if self._offset == 0:
+            self._file.write(CAPTURE_FILE_HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, 0))
+            self._offset = CAPTURE_FILE_HEADER.size
+        # 追加到已有文件时单调时钟可能已重置（如重启），每次打开都写入新的时间锚点
+        self._write_record(CAP_ANCHOR, 0, CAPTURE_ANCHOR.pack(time.time_ns(), time.monotonic_ns()))
+
+    def _write_record(self, rec_type, port_id, data):
+        timestamp_ns = time.monotonic_ns()
+        self._file.write(CAPTURE_RECORD_HEADER.pack(timestamp_ns, port_id, rec_type, 0, len(data)))
+        self._file.write(data)
+        if self._index_queue is not None:
+            self._index_queue.put((self._offset, timestamp_ns, port_id, rec_type, bytes(data)))
+        self._offset += CAPTURE_RECORD_HEADER.size + len(data)
+
+    def _index_loop(self, indexer, source_size):
+        """索引线程：按记录顺序输入IndexWriter，出错后停止建立索引（抓包不受影响）"""
+        try:
+            if callable(indexer):
+                indexer = indexer(source_size=source_size)
+            self.indexer = indexer
+        except Exception as e:
+            print(f"抓包索引打开失败，不再建立索引: {e}")
+        while True:
+            item = self._index_queue.get()
+            if len(item) == 3:
+                action, size, done = item
+                try:
+                    if self.indexer is not None:
+                        getattr(self.indexer, action)(size)
+                except Exception as e:
+                    print(f"抓包索引写入失败: {e}")
+                    self.indexer = None
+                done.set()
+                if action == 'close':
+                    return
+                continue
+            if self.indexer is None:
+                continue
+            try:
+                self.indexer.feed(*item)
+            except Exception as e:
+                print(f"抓包索引写入失败，不再建立索引: {e}")
+                self.indexer = None
+
+    def _sync_index(self, action):
+        """在锁内调用：等待索引线程处理完队列中的记录，再flush/close索引"""
+        if self._index_queue is not None:
+            done = threading.Event()
+            self._index_queue.put((action, self._offset, done))
+            done.wait()
+
+    def port_id(self, name):
+        """取串口名对应的串口号，首次使用时写入串口名记录"""
+        with self._lock:
+            port_id = self._ports.get(name)
+            if port_id is None:
+                port_id = self._ports[name] = len(self._ports)
+                self._write_record(CAP_PORT_NAME, port_id, name.encode('utf-8'))
+            return port_id
+
+    def write(self, port_id, direction, data):
+        """
+        写入一条收发记录
+        direction: CAP_RX / CAP_TX
+        data: bytes/bytearray/memoryview
+        """
+        with self._lock:
+            if self._file is None:
+                return
+            self._write_record(direction, port_id, data)
+            self.records += 1
+            self.bytes += len(data)
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._sync_index('flush')
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._sync_index('close')
+
+
+def iter_raw_records(f, offset=None):
+    """
+    从已打开的抓包文件（二进制模式）逐条返回所有类型的记录：(记录位置, 单调时间戳ns, 串口号, 类型, 数据)
+    offset: 从该记录位置开始读取，None表示从文件头之后开始（并校验文件头）
+    文件末尾不完整的记录（写入时程序异常退出）被忽略
+    """
+    if offset is None:
+        header = f.read(CAPTURE_FILE_HEADER.size)
+        if len(header) < CAPTURE_FILE_HEADER.size:
+            return
+        magic, version, _ = CAPTURE_FILE_HEADER.unpack(header)
+        if magic != CAPTURE_MAGIC:
+            raise CaptureError(f"不是抓包文件: {getattr(f, 'name', f)}")
+        if version > CAPTURE_VERSION:
+            raise CaptureError(f"不支持的抓包文件版本: {version}")
+        offset = CAPTURE_FILE_HEADER.size
+    else:
+        f.seek(offset)
+
+    record_header = CAPTURE_RECORD_HEADER
+    while True:
+        head = f.read(record_header.size)
+        if len(head) < record_header.size:
+            return
+        timestamp_ns, port_id, rec_type, _, length = record_header.unpack(head)
+        data = f.read(length)
+        if len(data) < length:
+            return
+        yield offset, timestamp_ns, port_id, rec_type, data
+        offset += record_header.size + length
+
+
+def iter_capture(path):
+    """
+    流式读取抓包文件，逐条返回CaptureRecord（只返回收发记录）
+    文件末尾不完整的记录（写入时程序异常退出）被忽略
+    """
+    with open(path, 'rb') as f:
+        ports = {}
+        wall_offset = 0  # 墙上时间ns - 单调时间ns
+        for _, timestamp_ns, port_id, rec_type, data in iter_raw_records(f):
+            if rec_type == CAP_RX or rec_type == CAP_TX:
+                yield CaptureRecord(timestamp_ns, (timestamp_ns + wall_offset) / 1e9, port_id,
+                                    ports.get(port_id, str(port_id)), rec_type, data)
+            elif rec_type == CAP_PORT_NAME:
+                ports[port_id] = data.decode('utf-8', errors='replace')
+            elif rec_type == CAP_ANCHOR:
+                wall_ns, mono_ns = CAPTURE_ANCHOR.unpack(data)
+                wall_offset = wall_ns - mono_ns
+                # 新的会话：串口号重新分配
+                ports = {}
+
+
+def format_capture_record(record):
+    """收发记录转为debug.txt的文本格式：[时间] 2 [uart]68 ..（发送为[send]）"""
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.wall_time))
+    tag = "uart" if record.direction == CAP_RX else "send"
+    return f"[{stamp}] 2 [{tag}]{record.data.hex(' ').upper()}"
+
+
+def capture_to_text(path, out_path):
+    """抓包文件转为文本文件，返回记录数"""
+    count = 0
+    with open(out_path, 'w', encoding='utf-8') as out:
+        for record in iter_capture(path):
+            out.write(format_capture_record(record) + "\n")
+            count += 1
+    return count
+
+
+def capture_stats(path):
+    """各串口收发的记录数与字节数：{串口名: {'rx_records', 'rx_bytes', 'tx_records', 'tx_bytes'}}"""
+    stats = {}
+    for record in iter_capture(path):
+        port = stats.setdefault(record.port, {'rx_records': 0, 'rx_bytes': 0, 'tx_records': 0, 'tx_bytes': 0})
+        prefix = 'rx' if record.direction == CAP_RX else 'tx'
+        port[f'{prefix}_records'] += 1
+        port[f'{prefix}_bytes'] += len(record.data)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="串口抓包文件工具")
+    sub = parser.add_subparsers(dest="command", required=True)
+    text = sub.add_parser("text", help="转为debug.txt的文本格式")
+    text.add_argument("path")
+    text.add_argument("-o", "--output", help="输出文件，默认为抓包文件名加.txt")
+    stats = sub.add_parser("stats", help="统计各串口收发数据")
+    stats.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "text":
+        output = args.output or os.path.splitext(args.path)[0] + ".txt"
+        print(f"{capture_to_text(args.path, output)}条记录已写入{output}")
+    else:
+        for port, port_stats in capture_stats(args.path).items():
+            print(f"{port}: 收{port_stats['rx_records']}条/{port_stats['rx_bytes']}字节 "
+                  f"发{port_stats['tx_records']}条/{port_stats['tx_bytes']}字节")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,502 @@
+#这个文件为抓包文件（capture.py）建立帧索引：从收发数据中切出1376.2帧，每帧记录时间、串口、方向、AFN、FN、地址、错误码
+#和帧在抓包文件中的位置，写入同名.idx索引文件（每帧42字节）。查询时用mmap读取索引，按时间二分定位、按字段过滤，
+#只在需要帧内容时才读取抓包文件对应的记录，不需要重新扫描原始数据
+#可边抓包边建立（CaptureWriter(path, indexer=partial(open_index_writer, path))，在抓包的索引线程中切帧），
+#也可对已有的抓包文件事后建立
+#命令行用法：
+#   python capture_index.py build capture.bin                              建立（重建）索引
+#   python capture_index.py query capture.bin --afn 0x00 --fn 2 --addr 010203040506 [--start/--end/--port/--dir/--err] [--frames]
+#
+#索引文件格式（小端）：
+#   文件头  : 魔数b'SIDX' + 版本(2) + 索引项大小(2) + 已索引的抓包文件长度(8) + 是否按时间有序(1) + 保留(7)
+#   串口表  : INDEX_MAX_PORTS个串口名，每个INDEX_PORT_NAME_LEN字节（utf-8，不足补0）
+#   索引项  : 墙上时间ns(8) + 记录位置(8) + 帧在记录数据中的位置(4) + 帧长(2) + 串口(2) + FN(2) + 方向(1) + AFN(1)
+#             + 错误码(1) + 保留(1) + 源地址(6) + 目的地址(6)
+
+import argparse
+import mmap
+import os
+import struct
+import tempfile
+import time
+from collections import namedtuple
+
+from capture import (iter_raw_records, CAPTURE_ANCHOR, CAP_RX, CAP_TX, CAP_PORT_NAME, CAP_ANCHOR,
+                     CAPTURE_BUFFER_SIZE)
+from comport.parse_process import _find_valid_frame
+from protocol.gw13762 import LOCAL_ADDR_LEN, LOCAL_FRAME_LEN_MIN, LOCAL_FRAME_LEN_MAX, ErrorCode, gw13762_dt_to_fn
+
+INDEX_MAGIC = b'SIDX'
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct('<4sHHQB7x')
+INDEX_ENTRY = struct.Struct('<qQIHHHBBBx6s6s')
+INDEX_PORT_NAME_LEN = 32
+INDEX_MAX_PORTS = 256
+INDEX_DATA_START = INDEX_HEADER.size + INDEX_MAX_PORTS * INDEX_PORT_NAME_LEN
+INDEX_FILE_SUFFIX = '.idx'
+
+AFN_NONE = 0xFF  # 帧中没有AFN（帧过短）
+AFN_ACK = 0x00  # 确认/否认，F2为否认，数据域第一个字节为错误状态（同ErrorCode）
+NO_ADDR = bytes(LOCAL_ADDR_LEN)
+
+# 索引项：墙上时间ns、记录位置、帧在记录数据中的位置、帧长、串口（索引内编号）、FN、方向（CAP_RX/CAP_TX）、AFN、
+# 错误码（0xFF正常；否认帧为否认原因；校验和错误为0x03）、源地址、目的地址（无地址域时为全0）
+IndexEntry = namedtuple('IndexEntry', 'timestamp_ns record_offset pos length port fn direction afn err src dst')
+
+
+def index_path_for(capture_path):
+    """抓包文件对应的索引文件路径"""
+    return capture_path + INDEX_FILE_SUFFIX
+
+
+def index_frame(frame, checksum_ok=None):
+    """
+    取一帧（帧头、长度、帧尾已确认）的索引字段
+    checksum_ok: 已校验过校验和时传入结果，None表示在这里校验
+    返回: (AFN, FN, 错误码, 源地址, 目的地址)
+    """
+    datalen = len(frame)
+    src = dst = NO_ADDR
+    afn_pos = 10
+    info = frame[4]
+    if info & 0x04:
+        # 有地址域：源地址 + 中继地址 + 目的地址
+        relaylen = LOCAL_ADDR_LEN * (info >> 4)
+        src = bytes(frame[10:10 + LOCAL_ADDR_LEN])
+        dst_pos = 10 + LOCAL_ADDR_LEN + relaylen
+        dst = bytes(frame[dst_pos:dst_pos + LOCAL_ADDR_LEN])
+        afn_pos = dst_pos + LOCAL_ADDR_LEN
+    if afn_pos + 3 > datalen - 2:
+        afn, fn = AFN_NONE, 0
+    else:
+        afn = frame[afn_pos]
+        fn = gw13762_dt_to_fn(frame[afn_pos + 1], frame[afn_pos + 2])
+
+    if checksum_ok is None:
+        checksum_ok = sum(frame[3:datalen - 2]) & 0xFF == frame[datalen - 2]
+    if not checksum_ok:
+        err = ErrorCode.FN_DENY_03H
+    elif afn == AFN_ACK and fn == 2 and afn_pos + 3 < datalen - 2:
+        err = frame[afn_pos + 3]
+    else:
+        err = ErrorCode.FN_ACK_FFH
+    return afn, fn, int(err), src, dst
+
+
+class _Stream:
+    """一个串口一个方向的待切帧数据，记录每段数据来自哪条抓包记录"""
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.segments = []  # [数据在buf中的起始位置（可为负，表示前面部分已切走）, 记录位置]
+
+    def append(self, record_offset, data):
+        self.segments.append([len(self.buf), record_offset])
+        self.buf += data
+
+    def consume(self, n):
+        del self.buf[:n]
+        for segment in self.segments:
+            segment[0] -= n
+        # 丢弃已全部切走的记录
+        while len(self.segments) > 1 and self.segments[1][0] <= 0:
+            self.segments.pop(0)
+        if not self.buf:
+            self.segments.clear()
+
+    def locate(self, pos=0):
+        """buf[pos]所在的(记录位置, 在记录数据中的位置)"""
+        for start, record_offset in reversed(self.segments):
+            if start <= pos:
+                return record_offset, pos - start
+
+
+class IndexWriter:
+    """
+    索引写入：按抓包记录的顺序调用feed()，从收发数据中切出帧并追加索引项
+    不是线程安全的，由CaptureWriter的索引线程调用
+    """
+
+    def __init__(self, index_path, create=False):
+        """create: 新建（清空）索引文件，否则追加到已有的索引文件"""
+        self.path = index_path
+        self.ports = []  # 索引内串口编号 -> 串口名
+        self.count = 0
+        self.sorted = True
+        self._last_ns = 0
+        if create or not os.path.exists(index_path):
+            self._file = open(index_path, 'w+b', buffering=CAPTURE_BUFFER_SIZE)
+            self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_ENTRY.size, 0, 1))
+            self._file.write(bytes(INDEX_MAX_PORTS * INDEX_PORT_NAME_LEN))
+        else:
+            with CaptureIndex(index_path) as index:
+                self.ports = list(index.ports)
+                self.count = len(index)
+                self.sorted = index.sorted
+                self._last_ns = index.entry(self.count - 1).timestamp_ns if self.count else 0
+            self._file = open(index_path, 'r+b', buffering=CAPTURE_BUFFER_SIZE)
+            # 去掉写入时异常退出留下的不完整索引项
+            self._file.truncate(INDEX_DATA_START + self.count * INDEX_ENTRY.size)
+        self._file.seek(0, os.SEEK_END)
+        self._port_ids = {name: port for port, name in enumerate(self.ports)}
+        self._session_ports = {}  # 抓包会话内的串口号 -> 索引内串口编号
+        self._streams = {}  # (索引内串口编号, 方向) -> _Stream
+        self._wall_offset = 0
+
+    def _index_port(self, name):
+        port = self._port_ids.get(name)
+        if port is None:
+            port = len(self.ports)
+            if port >= INDEX_MAX_PORTS:
+                port = INDEX_MAX_PORTS - 1  # 串口表已满，归入最后一个串口
+            else:
+                self.ports.append(name)
+                self._port_ids[name] = port
+                self._file.seek(INDEX_HEADER.size + port * INDEX_PORT_NAME_LEN)
+                self._file.write(name.encode('utf-8')[:INDEX_PORT_NAME_LEN].ljust(INDEX_PORT_NAME_LEN, b'\0'))
+                self._file.seek(0, os.SEEK_END)
+        return port
+
+    def feed(self, offset, timestamp_ns, port_id, rec_type, data):
+        """
+        输入一条抓包记录（参数同capture.iter_raw_records()的返回值）
+        """
+        if rec_type == CAP_RX or rec_type == CAP_TX:
+            port = self._session_ports.get(port_id)
+            if port is None:
+                port = self._session_ports[port_id] = self._index_port(str(port_id))
+            stream = self._streams.get((port, rec_type))
+            if stream is None:
+                stream = self._streams[(port, rec_type)] = _Stream()
+            wall_ns = timestamp_ns + self._wall_offset
+            length = len(data)
+            if (not stream.buf and length >= LOCAL_FRAME_LEN_MIN and data[0] == 0x68
+                    and data[1] | (data[2] << 8) == length and data[length - 1] == 0x16):
+                # 按帧读取时一条记录正好是一帧：不经过待切帧缓冲区
+                self._add_entry(wall_ns, offset, 0, data, port, rec_type)
+                return
+            stream.append(offset, data)
+            self._scan(stream, wall_ns, port, rec_type)
+        elif rec_type == CAP_PORT_NAME:
+            self._session_ports[port_id] = self._index_port(bytes(data).decode('utf-8', errors='replace'))
+        elif rec_type == CAP_ANCHOR:
+            # 新的会话：串口号重新分配，上个会话未收完的帧丢弃
+            wall_ns, mono_ns = CAPTURE_ANCHOR.unpack(data)
+            self._wall_offset = wall_ns - mono_ns
+            self._session_ports = {}
+            self._streams = {}
+
+    def _scan(self, stream, wall_ns, port, direction):
+        """
+        从待切帧数据中切出完整的帧，帧的时间为收到最后一段数据的时间
+        帧的选取规则同comport.parse_process.FrameDecoder(keep_checksum_errors=True)：校验和错误的帧也索引（错误码0x03），
+        帧头之后数据不足时，后面已有完整且校验和正确的帧则丢弃假帧头从该帧同步
+        """
+        buf = stream.buf
+        pos = 0
+        size = len(buf)
+        while True:
+            pos = buf.find(0x68, pos)
+            if pos < 0:
+                pos = size
+                break
+            if size - pos < 3:
+                break
+            frame_len = buf[pos + 1] | (buf[pos + 2] << 8)
+            if frame_len < LOCAL_FRAME_LEN_MIN or frame_len > LOCAL_FRAME_LEN_MAX:
+                pos += 1
+                continue
+            if size - pos < frame_len:
+                resync = _find_valid_frame(buf, pos + 1, size)
+                if resync < 0:
+                    break
+                pos = resync
+                continue
+            end = pos + frame_len
+            if buf[end - 1] != 0x16:
+                pos += 1
+                continue
+            checksum_ok = sum(buf[pos + 3:end - 2]) & 0xFF == buf[end - 2]
+            record_offset, frame_pos = stream.locate(pos)
+            self._add_entry(wall_ns, record_offset, frame_pos, buf[pos:end], port, direction, checksum_ok)
+            pos = end if checksum_ok else pos + 1
+        stream.consume(pos)
+
+    def _add_entry(self, wall_ns, record_offset, pos, frame, port, direction, checksum_ok=None):
+        afn, fn, err, src, dst = index_frame(frame, checksum_ok)
+        self._file.write(INDEX_ENTRY.pack(wall_ns, record_offset, pos, len(frame), port, fn, direction, afn, err,
+                                          src, dst))
+        self.count += 1
+        if wall_ns < self._last_ns:
+            self.sorted = False
+        self._last_ns = wall_ns
+
+    def _write_header(self, source_size):
+        self._file.seek(0)
+        self._file.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, INDEX_ENTRY.size, source_size, self.sorted))
+        self._file.seek(0, os.SEEK_END)
+
+    def flush(self, source_size):
+        """写入已索引的抓包文件长度并flush到磁盘"""
+        if self._file is not None:
+            self._write_header(source_size)
+            self._file.flush()
+
+    def close(self, source_size):
+        if self._file is not None:
+            self._write_header(source_size)
+            self._file.close()
+            self._file = None
+
+
+def build_index(capture_path, index_path=None, source_size=None):
+    """
+    对已有的抓包文件建立（重建）索引，返回索引的帧数
+    先写入临时文件，完成后再替换原索引文件，不在原文件上清空重写
+    source_size: 只索引抓包文件的前source_size字节（其后正在追加的记录由CaptureWriter索引），None表示全部
+    """
+    index_path = index_path or index_path_for(capture_path)
+    tmp_path = index_path + '.tmp'
+    writer = IndexWriter(tmp_path, create=True)
+    try:
+        with open(capture_path, 'rb') as f:
+            for record in iter_raw_records(f):
+                if source_size is not None and record[0] >= source_size:
+                    break
+                writer.feed(*record)
+            if source_size is None:
+                source_size = f.tell()
+    except BaseException:
+        writer.close(0)
+        os.remove(tmp_path)
+        raise
+    writer.close(source_size)
+    os.replace(tmp_path, index_path)
+    return writer.count
+
+
+def index_up_to_date(capture_path, index_path=None, source_size=None):
+    """索引是否覆盖了抓包文件的全部内容（source_size: 只检查前source_size字节）"""
+    index_path = index_path or index_path_for(capture_path)
+    if not os.path.exists(index_path):
+        return False
+    try:
+        with CaptureIndex(index_path) as index:
+            if source_size is None:
+                source_size = os.path.getsize(capture_path)
+            return index.source_size == source_size
+    except (OSError, ValueError):
+        return False
+
+
+def open_index_writer(capture_path, index_path=None, source_size=None):
+    """
+    取边抓包边建立索引用的IndexWriter
+    抓包文件已有未索引的内容时先重建索引（耗时与抓包文件大小成正比），
+    抓包时传给CaptureWriter的是partial(open_index_writer, path)，在索引线程中调用
+    source_size: 抓包文件中已有内容的长度，None表示当前文件长度
+    """
+    index_path = index_path or index_path_for(capture_path)
+    if source_size is None:
+        source_size = os.path.getsize(capture_path) if os.path.exists(capture_path) else 0
+    if source_size and not index_up_to_date(capture_path, index_path, source_size):
+        build_index(capture_path, index_path, source_size)
+        return IndexWriter(index_path)
+    return IndexWriter(index_path, create=not source_size)
+
+
+class CaptureIndex:
+    """
+    索引查询（mmap只读）
+    用法：
+        with CaptureIndex("capture.bin.idx") as index:
+            for entry in index.query(afn=0x00, fn=2, addr=bytes.fromhex("010203040506")):
+                print(index.port_name(entry), entry.err)
+    """
+
+    def __init__(self, index_path):
+        self.path = index_path
+        self._file = open(index_path, 'rb')
+        header = self._file.read(INDEX_DATA_START)
+        if len(header) < INDEX_DATA_START:
+            self._file.close()
+            raise ValueError(f"索引文件不完整: {index_path}")
+        magic, version, entry_size, self.source_size, self.sorted = INDEX_HEADER.unpack_from(header)
+        if magic != INDEX_MAGIC or version > INDEX_VERSION or entry_size != INDEX_ENTRY.size:
+            self._file.close()
+            raise ValueError(f"不支持的索引文件: {index_path}")
+        self.ports = []
+        for i in range(INDEX_MAX_PORTS):
+            start = INDEX_HEADER.size + i * INDEX_PORT_NAME_LEN
+            name = header[start:start + INDEX_PORT_NAME_LEN].rstrip(b'\0')
+            if not name:
+                break
+            self.ports.append(name.decode('utf-8', errors='replace'))
+        self._count = (os.fstat(self._file.fileno()).st_size - INDEX_DATA_START) // INDEX_ENTRY.size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._count else None
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def entry(self, i):
+        """第i个索引项"""
+        return IndexEntry._make(INDEX_ENTRY.unpack_from(self._mmap, INDEX_DATA_START + i * INDEX_ENTRY.size))
+
+    def port_name(self, entry):
+        return self.ports[entry.port] if entry.port < len(self.ports) else str(entry.port)
+
+    def _bisect(self, wall_ns):
+        """第一个时间不早于wall_ns的索引项序号（索引项按时间有序时）"""
+        lo, hi = 0, self._count
+        unpack_from = struct.Struct('<q').unpack_from
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if unpack_from(self._mmap, INDEX_DATA_START + mid * INDEX_ENTRY.size)[0] < wall_ns:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, start=None, end=None, port=None, direction=None, afn=None, fn=None, addr=None, err=None):
+        """
+        按条件查询索引项，参数为None表示不按该项过滤
+        start/end: 时间范围（秒，time.time()格式），包含start不包含end
+        port: 串口名；direction: CAP_RX/CAP_TX；addr: 源地址或目的地址（6字节，帧中的字节顺序）
+        err: 错误码（0x03校验和错误，否认帧为否认原因）
+        """
+        if not self._count:
+            return
+        start_ns = int(start * 1e9) if start is not None else None
+        end_ns = int(end * 1e9) if end is not None else None
+        first, last = 0, self._count
+        if self.sorted:
+            if start_ns is not None:
+                first = self._bisect(start_ns)
+            if end_ns is not None:
+                last = self._bisect(end_ns)
+        port_id = None
+        if port is not None:
+            if port not in self.ports:
+                return
+            port_id = self.ports.index(port)
+        addr = bytes(addr) if addr is not None else None
+
+        # 逐项从mmap中解包（不导出缓冲区，查询中途退出时不影响close()）
+        unpack_from = INDEX_ENTRY.unpack_from
+        buf = self._mmap
+        for pos in range(INDEX_DATA_START + first * INDEX_ENTRY.size, INDEX_DATA_START + last * INDEX_ENTRY.size,
+                         INDEX_ENTRY.size):
+            fields = unpack_from(buf, pos)
+            wall_ns, _, _, _, entry_port, entry_fn, entry_dir, entry_afn, entry_err, src, dst = fields
+            if start_ns is not None and wall_ns < start_ns:
+                continue
+            if end_ns is not None and wall_ns >= end_ns:
+                continue
+            if port_id is not None and entry_port != port_id:
+                continue
+            if direction is not None and entry_dir != direction:
+                continue
+            if afn is not None and entry_afn != afn:
+                continue
+            if fn is not None and entry_fn != fn:
+                continue
+            if err is not None and entry_err != err:
+                continue
+            if addr is not None and src != addr and dst != addr:
+                continue
+            yield IndexEntry._make(fields)
+
+
+def read_frame(capture_file, entry):
+    """
+    从抓包文件（已用二进制模式打开）读取索引项对应的帧
+    帧可能跨越同一串口同一方向的多条记录
+    """
+    frame = bytearray()
+    session_port = rec_type = None
+    for _, _, port_id, record_type, data in iter_raw_records(capture_file, entry.record_offset):
+        if session_port is None:
+            session_port, rec_type = port_id, record_type
+            frame += data[entry.pos:entry.pos + entry.length]
+        elif record_type == CAP_ANCHOR:
+            break
+        elif port_id == session_port and record_type == rec_type:
+            frame += data[:entry.length - len(frame)]
+        if len(frame) >= entry.length:
+            break
+    return bytes(frame)
+
+
+def format_entry(index, entry):
+    """索引项格式化为一行文本"""
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.timestamp_ns // 1000000000))
+    millis = entry.timestamp_ns // 1000000 % 1000
+    direction = "收" if entry.direction == CAP_RX else "发"
+    text = f"[{stamp}.{millis:03d}] {index.port_name(entry)} [{direction}] AFN={entry.afn:02X} F{entry.fn}"
+    if entry.err != ErrorCode.FN_ACK_FFH:
+        text += f" 错误0x{entry.err:02X}"
+    if entry.src != NO_ADDR or entry.dst != NO_ADDR:
+        text += f" 源{entry.src.hex().upper()} 目的{entry.dst.hex().upper()}"
+    return text
+
+
+def _parse_time(text):
+    return time.mktime(time.strptime(text, "%Y-%m-%d %H:%M:%S"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="抓包文件帧索引")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="建立（重建）索引")
+    build.add_argument("path")
+    query = sub.add_parser("query", help="查询帧（索引不是最新时用临时索引）")
+    query.add_argument("path")
+    query.add_argument("--start", type=_parse_time, help="开始时间，如 2024-05-20 15:30:45")
+    query.add_argument("--end", type=_parse_time, help="结束时间（不含）")
+    query.add_argument("--port", help="串口名")
+    query.add_argument("--dir", choices=("rx", "tx"), help="方向")
+    query.add_argument("--afn", type=lambda v: int(v, 0))
+    query.add_argument("--fn", type=int)
+    query.add_argument("--addr", type=bytes.fromhex, help="源地址或目的地址（帧中的字节顺序，如010203040506）")
+    query.add_argument("--err", type=lambda v: int(v, 0), help="错误码，如0x03")
+    query.add_argument("--frames", action="store_true", help="同时输出帧内容")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        print(f"已索引{build_index(args.path)}帧: {index_path_for(args.path)}")
+        return
+
+    direction = {"rx": CAP_RX, "tx": CAP_TX}.get(args.dir)
+    count = 0
+    index_path = index_path_for(args.path)
+    with tempfile.TemporaryDirectory() as tmp:
+        if not index_up_to_date(args.path):
+            # 正在抓包时索引文件由CaptureWriter追加（文件头的抓包长度只在flush/close时更新），不能重建，
+            # 另建临时索引查询
+            index_path = os.path.join(tmp, os.path.basename(index_path))
+            print(f"索引不是最新，建立临时索引: 共{build_index(args.path, index_path)}帧")
+        with CaptureIndex(index_path) as index, open(args.path, 'rb') as capture_file:
+            for entry in index.query(args.start, args.end, args.port, direction, args.afn, args.fn, args.addr,
+                                     args.err):
+                line = format_entry(index, entry)
+                if args.frames:
+                    line += " " + read_frame(capture_file, entry).hex(' ').upper()
+                print(line)
+                count += 1
+    print(f"共{count}帧")
+
+
+if __name__ == "__main__":
+    main()
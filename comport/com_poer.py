@@ -1,22 +1,24 @@
-import time
-
 from PyQt6.QtCore import QThread, pyqtSignal
 import queue
-from protocol.gw13762 import gw13762_check, SApsAffair
+from protocol.gw13762 import gw13762_parse
 import log
+from log import log_wp
 from serial_thread import serial_fifo
-
-affair = SApsAffair()
+from comport.parse_process import FrameDecoder, FRAME_RESYNC_TIMEOUT
+from traffic_view import DIR_RX
 
 class ParsingThread(QThread):
     """协议解析线程"""
     parse_result_signal = pyqtSignal(str)  # 解析结果信号
     data_received = pyqtSignal(str)
+    frames_parsed = pyqtSignal(list)  # 一次解出的帧[(方向, 帧bytes, 错误码或None)]，送到收发记录视图
     def __init__(self):
         super().__init__()
 
         self.data_queue = queue.Queue()  # 数据队列
         self.running = True
+        # 流式帧解码，跨多次读取保留不完整的帧；校验和错误的帧也取出，在收发记录中显示为错误
+        self.decoder = FrameDecoder(keep_checksum_errors=True)
 
     def add_data(self, data):
         """添加待解析数据到队列"""
@@ -30,66 +32,51 @@ class ParsingThread(QThread):
     def run(self):
         """线程主函数（伪代码）"""
         self.parse_result_signal.emit("解析线程已启动")
-        start_idx = 0  # 帧头起始索引
-        found = False  # 是否找到帧头标志
         while self.running:
             try:
-                # 1. 从队列获取数据（超时100ms）
-                fifolen = serial_fifo.get_data_length()
-                if fifolen > 0:
-                    frame_data = serial_fifo.get(fifolen)
+                # 1. 阻塞等待串口线程写入数据（由put唤醒，stop()通过wakeup()打断，超时后检查等待中的帧头）
+                discarded = self.decoder.discarded
+                if serial_fifo.wait_for(1, timeout=FRAME_RESYNC_TIMEOUT):
+                    # 2. 取出fifo中的全部数据交给解码器：一次读到的多帧全部解出，不完整的帧留到下次，帧间的无效数据丢弃并计数
+                    frames = self.decoder.feed_fifo(serial_fifo)
+                elif self.decoder.pending:
+                    # 没有新数据时检查等待中的帧头是否超时
+                    frames = self.decoder.feed(None)
                 else:
-                    time.sleep(0.01)
-                    continue
-
-                # self.data_received.emit(data)
-                print(f"comport recv{frame_data}")
-                frame = affair.p_src.local
-                frame.datalen = len(frame_data)
-
-                # 1. 查找帧头0x68的位置
-                for i in range(len(frame_data)):
-                    if frame_data[i] == 0x68:  # ✅ 修复全角冒号为半角 :
-                        start_idx = i  # 记录帧头位置
-                        found = True
-                        break
-                # 2. 未找到帧头时跳过处理
-                if not found:
-                    self.parse_result_signal.emit("未找到帧头0x68，跳过无效数据")
-                    log.log_info(log.LOG_DEBUG_CMD, "未找到帧头0x68，跳过无效数据")
-                    continue
-
-                # 3. 仅复制帧头（0x68）之后的数据到frame.data
-                valid_length = len(frame_data) - start_idx  # 有效数据长度（从0x68开始）
-                frame.datalen = valid_length  # 更新实际数据长度
-
-                for i in range(valid_length):
-                    # 从帧头位置开始复制，填充到frame.data缓冲区
-                    frame.data[i] = frame_data[start_idx + i]
-                success, err = gw13762_check(affair, 1)
-                print(f"\n校验结果: {'成功' if success else '失败'}")
-                print(f"错误码: 0x{err:02X}")
-                if err != 0xFF:
-                    log_wp(frame_data)
-                    log_wp(f"校验失败: 错误码=0x{err:02X}")
                     continue
+                if self.decoder.discarded != discarded:
+                    message = f"跳过{self.decoder.discarded - discarded}字节无效数据"
+                    self.parse_result_signal.emit(message)
+                    log.log_info(log.LOG_DEBUG_CMD, message)
 
-                # ... 填充数据到affair对象 ...
-
-                # success, err = gw13762_check(affair, dir=0)  # 调用校验解析函数
-
-                # 3. 处理解析结果
-                if success:
-                    frame = affair.p_src.local.frame
-                    result = f"解析成功: AFN=0x{frame.afn:02X}, FN=0x{frame.fn:02X}, 数据长度={frame.bufflen}"
-                    self.parse_result_signal.emit(result)
-                else:
-                    self.parse_result_signal.emit(f"解析失败: 错误码=0x{err:02X}")
+                # 3. 逐帧校验解析，结果一次送到收发记录视图
+                if frames:
+                    self.frames_parsed.emit([(DIR_RX, data, self._parse(data)) for data in frames])
             except Exception as e:
                 self.parse_result_signal.emit(f"解析线程异常: {str(e)}")
                 log_wp(f"解析线程异常: {str(e)}")
 
+    def _parse(self, data):
+        """校验解析一帧并发出结果，返回错误码（成功时为None）"""
+        debug = log.trace_enabled(log.TRACE_DEBUG)
+        if debug:
+            log.trace(log.TRACE_DEBUG, "comport recv %s", data.hex(' ').upper())
+
+        frame, err = gw13762_parse(data, 1)
+        if debug:
+            log.trace(log.TRACE_DEBUG, "校验结果: %s, 错误码: 0x%02X", '成功' if frame is not None else '失败', err)
+        if frame is None:
+            log_wp(data.hex(' ').upper())
+            log_wp(f"校验失败: 错误码=0x{err:02X}")
+            self.parse_result_signal.emit(f"解析失败: 错误码=0x{err:02X}")
+            return int(err)
+
+        result = f"解析成功: AFN=0x{frame.afn:02X}, FN=0x{frame.fn:02X}, 数据长度={len(frame.data)}"
+        self.parse_result_signal.emit(result)
+        return None
+
     def stop(self):
         """停止线程"""
         self.running = False
+        serial_fifo.wakeup()
         self.wait()
\ No newline at end of file
@@ -0,0 +1,252 @@
+#这个文件提供从fifo中取帧的公共函数、流式帧解码（FrameDecoder），以及独立进程的1376.2协议解析：
+#串口读线程所在进程通过 ShmKFifoAps 把数据交给解析进程，解析与调试输出不再与串口读取、GUI争抢GIL
+
+import ctypes
+import multiprocessing
+import time
+
+from protocol.gw13762 import gw13762_parse, LOCAL_FRAME_LEN_MIN, LOCAL_FRAME_LEN_MAX
+
+# 帧头之后的数据不足长度域时最多等待的时间（秒），超时后丢弃该帧头重新同步
+FRAME_RESYNC_TIMEOUT = 0.5
+
+
+def _find_valid_frame(buf, start, end):
+    """
+    在buf[start:end]中查找第一个完整且校验和正确的帧
+    用于帧头之后数据不足时向后查看：长度域过大的假帧头后面可能已经有完整的帧
+    返回: 帧头位置，没有时返回-1
+    """
+    pos = buf.find(0x68, start, end)
+    while pos >= 0 and end - pos >= LOCAL_FRAME_LEN_MIN:
+        frame_len = buf[pos + 1] | (buf[pos + 2] << 8)
+        if LOCAL_FRAME_LEN_MIN <= frame_len <= end - pos:
+            frame_end = pos + frame_len
+            if buf[frame_end - 1] == 0x16 and sum(buf[pos + 3:frame_end - 2]) & 0xFF == buf[frame_end - 2]:
+                return pos
+        pos = buf.find(0x68, pos + 1, end)
+    return -1
+
+
+def load_complete_frame(fifo, affair):
+    """
+    按长度域从fifo中取出一个完整帧到affair的接收缓冲区，帧之后的数据留在fifo中
+    长度或帧尾不合法的假帧头只丢弃1字节后重新查找0x68
+    帧头之后数据不足长度域时，若后面已有完整且校验和正确的帧，丢弃假帧头从该帧重新同步
+    fifo: KFifoAps
+    返回: True已取出完整帧，False数据不足（等待更多数据）
+    """
+    frame = affair.p_src.local
+    while True:
+        fifo.discard_until(0x68)
+        if fifo.get_data_length() < 3:
+            return False
+
+        low, high = fifo.read_index(1, 2)
+        frame_len = low | (high << 8)
+        if frame_len < LOCAL_FRAME_LEN_MIN or frame_len > LOCAL_FRAME_LEN_MAX:
+            fifo.commit(1)
+            continue
+        available = fifo.get_data_length()
+        if available < frame_len:
+            pending = bytearray(available)
+            fifo.readinto(pending)
+            pos = _find_valid_frame(pending, 1, available)
+            if pos < 0:
+                return False
+            fifo.commit(pos)
+            continue
+
+        frame.datalen = fifo.readinto(memoryview(frame.data)[:frame_len])
+        if frame.data[frame_len - 1] != 0x16:
+            fifo.commit(1)
+            continue
+        fifo.commit(frame_len)
+        return True
+
+
+def load_frame_bytes(affair, data):
+    """
+    把一帧完整数据（如SerialInterface.read_frame的结果）拷贝到affair的接收缓冲区
+    data: bytes/bytearray，超出接收缓冲区的部分丢弃
+    """
+    frame = affair.p_src.local
+    n = min(len(data), len(frame.data))
+    ctypes.memmove(frame.data, bytes(data[:n]), n)
+    frame.datalen = n
+
+
+class FrameDecoder:
+    """
+    流式1376.2帧解码：feed()输入任意分段的数据，返回其中所有完整且校验和正确的帧
+    不完整的帧保留到下次输入；帧头0x68之后长度、帧尾或校验和不合法时只丢弃这1字节，从下一个0x68重新同步
+    帧头之后数据不足长度域时：后面已有完整且校验和正确的帧则丢弃假帧头从该帧同步，
+    否则最多等待timeout秒（由之后的feed()/feed(None)检查），超时后丢弃该帧头
+    每个字节只在查找帧头和校验帧时各扫描一次，输入后整体压缩一次缓冲区
+    用法：
+        decoder = FrameDecoder()
+        for frame in decoder.feed(data):
+            frame_obj, err = gw13762_parse(frame, 1)
+    """
+
+    def __init__(self, timeout=FRAME_RESYNC_TIMEOUT, keep_checksum_errors=False):
+        """
+        timeout: 帧头之后数据不足时最多等待的时间（秒），None表示不超时（由调用者按字节间超时调用skip_head()）
+        keep_checksum_errors: 校验和错误的帧也按位置顺序返回（之后gw13762_parse返回0x03，用于显示错误帧）
+        """
+        self._buf = bytearray()
+        self.timeout = timeout
+        self.keep_checksum_errors = keep_checksum_errors
+        self._wait_since = None  # 缓冲区开头的帧头开始等待后续数据的时间
+        self.frames = 0  # 已解出的帧数
+        self.discarded = 0  # 丢弃的字节数（帧之间的无效数据、假帧头）
+        self.checksum_errors = 0  # 帧头、长度、帧尾正确但校验和错误的次数
+
+    @property
+    def pending(self):
+        """缓冲区中等待后续数据的字节数"""
+        return len(self._buf)
+
+    def reset(self):
+        """丢弃缓冲区中的数据（如重新打开串口后）"""
+        self.discarded += len(self._buf)
+        self._buf.clear()
+        self._wait_since = None
+
+    def skip_head(self):
+        """
+        丢弃缓冲区开头等待后续数据的帧头（1字节），从下一个0x68重新同步（如字节间超时、帧不完整时）
+        返回: 重新同步后解出的帧列表
+        """
+        if not self._buf:
+            return []
+        del self._buf[:1]
+        self.discarded += 1
+        self._wait_since = None
+        return self.feed(None)
+
+    def feed(self, data):
+        """
+        输入一段数据
+        data: bytes/bytearray/memoryview，None表示只处理缓冲区中已有的数据
+        返回: 解出的帧（bytes）列表
+        """
+        buf = self._buf
+        if data is not None:
+            buf += data
+        frames = []
+        pos = 0
+        size = len(buf)
+        wait_since = self._wait_since
+        self._wait_since = None
+        while True:
+            start = buf.find(0x68, pos)
+            if start < 0:
+                self.discarded += size - pos
+                pos = size
+                break
+            self.discarded += start - pos
+            pos = start
+            if size - pos < 3:
+                break
+            frame_len = buf[pos + 1] | (buf[pos + 2] << 8)
+            if frame_len < LOCAL_FRAME_LEN_MIN or frame_len > LOCAL_FRAME_LEN_MAX:
+                self.discarded += 1
+                pos += 1
+                continue
+            if size - pos < frame_len:
+                resync = _find_valid_frame(buf, pos + 1, size)
+                if resync >= 0:
+                    self.discarded += resync - pos
+                    pos = resync
+                    continue
+                if self.timeout is None:
+                    break
+                now = time.monotonic()
+                if pos == 0 and wait_since is not None:
+                    # 上次就在等待这个帧头
+                    if now - wait_since >= self.timeout:
+                        self.discarded += 1
+                        pos += 1
+                        wait_since = None
+                        continue
+                    self._wait_since = wait_since
+                else:
+                    self._wait_since = now
+                break
+            end = pos + frame_len
+            if buf[end - 1] != 0x16:
+                self.discarded += 1
+                pos += 1
+                continue
+            if sum(buf[pos + 3:end - 2]) & 0xFF != buf[end - 2]:
+                self.checksum_errors += 1
+                if self.keep_checksum_errors:
+                    frames.append(bytes(buf[pos:end]))
+                self.discarded += 1
+                pos += 1
+                continue
+            frames.append(bytes(buf[pos:end]))
+            self.frames += 1
+            pos = end
+        if pos:
+            del buf[:pos]
+        return frames
+
+    def feed_fifo(self, fifo):
+        """
+        取出fifo（KFifoAps/ShmKFifoAps）中的全部数据输入解码器，返回解出的帧列表
+        """
+        buf = self._buf
+        n = fifo.get_data_length()
+        if n:
+            start = len(buf)
+            buf += bytes(n)
+            with memoryview(buf) as view:
+                got = fifo.readinto(view[start:])
+            del buf[start + got:]
+            fifo.commit(got)
+        return self.feed(None)
+
+    def stats(self):
+        return {'frames': self.frames, 'discarded': self.discarded, 'checksum_errors': self.checksum_errors,
+                'pending': self.pending}
+
+
+class ParseProcess(multiprocessing.Process):
+    """协议解析进程：从共享内存fifo取数据校验，结果通过results队列返回"""
+
+    def __init__(self, fifo, dir=1):
+        """
+        fifo: ShmKFifoAps实例（传入子进程时按名称重新挂接）
+        dir: 预期传输方向，同gw13762_check
+        """
+        super().__init__(daemon=True)
+        self.fifo = fifo
+        self.dir = dir
+        # 结果元组：(校验结果, 错误码, AFN, FN, 数据长度)
+        self.results = multiprocessing.Queue()
+        self._stop_event = multiprocessing.Event()
+
+    def run(self):
+        """进程主循环"""
+        decoder = FrameDecoder()
+        while not self._stop_event.is_set():
+            if self.fifo.wait_for(1, timeout=0.1):
+                frames = decoder.feed_fifo(self.fifo)
+            elif decoder.pending:
+                frames = decoder.feed(None)  # 没有新数据时检查等待中的帧头是否超时
+            else:
+                continue
+            for data in frames:
+                frame, err = gw13762_parse(data, self.dir)
+                if frame is not None:
+                    self.results.put((True, int(err), frame.afn, frame.fn, len(frame.data)))
+                else:
+                    self.results.put((False, int(err), 0, 0, 0))
+        self.fifo.close()
+
+    def stop(self, timeout=1.0):
+        """通知解析进程退出并等待"""
+        self._stop_event.set()
+        self.join(timeout)
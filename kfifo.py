@@ -1,139 +1,438 @@
+import contextlib
+import threading
+import time
+from enum import IntEnum
+
 from log import log_wp
 
+# 非同步模式下使用的空锁
+_NO_LOCK = contextlib.nullcontext()
+
+
+def _roundup_pow_of_two(n):
+    """向上取整到2的幂，对应C中的roundup_pow_of_two"""
+    if n <= 1:
+        return 1
+    return 1 << (n - 1).bit_length()
+
+
+class OverflowPolicy(IntEnum):
+    """队列满时put的处理策略"""
+    TRUNCATE = 0  # 写入能放下的部分，其余丢弃（原有行为）
+    REJECT = 1  # 空间不足时整块拒绝，不写入任何数据
+    DROP_OLDEST = 2  # 丢弃队列中最旧的数据，为新数据腾出空间
+    BLOCK = 3  # 阻塞等待消费者腾出空间，超时后丢弃剩余部分（需同步模式）
+    GROW = 4  # 扩容（2的幂）直到max_size，仍放不下时截断
+
 
 class KFifoAps:
-    """环形队列实现，对应C语言中的kfifo_aps"""
+    """环形队列实现，对应C语言中的kfifo_aps
+
+    与内核kfifo一致：缓冲区大小为2的幂，in/out为只增不减的读写计数，
+    取下标时与mask相与，数据长度为 in - out，读写均为O(1)的切片拷贝。
+
+    sync=True 时为线程安全的同步模式：所有操作在条件变量下进行，put 写入后唤醒等待者，
+    消费者可用 get(n, timeout) / wait_for(min_len) 阻塞等待数据，无需轮询休眠。
+
+    队列满时的行为由policy（OverflowPolicy）决定，写入/丢弃字节数、最高水位和溢出次数
+    通过 stats() 获取，便于按实际波特率评估队列大小。
+    """
 
     # 环形缓冲大小，对应C中的FIFO_QUEUE_LEN
     FIFO_QUEUE_LEN = 32 * 256 * 2
 
-    def __init__(self, buffer_size=None):
-        """初始化环形队列"""
+    def __init__(self, buffer_size=None, sync=False, policy=OverflowPolicy.TRUNCATE,
+                 max_size=None, put_timeout=None):
+        """
+        初始化环形队列（大小向上取整为2的幂）
+        sync: 是否启用线程安全的同步模式（生产者/消费者位于不同线程时使用）
+        policy: 队列满时的处理策略（OverflowPolicy）
+        max_size: GROW策略下允许扩容到的最大容量
+        put_timeout: BLOCK策略下put等待空间的超时时间（秒），None表示一直等待
+        """
+        if policy == OverflowPolicy.BLOCK and not sync:
+            raise ValueError("BLOCK策略需要同步模式（sync=True）")
         # 如果未指定大小，使用默认队列长度
-        self.size = buffer_size if buffer_size else self.FIFO_QUEUE_LEN
-        self.buffer = [0] * self.size
-        self.in_pos = 0  # 写入位置，对应C中的in
-        self.out_pos = 0  # 读取位置，对应C中的out
-        self.length = 0  # 当前数据长度
+        self.size = _roundup_pow_of_two(buffer_size if buffer_size else self.FIFO_QUEUE_LEN)
+        self.mask = self.size - 1
+        self.buffer = bytearray(self.size)
+        self.in_pos = 0  # 写入计数，对应C中的in
+        self.out_pos = 0  # 读取计数，对应C中的out
+
+        self.sync = sync
+        self._cond = threading.Condition() if sync else None
+        self._lock = self._cond if sync else _NO_LOCK
+        self._wakeups = 0  # wakeup()调用计数，用于打断等待
+
+        self.policy = OverflowPolicy(policy)
+        self.max_size = _roundup_pow_of_two(max_size) if max_size else self.size
+        self.put_timeout = put_timeout
+        self.reset_stats()
+
+    @property
+    def length(self):
+        """当前数据长度"""
+        return self.in_pos - self.out_pos
 
     def get_remaining_length(self):
         """获取fifo剩余空间大小，对应get_kfifo_aps_len"""
-        return self.size - self.length
+        return self.size - (self.in_pos - self.out_pos)
+
+    @staticmethod
+    def _to_buffer(data):
+        """
+        把输入数据统一为可切片的字节缓冲
+        bytes/bytearray/memoryview直接使用（不逐字节检查），整数列表交给bytes()在C层校验
+        返回None表示数据类型不支持
+        """
+        if isinstance(data, (bytes, bytearray)):
+            return data
+        if isinstance(data, memoryview):
+            return data if data.format == 'B' and data.ndim == 1 else data.cast('B')
+        if isinstance(data, list):
+            try:
+                return bytes(data)
+            except (TypeError, ValueError):
+                print("put错误：列表元素不是有效字节值（0-255的整数）")
+                return None
+        log_wp(f"put错误：不支持的数据类型 {type(data)}，仅允许bytes/bytearray/memoryview或整数列表")
+        return None
+
+    def _copy_in(self, src, n):
+        """把src前n字节写到in位置（处理回绕）"""
+        off = self.in_pos & self.mask
+        first = min(n, self.size - off)
+        self.buffer[off:off + first] = src[:first]
+        if n > first:
+            self.buffer[:n - first] = src[first:n]
+        self.in_pos += n
+
+    def _copy_out(self, index, n):
+        """从out+index位置拷贝n字节（处理回绕），不移动读指针"""
+        off = (self.out_pos + index) & self.mask
+        first = min(n, self.size - off)
+        if first == n:
+            return self.buffer[off:off + n]
+        return self.buffer[off:] + self.buffer[:n - first]
+
+    def _advance_out(self, n):
+        """移动读指针；队列读空时复位读写计数，使后续数据尽量保持连续"""
+        self.out_pos += n
+        if self.out_pos == self.in_pos:
+            self.in_pos = self.out_pos = 0
+        if self.policy == OverflowPolicy.BLOCK:
+            # 唤醒等待空间的生产者
+            self._cond.notify_all()
+
+    def _grow(self, need):
+        """扩容到能容纳need字节（不超过max_size），数据搬到新缓冲区开头"""
+        new_size = min(_roundup_pow_of_two(need), self.max_size)
+        if new_size <= self.size:
+            return
+        length = self.in_pos - self.out_pos
+        new_buffer = bytearray(new_size)
+        new_buffer[:length] = self._copy_out(0, length)
+        self.buffer = new_buffer
+        self.size = new_size
+        self.mask = new_size - 1
+        self.out_pos = 0
+        self.in_pos = length
 
     def put(self, data):
         """
         向kfifo中添加数据，对应kfifo_aps_put
-        data: 要添加的字节数据（bytes或整数列表，元素0-255）
-        返回实际添加的数据长度
+        data: 要添加的数据（bytes/bytearray/memoryview或整数列表，元素0-255）
+        返回实际添加的数据长度（空间不足时按policy处理，被丢弃的部分计入stats）
         """
-        # 修复1：检查数据类型（仅允许bytes或整数列表）
-        if not isinstance(data, (bytes, list)):
-            log_wp(f"put错误：不支持的数据类型 {type(data)}，仅允许bytes或整数列表")
+        src = self._to_buffer(data)
+        if src is None or not len(src):
             return 0
 
-        # 修复2：若为bytes类型，转换为整数列表（与缓冲区存储格式统一）
-        if isinstance(data, bytes):
-            data = list(data)  # bytes → [0x01, 0x02, ...]（整数列表）
-
-        # 修复3：检查列表元素是否为有效字节值（0-255的整数）
-        if isinstance(data, list):
-            for i, byte in enumerate(data):
-                if not isinstance(byte, int) or byte < 0 or byte > 255:
-                    print(f"put错误：列表元素 {i} 不是有效字节值（{byte}）")
+        src = memoryview(src)
+        data_len = len(src)
+        with self._lock:
+            free = self.size - (self.in_pos - self.out_pos)
+            if data_len > free:
+                self._overflow_events += 1
+                if self.policy == OverflowPolicy.REJECT:
+                    self._dropped += data_len
                     return 0
+                if self.policy == OverflowPolicy.DROP_OLDEST:
+                    if data_len > self.size:
+                        # 新数据本身超过容量：只保留最后size字节
+                        self._dropped += data_len - self.size
+                        src = src[data_len - self.size:]
+                    drop = len(src) - free
+                    self._dropped += drop
+                    self.out_pos += drop
+                elif self.policy == OverflowPolicy.GROW:
+                    self._grow(self.in_pos - self.out_pos + data_len)
+                elif self.policy == OverflowPolicy.BLOCK:
+                    return self._put_blocking(src)
+
+            add_len = min(len(src), self.size - (self.in_pos - self.out_pos))
+            self._dropped += len(src) - add_len
+            if add_len <= 0:
+                return 0
+            self._copy_in(src, add_len)
+            self._account(add_len)
+        return add_len
 
-        if not data:
-            return 0
-
-        # 原有逻辑：计算可添加长度（保持不变）
-        if self.length > self.FIFO_QUEUE_LEN:
-            self.length = self.FIFO_QUEUE_LEN
-            return 0
-
-        data_len = len(data)
-        if (self.length + data_len) > self.FIFO_QUEUE_LEN:
-            add_len = self.FIFO_QUEUE_LEN - self.length
-        else:
-            add_len = data_len
-
-        if add_len <= 0:
-            return 0
-
-        # 复制数据到缓冲区（此时data已确保为整数列表，可安全赋值）
-        start = self.length
-        self.buffer[start:start + add_len] = data[:add_len]
-        self.length += add_len
+    def _put_blocking(self, src):
+        """BLOCK策略：边写边等待空间，超时后丢弃剩余部分（调用者需持有锁）"""
+        deadline = None if self.put_timeout is None else time.monotonic() + self.put_timeout
+        wakeups = self._wakeups
+        written = 0
+        while True:
+            n = min(len(src) - written, self.size - (self.in_pos - self.out_pos))
+            if n > 0:
+                self._copy_in(src[written:], n)
+                self._account(n)
+                written += n
+            if written == len(src) or self._wakeups != wakeups:
+                break
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._cond.wait(remaining)
+        self._dropped += len(src) - written
+        return written
+
+    def _account(self, n):
+        """记录写入统计并唤醒消费者（调用者需持有锁）"""
+        self._accepted += n
+        length = self.in_pos - self.out_pos
+        if length > self._high_water:
+            self._high_water = length
+        if self._cond is not None:
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        获取队列统计信息
+        返回字典：accepted写入字节数、dropped丢弃字节数、high_water最高水位、
+        overflow_events溢出次数，以及当前size/length/policy
+        """
+        with self._lock:
+            return {
+                'accepted': self._accepted,
+                'dropped': self._dropped,
+                'high_water': self._high_water,
+                'overflow_events': self._overflow_events,
+                'size': self.size,
+                'length': self.in_pos - self.out_pos,
+                'policy': self.policy.name,
+            }
+
+    def reset_stats(self):
+        """清零统计信息"""
+        with self._lock:
+            self._accepted = 0
+            self._dropped = 0
+            self._high_water = self.in_pos - self.out_pos
+            self._overflow_events = 0
+
+    def _wait(self, min_len, timeout):
+        """在条件变量下等待数据长度达到min_len（调用者需持有锁），返回是否满足"""
+        if self.in_pos - self.out_pos >= min_len:
+            return True
+        if self._cond is None or timeout == 0:
+            return False
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        wakeups = self._wakeups
+        while self.in_pos - self.out_pos < min_len:
+            if self._wakeups != wakeups:
+                return False
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            self._cond.wait(remaining)
+        return True
+
+    def wait_for(self, min_len=1, timeout=None):
+        """
+        等待队列中至少有min_len字节数据（仅同步模式有效）
+        timeout: 超时时间（秒），None表示一直等待
+        返回: 数据是否已满足；超时或被wakeup()打断时返回False
+        """
+        with self._lock:
+            return self._wait(min_len, timeout)
 
-        return add_len
+    def wakeup(self):
+        """唤醒所有等待中的消费者（如线程退出时），被唤醒的等待返回False"""
+        if self._cond is None:
+            return
+        with self._cond:
+            self._wakeups += 1
+            self._cond.notify_all()
 
-    def get(self, length):
+    def get(self, length, timeout=0):
         """
         从kfifo中取数据，对应kfifo_aps_get
         length: 要读取的数据长度
-        返回读取到的数据（字节列表）
+        timeout: 队列为空时的等待时间（秒，仅同步模式有效），0不等待，None一直等待
+        返回读取到的数据（字节列表），有多少取多少，最多length字节
         """
-        if length <= 0 or self.length == 0:
-            return []
-
-        # 计算实际可读取的长度
-        read_len = min(length, self.length)
-        if read_len <= 0:
+        if length <= 0:
             return []
 
-        # 读取数据
-        data = self.buffer[:read_len]
-
-        # 移动剩余数据
-        for i in range(self.length - read_len):
-            self.buffer[i] = self.buffer[i + read_len]
+        with self._lock:
+            if not self._wait(1, timeout):
+                return []
 
-        self.length -= read_len
-        return data
+            read_len = min(length, self.in_pos - self.out_pos)
+            data = self._copy_out(0, read_len)
+            self._advance_out(read_len)
+        return list(data)
 
     def free(self, length):
         """释放指定长度的kfifo空间，对应kfifo_aps_free"""
         if length <= 0:
             return
+        with self._lock:
+            self._advance_out(min(length, self.in_pos - self.out_pos))
+
+    def peek_views(self, length=None):
+        """
+        零拷贝查看队列头部数据，不移动读指针
+        length: 要查看的长度，None表示全部数据
+        返回memoryview片段列表：数据未回绕时1段，回绕时2段，无数据时为空列表
+        注意：片段直接引用内部缓冲区，处理完成后应调用commit()，且在commit之前有效
+        """
+        with self._lock:
+            avail = self.in_pos - self.out_pos
+            n = avail if length is None else min(length, avail)
+            if n <= 0:
+                return []
+
+            view = memoryview(self.buffer)
+            off = self.out_pos & self.mask
+            first = min(n, self.size - off)
+            if first == n:
+                return [view[off:off + n]]
+            return [view[off:], view[:n - first]]
+
+    def readinto(self, buf, index=0):
+        """
+        把队列数据直接拷贝到调用者提供的缓冲区（bytearray、ctypes数组等），不移动读指针
+        buf: 目标缓冲区，最多填满len(buf)字节
+        index: 起始索引（相对于当前读位置）
+        返回实际拷贝的字节数，配合commit()消费数据
+        """
+        dst = memoryview(buf)
+        if dst.format != 'B' or dst.ndim != 1:
+            dst = dst.cast('B')
+
+        with self._lock:
+            n = min(len(dst), self.in_pos - self.out_pos - index)
+            if index < 0 or n <= 0:
+                return 0
+
+            src = memoryview(self.buffer)
+            off = (self.out_pos + index) & self.mask
+            first = min(n, self.size - off)
+            dst[:first] = src[off:off + first]
+            if n > first:
+                dst[first:n] = src[:n - first]
+        return n
+
+    def commit(self, length):
+        """
+        确认消费length字节（移动读指针），配合peek_views()/readinto()使用
+        返回实际消费的字节数
+        """
+        if length <= 0:
+            return 0
+        with self._lock:
+            n = min(length, self.in_pos - self.out_pos)
+            self._advance_out(n)
+        return n
 
-        if length >= self.FIFO_QUEUE_LEN or length >= self.length:
-            self.length = 0
-        else:
-            # 移动数据
-            for i in range(self.length - length):
-                self.buffer[i] = self.buffer[i + length]
-            self.length -= length
+    def find(self, pattern, start=0):
+        """
+        在队列数据中查找字节或字节串（C层bytearray.find，跨回绕边界）
+        pattern: 单个字节值（int）或bytes/bytearray
+        start: 起始索引（相对于当前读位置）
+        返回匹配位置（相对于当前读位置），未找到返回-1
+        """
+        if isinstance(pattern, int):
+            pattern = bytes((pattern,))
+        plen = len(pattern)
+
+        with self._lock:
+            avail = self.in_pos - self.out_pos
+            if start < 0 or start + plen > avail:
+                return -1
+
+            # 第一段：从start到缓冲区末尾（或数据末尾）
+            off = (self.out_pos + start) & self.mask
+            first = min(avail - start, self.size - off)
+            pos = self.buffer.find(pattern, off, off + first)
+            if pos >= 0:
+                return start + pos - off
+
+            rest = avail - start - first
+            if rest <= 0:
+                return -1
+
+            # 跨越回绕边界的匹配：只需拼接边界两侧各plen-1字节
+            if plen > 1:
+                head = min(plen - 1, first)
+                seam = self.buffer[off + first - head:off + first] + self.buffer[:min(plen - 1, rest)]
+                pos = seam.find(pattern)
+                if pos >= 0:
+                    return start + first - head + pos
+
+            # 第二段：缓冲区开头
+            pos = self.buffer.find(pattern, 0, rest)
+            if pos >= 0:
+                return start + first + pos
+            return -1
+
+    def discard_until(self, pattern):
+        """
+        丢弃pattern之前的所有数据，使读位置对齐到pattern
+        未找到时丢弃全部数据，但保留末尾len(pattern)-1字节（可能是不完整的pattern）
+        返回丢弃的字节数
+        """
+        plen = 1 if isinstance(pattern, int) else len(pattern)
+        with self._lock:
+            pos = self.find(pattern)
+            if pos < 0:
+                pos = max(self.in_pos - self.out_pos - (plen - 1), 0)
+            self._advance_out(pos)
+        return pos
 
     def get_data_length(self):
         """获取kfifo当前数据长度，对应kfifo_aps_datalen_get"""
-        return self.length
+        return self.in_pos - self.out_pos
 
     def read(self, length):
         """读取kfifo中的数据，不清空fifo，对应kfifo_read"""
-        if length <= 0 or self.length == 0:
-            return []
-
-        read_len = min(length, self.length)
-        return self.buffer[:read_len].copy()
+        with self._lock:
+            read_len = min(length, self.in_pos - self.out_pos)
+            if read_len <= 0:
+                return []
+            return list(self._copy_out(0, read_len))
 
     def read_index(self, index, length):
         """
         从指定索引读取数据，对应kfifo_aps_read_index
-        index: 起始索引
+        index: 起始索引（相对于当前读位置）
         length: 要读取的长度
         返回读取到的数据
         """
-        if self.length > self.FIFO_QUEUE_LEN:
-            self.length = self.FIFO_QUEUE_LEN
-
-        # 检查索引是否有效
-        if index < 0 or (index + length) > self.length:
-            return []
+        with self._lock:
+            # 检查索引是否有效
+            if index < 0 or length <= 0 or (index + length) > (self.in_pos - self.out_pos):
+                return []
 
-        return self.buffer[index:index + length].copy()
+            return list(self._copy_out(index, length))
 
     def __str__(self):
         """打印队列信息"""
-        return f"KFifoAps(size={self.size}, length={self.length}, data={self.buffer[:self.length]})"
+        return f"KFifoAps(size={self.size}, length={self.length}, data={self.read(self.length)})"
 
 
 # 使用示例
@@ -1,3 +1,11 @@
+import atexit
+import glob
+import gzip
+import lzma
+import os
+import queue
+import shutil
+import threading
 import time
 
 # 移除未使用的循环导入：from test import Protocol13762
@@ -11,52 +19,349 @@ DEBUG_FILE_PATH = './debug.txt'
 # 协议交互日志
 Protocol13762_LOG_FILE_PATH = './protocol13762.txt'
 
+# 后台写日志：调用者只入队，写线程保持文件打开、批量写入并按周期flush
+LOG_QUEUE_MAX = 10000  # 队列最多缓存的日志条数，写线程跟不上时丢弃新日志（计入dropped_count()）
+LOG_FLUSH_INTERVAL = 0.5  # flush到磁盘的周期（秒）
+LOG_CONSOLE_ECHO = False  # 是否同时打印到控制台（调试时打开），见set_console_echo()
+
+# 日志切分：文件超过大小或写入时间超过周期时改名为 <文件名>.<时间> 并由压缩线程压缩，见set_rotation()
+# 写入时间从文件中第一条日志的时间算起（程序重启后继续写入已有文件时也按该时间切分）
+LOG_ROTATE_MAX_BYTES = 10 * 1024 * 1024  # 单个日志文件的最大字节数，0表示不按大小切分
+LOG_ROTATE_INTERVAL = 24 * 3600  # 切分周期（秒），0表示不按时间切分
+LOG_ROTATE_KEEP = 20  # 每个日志文件保留的历史文件个数，超出后删除最旧的
+LOG_COMPRESS = 'gzip'  # 历史文件压缩格式：'gzip'、'lzma'或None（不压缩）
+
+# 调试跟踪级别：协议校验/解析等热路径的调试信息按级别输出到debug.txt，关闭时只有一次整数比较的开销
+TRACE_OFF = 0
+TRACE_ERROR = 1  # 校验失败原因
+TRACE_DEBUG = 2  # 每帧的原始数据与各字段解析过程
+TRACE_LEVEL = int(os.environ.get('LOG_TRACE_LEVEL', TRACE_OFF))  # 当前级别，见set_trace_level()
+
+_COMPRESSORS = {
+    'gzip': (gzip.open, '.gz'),
+    'lzma': (lzma.open, '.xz'),
+}
+
 # 新增：全局存储 plainTextEdit_3 控件引用
 _plain_text_edit_3 = None
+# 收发记录模型（traffic_view.TrafficLogModel），设置后界面日志写入模型而不是plainTextEdit_3
+_traffic_model = None
+
+_CMD_FILE_PATHS = {
+    LOG_OPT_CMD: LOG_FILE_PATH,
+    LOG_DEBUG_CMD: DEBUG_FILE_PATH,
+    LOG_PROTOCOL_CMD: Protocol13762_LOG_FILE_PATH,
+}
+
+
+def rotated_files(path):
+    """日志文件的历史文件列表（含压缩后的），按时间从旧到新排列"""
+    suffixes = tuple(suffix for _, suffix in _COMPRESSORS.values())
+
+    def key(name):
+        # 按去掉压缩后缀的文件名排序：<文件名>.<时间> 在同一秒切分的 <文件名>.<时间>-1、-2 ... -10 之前
+        if name.endswith(suffixes):
+            name = os.path.splitext(name)[0]
+        stamp, _, index = name[len(path) + 1:].rpartition('-')
+        if len(stamp) == 15 and index.isdigit():
+            return stamp, int(index)
+        return name[len(path) + 1:], 0
+
+    return sorted(glob.glob(glob.escape(path) + '.*'), key=key)
+
+
+class _LogCompressor(threading.Thread):
+    """压缩线程：压缩切分出的历史文件并删除超出保留个数的旧文件，不阻塞写日志"""
+
+    def __init__(self):
+        super().__init__(name="log-compressor", daemon=True)
+        # 队列元素：(日志文件路径, 历史文件路径) 或 None（退出）
+        self.queue = queue.Queue()
+
+    def _compress(self, rotated):
+        compressor = _COMPRESSORS.get(LOG_COMPRESS)
+        if compressor is None:
+            return
+        open_func, suffix = compressor
+        if not os.path.exists(rotated):
+            return  # 切分较快时，排队中的历史文件可能已被前一次清理删除
+        with open(rotated, 'rb') as src, open_func(rotated + suffix, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+        os.remove(rotated)
+
+    def _prune(self, path):
+        if LOG_ROTATE_KEEP <= 0:
+            return
+        for old in rotated_files(path)[:-LOG_ROTATE_KEEP]:
+            os.remove(old)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                break
+            path, rotated = item
+            try:
+                self._compress(rotated)
+                self._prune(path)
+            except Exception as e:
+                print(f"压缩日志失败: {e}")
+
+
+def _file_start_time(path):
+    """已有日志文件开始写入的时间：第一条日志的时间戳，无法解析（非本模块写入）时用文件修改时间"""
+    try:
+        with open(path, encoding='utf-8', errors='replace') as f:
+            first = f.readline(64)
+        return time.mktime(time.strptime(first[1:20], "%Y-%m-%d %H:%M:%S"))
+    except (OSError, ValueError, OverflowError):
+        return os.path.getmtime(path)
+
+
+class _LogWriter(threading.Thread):
+    """日志写线程：文件句柄常驻，队列中的日志批量写入"""
+
+    def __init__(self):
+        super().__init__(name="log-writer", daemon=True)
+        # 队列元素：(文件路径, 时间戳time.time(), 前缀, 内容) 或 threading.Event（flush请求）
+        self.queue = queue.Queue(maxsize=LOG_QUEUE_MAX)
+        self.files = {}
+        self.sizes = {}  # 文件路径 -> 当前文件字节数
+        self.opened = {}  # 文件路径 -> 当前文件开始写入的时间（第一条日志的时间）
+        self.last_rotated = {}  # 文件路径 -> 上次切分的(时间, 序号)，同一秒内的序号只增不减
+        self.dropped = 0
+        self.pid = os.getpid()
+        self._stopping = False
+        self.compressor = _LogCompressor()
+        self.compressor.start()
+
+    def _file(self, path):
+        log_file = self.files.get(path)
+        if log_file is None:
+            log_file = self.files[path] = open(path, 'a', encoding='utf-8')
+            self.sizes[path] = log_file.tell()
+            self.opened[path] = _file_start_time(path) if self.sizes[path] else time.time()
+        return log_file
+
+    def _need_rotate(self, path, now):
+        if LOG_ROTATE_MAX_BYTES > 0 and self.sizes[path] >= LOG_ROTATE_MAX_BYTES:
+            return True
+        return LOG_ROTATE_INTERVAL > 0 and now - self.opened[path] >= LOG_ROTATE_INTERVAL
+
+    def _rotate(self, path):
+        """关闭当前文件并改名，交给压缩线程，下次写入时重新打开"""
+        self.files.pop(path).close()
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        last_stamp, last_index = self.last_rotated.get(path, (None, -1))
+        # 同一秒内的文件可能已被清理删除，序号不能复用，否则新文件会排在旧文件之前
+        index = last_index + 1 if stamp == last_stamp else 0
+        while True:
+            rotated = f"{path}.{stamp}-{index}" if index else f"{path}.{stamp}"
+            if not (os.path.exists(rotated) or glob.glob(glob.escape(rotated) + '.*')):
+                break
+            index += 1
+        self.last_rotated[path] = (stamp, index)
+        try:
+            os.replace(path, rotated)
+        except OSError as e:
+            # 文件被其他程序占用等：继续写当前文件，写满下一个周期后再切分
+            print(f"切分日志失败: {e}")
+            self._file(path)
+            self.sizes[path] = 0
+            self.opened[path] = time.time()
+            return
+        self.compressor.queue.put((path, rotated))
+
+    def _flush_files(self):
+        for log_file in self.files.values():
+            log_file.flush()
+
+    def _write(self, item):
+        path, stamp, prefix, content = item
+        # 获取当前时间并格式化为字符串（例如：2024-05-20 15:30:45）
+        current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(stamp))
+        # 拼接日志内容：[时间戳] 日志信息
+        log_content = f"[{current_time}] {prefix}{content}"
+        self._file(path).write(log_content + "\n")
+        self.sizes[path] += len(log_content.encode('utf-8')) + len(os.linesep)
+        if self._need_rotate(path, time.time()):
+            self._rotate(path)
+        if LOG_CONSOLE_ECHO:
+            print(log_content)
+
+    def run(self):
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self.queue.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                item = None
+            # 一次取出队列中已有的全部日志
+            batch = [] if item is None else [item]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            events = []
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    events.append(item)
+                    continue
+                try:
+                    self._write(item)
+                except Exception as e:
+                    print(f"写日志失败: {e}")
+
+            now = time.monotonic()
+            if events or now - last_flush >= LOG_FLUSH_INTERVAL:
+                self._flush_files()
+                last_flush = now
+            for event in events:
+                event.set()
+            if self._stopping and self.queue.empty():
+                break
+        for log_file in self.files.values():
+            log_file.close()
+        self.files.clear()
+        self.compressor.queue.put(None)
 
+    def put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
 
-# 定义日志写入函数（每次调用生成当前时间戳）
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def _get_writer():
+    """取日志写线程，首次调用或fork出的子进程中启动新的写线程"""
+    global _writer
+    writer = _writer
+    if writer is not None and writer.pid == os.getpid():
+        return writer
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = _LogWriter()
+            _writer.start()
+        return _writer
+
+
+def _enqueue(path, prefix, content):
+    _get_writer().put((path, time.time(), prefix, content))
+
+
+def flush(timeout=2.0):
+    """等待已入队的日志全部写入并flush到磁盘，返回是否在超时前完成"""
+    event = threading.Event()
+    try:
+        _get_writer().queue.put(event, timeout=timeout)
+    except queue.Full:
+        return False
+    return event.wait(timeout)
+
+
+def shutdown(timeout=2.0):
+    """写完剩余日志并关闭日志文件（程序退出时自动调用）"""
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+    if writer is None or writer.pid != os.getpid():
+        return
+    writer._stopping = True
+    writer.put(threading.Event())  # 唤醒写线程
+    writer.join(timeout)
+    # 等待正在压缩的历史文件完成
+    writer.compressor.join(timeout)
+
+
+atexit.register(shutdown)
+
+
+def set_console_echo(enabled):
+    """设置日志是否同时打印到控制台"""
+    global LOG_CONSOLE_ECHO
+    LOG_CONSOLE_ECHO = enabled
+
+
+def set_trace_level(level):
+    """设置调试跟踪级别：TRACE_OFF/TRACE_ERROR/TRACE_DEBUG"""
+    global TRACE_LEVEL
+    TRACE_LEVEL = level
+
+
+def trace_enabled(level):
+    """该级别的调试跟踪是否打开"""
+    return TRACE_LEVEL >= level
+
+
+def trace(level, msg, *args):
+    """
+    输出调试跟踪信息到debug.txt（级别未打开时直接返回）
+    msg中的%格式化只在级别打开时进行，热路径中应先用局部变量缓存trace_enabled()的结果再调用
+    """
+    if TRACE_LEVEL >= level:
+        log_info(LOG_DEBUG_CMD, msg % args if args else msg)
+
+
+def set_rotation(max_bytes=None, interval=None, keep=None, compress=False):
+    """
+    设置日志切分，参数为None（compress为False）时保持原设置
+    max_bytes: 单个日志文件的最大字节数，0表示不按大小切分
+    interval: 切分周期（秒），0表示不按时间切分
+    keep: 每个日志文件保留的历史文件个数，0表示不删除
+    compress: 'gzip'、'lzma'或None（不压缩）
+    """
+    global LOG_ROTATE_MAX_BYTES, LOG_ROTATE_INTERVAL, LOG_ROTATE_KEEP, LOG_COMPRESS
+    if max_bytes is not None:
+        LOG_ROTATE_MAX_BYTES = max_bytes
+    if interval is not None:
+        LOG_ROTATE_INTERVAL = interval
+    if keep is not None:
+        LOG_ROTATE_KEEP = keep
+    if compress is not False:
+        if compress is not None and compress not in _COMPRESSORS:
+            raise ValueError(f"不支持的压缩格式: {compress}")
+        LOG_COMPRESS = compress
+
+
+def dropped_count():
+    """队列满时丢弃的日志条数"""
+    return _writer.dropped if _writer is not None else 0
+
+
+# 定义日志写入函数（调用者只入队，时间戳在调用时记录）
 def log_wp(log):
-    log_file = open(LOG_FILE_PATH, 'a', encoding='utf-8')
-    # 获取当前时间并格式化为字符串（例如：2024-05-20 15:30:45）
-    current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-    # 拼接日志内容：[时间戳] 日志信息
-    log_content = f"[{current_time}] {log}\n"
-    log_file.write(log_content)
-    log_file.flush()  # 立即写入磁盘
-    print(log_content.strip())  # 打印时移除末尾换行符
-    log_file.close()
+    _enqueue(LOG_FILE_PATH, "", log)
 
 
 def log_info(cmd, info):
-    # 用 if-elif-else 替代 match-case，兼容 Python 3.10 以下版本
-    if cmd == LOG_OPT_CMD:
-        log_file = open(LOG_FILE_PATH, 'a', encoding='utf-8')
-    elif cmd == LOG_DEBUG_CMD:
-        log_file = open(DEBUG_FILE_PATH, 'a', encoding='utf-8')
-    elif cmd == LOG_PROTOCOL_CMD:
-        log_file = open(Protocol13762_LOG_FILE_PATH, 'a', encoding='utf-8')
-    else:
+    # 按日志命令选择日志文件
+    path = _CMD_FILE_PATHS.get(cmd)
+    if path is None:
         log_wp(f"无效日志命令: {cmd}")
         return
-
-    # 获取当前时间并格式化为字符串（例如：2024-05-20 15:30:45）
-    current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
-    # 拼接日志内容：[时间戳] 日志信息
-    log_content = f"[{current_time}] {cmd} {info}\n"
-    log_file.write(log_content)
-    log_file.flush()  # 立即写入磁盘
-    print(log_content.strip())  # 打印时移除末尾换行符
-    log_file.close()
+    _enqueue(path, f"{cmd} ", info)
 
 def set_plain_text_edit_3(widget):
     """设置 plainTextEdit_3 文本框控件引用（由主窗口调用）"""
     global _plain_text_edit_3
     _plain_text_edit_3 = widget
 
+def set_traffic_model(model):
+    """设置收发记录模型（由主窗口调用），之后write_to_plain_text_3写入该模型"""
+    global _traffic_model
+    _traffic_model = model
+
 def write_to_plain_text_3(text):
-    """往 plainTextEdit_3 文本框中追加内容"""
-    if _plain_text_edit_3 is not None:
+    """往 plainTextEdit_3 文本框中追加内容（设置了收发记录模型时写入模型）"""
+    if _traffic_model is not None:
+        _traffic_model.append_text(text)
+    elif _plain_text_edit_3 is not None:
         current_time = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
         _plain_text_edit_3.appendPlainText(f"[{current_time}] {text}")
         # 滚动到底部，确保最新内容可见
@@ -1,6 +1,7 @@
 import sys
 import time
 import os
+from functools import partial
 import log
 import config
 from PyQt6 import QtWidgets, QtCore
@@ -9,14 +10,24 @@ from PyQt6.QtCore import QThread, pyqtSignal
 import main_interface
 import Upgrade_file_opt
 from main_interface import Ui_MainWindow
-from serial_bsp import SerialInterface
+from serial_bsp import SerialInterface, READ_MODE_FRAME
 from Upgrade_file_opt import get_file_version
 from serial_thread import SerialThread
+from traffic_view import TrafficView, DIR_TX
+from capture import CaptureWriter, CAPTURE_FILE_PATH, CAPTURE_ENABLED
+from capture_index import open_index_writer
 from comport.com_poer import ParsingThread
+from port_registry import port_registry
 
 # 初始化日志和串口接口
 log_wp = log.log_wp
 serial_if = SerialInterface()
+serial_if.read_mode = READ_MODE_FRAME  # 按1376.2帧长读取，收到帧尾立即交给解析线程
+# 原始收发数据抓包（python capture.py text 转为文本），同时建立帧索引（python capture_index.py query 查询）
+# 抓包文件只增不减，默认关闭（SERIAL_CAPTURE=1打开）；已有抓包的索引补建在抓包的索引线程中进行，不阻塞启动
+capture_writer = None
+if CAPTURE_ENABLED:
+    capture_writer = CaptureWriter(CAPTURE_FILE_PATH, indexer=partial(open_index_writer, CAPTURE_FILE_PATH))
 
 
 class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
@@ -43,10 +54,18 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.pushButton_feil2.clicked.connect(lambda: self.select_file("file2"))
         self.pushButtonupgrade.clicked.connect(self.upgrade_start)
 
+        # 收发记录视图替换plainTextEdit_3（固定容量，只绘制可见行）
+        self.traffic_view = TrafficView(parent=self.centralwidget)
+        self.traffic_view.setGeometry(self.plainTextEdit_3.geometry())
+        self.plainTextEdit_3.hide()
+        log.set_traffic_model(self.traffic_view.log_model)
+
         # 初始化串口线程
         self.serial_thread = SerialThread(serial_if)    #把bsp的串口传给线程，让它去循环的读取数据
-        self.serial_thread.data_received.connect(log.write_to_plain_text_3)
+        # 收发记录：发送的数据和解析线程解出的帧（含AFN/FN/错误码），帧间的无效数据由解析线程记为日志
+        self.serial_thread.data_sent.connect(partial(self.traffic_view.log_model.append, DIR_TX))
         self.serial_thread.start_thread()  # 启动串口线程
+        port_registry.start()  # 串口插拔检测：枚举结果缓存，插拔时（或按周期）才重新枚举
 
 
 
@@ -59,12 +78,7 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
         self.parse_thread = ParsingThread()
         # ✅ 连接解析线程的信号到日志显示（使用正确的信号名称）
         self.parse_thread.parse_result_signal.connect(log.write_to_plain_text_3)
-        self.parse_thread.start()  # ✅ 使用QThread内置的start()方法启动线程
-
-        # 初始化处理响应函数
-        self.parse_thread = ParsingThread()
-        # ✅ 连接解析线程的信号到日志显示（使用正确的信号名称）
-        self.parse_thread.parse_result_signal.connect(log.write_to_plain_text_3)
+        self.parse_thread.frames_parsed.connect(self.traffic_view.log_model.append_frames)
         self.parse_thread.start()  # ✅ 使用QThread内置的start()方法启动线程
 
         # 配置SpinBox
@@ -96,6 +110,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
                 self.serial_open = success
 
                 if self.serial_open:
+                    if capture_writer is not None:
+                        serial_if.set_capture(capture_writer, self.serial_input.split(',')[0])
                     config.serial_status = "打开"
                     self.actionNULL1.setText("关闭串口")
                     log_wp(f"串口已打开，参数：{self.serial_input}")
@@ -123,6 +139,8 @@ class MainWindow(QtWidgets.QMainWindow, Ui_MainWindow):
             except Exception as e:
                 log.write_to_plain_text_3(f"关闭串口异常: {str(e)}")
 
+            if capture_writer is not None:
+                capture_writer.flush()
             log_wp(f"串口已关闭")
 
     def select_file(self, file_type):
@@ -262,4 +280,7 @@ if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
     main_window = MainWindow()
     main_window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    exit_code = app.exec()
+    if capture_writer is not None:
+        capture_writer.close()
+    sys.exit(exit_code)
\ No newline at end of file
@@ -0,0 +1,178 @@
+#这个文件提供串口注册表：枚举一次串口并缓存（含USB VID/PID/序列号），之后只做低成本的变化检测，
+#检测到串口插拔时才重新枚举，并通过回调通知订阅者（多工位时可自动为新插入的适配器建立会话）
+#Linux下变化检测只列举sysfs(/sys/class/tty)和/dev/serial/by-id；其他平台没有低成本的变化检测，
+#缓存首次枚举的结果，只在检测线程中按较长的周期（PORT_FORCE_REFRESH_INTERVAL）、列出串口时（ports(rescan=True)）
+#或refresh(force=True)时重新枚举
+
+import os
+import threading
+import time
+
+import serial.tools.list_ports
+
+import log
+
+# 插拔检测周期（秒）
+PORT_POLL_INTERVAL = 1.0
+# 没有低成本变化检测的平台上，检测线程重新枚举的周期（秒）；comports()在Windows上需要查询设备管理器，不宜频繁调用
+PORT_FORCE_REFRESH_INTERVAL = 30.0
+SYSFS_TTY_PATH = "/sys/class/tty"
+DEV_SERIAL_BY_ID_PATH = "/dev/serial/by-id"
+
+# 插拔事件
+PORT_ADDED = "added"
+PORT_REMOVED = "removed"
+
+
+def port_info_to_dict(port):
+    """pyserial的ListPortInfo转为缓存用的字典"""
+    return {
+        'device': port.device,
+        'description': port.description,
+        'hwid': port.hwid,
+        'vid': port.vid,
+        'pid': port.pid,
+        'serial_number': port.serial_number,
+        'location': port.location,
+    }
+
+
+class PortRegistry(threading.Thread):
+    """
+    串口注册表
+    用法：
+        port_registry.subscribe(callback)  # callback(事件, 串口信息字典)，在检测线程中调用
+        port_registry.start()              # 开始后台插拔检测（可选）
+        port_registry.devices()            # 缓存的串口号列表
+        port_registry.devices(rescan=True) # 列给用户选择前确认是最新的
+    """
+
+    def __init__(self, poll_interval=PORT_POLL_INTERVAL, force_interval=PORT_FORCE_REFRESH_INTERVAL):
+        super().__init__(daemon=True)
+        self.poll_interval = poll_interval
+        self.force_interval = force_interval
+        self._ports = {}  # 设备名 -> 串口信息字典
+        self._fingerprint = None  # 上次枚举时的变化检测结果
+        self._enumerated = False
+        self._enumerated_at = 0.0  # 上次枚举的时间（time.monotonic()）
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.enumerations = 0  # 实际调用comports()的次数
+
+    def subscribe(self, callback):
+        """订阅插拔事件：callback(PORT_ADDED/PORT_REMOVED, 串口信息字典)"""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """取消订阅"""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _scan_fingerprint(self):
+        """
+        低成本的串口变化检测：列举sysfs中带设备的tty和/dev/serial/by-id
+        返回可比较的结果，不支持的平台返回None（每次都需要重新枚举）
+        """
+        if not os.path.isdir(SYSFS_TTY_PATH):
+            return None
+        ttys = tuple(sorted(name for name in os.listdir(SYSFS_TTY_PATH)
+                            if os.path.exists(os.path.join(SYSFS_TTY_PATH, name, "device"))))
+        by_id = tuple(sorted(os.listdir(DEV_SERIAL_BY_ID_PATH))) if os.path.isdir(DEV_SERIAL_BY_ID_PATH) else ()
+        return ttys, by_id
+
+    def _enumerate(self):
+        """完整枚举串口（较慢）"""
+        return [port_info_to_dict(port) for port in serial.tools.list_ports.comports()]
+
+    def refresh(self, force=False):
+        """
+        检测串口变化，有变化（或force）时重新枚举并通知订阅者
+        不支持变化检测的平台上只有force时才重新枚举（检测线程每force_interval秒force一次）
+        返回: 本次的事件列表[(事件, 串口信息字典)]
+        """
+        fingerprint = self._scan_fingerprint()
+        if self._enumerated and not force and fingerprint == self._fingerprint:
+            return []
+
+        ports = {info['device']: info for info in self._enumerate()}
+        self.enumerations += 1
+        self._enumerated_at = time.monotonic()
+        with self._lock:
+            old = self._ports
+            self._ports = ports
+            self._fingerprint = fingerprint
+            notify = self._enumerated
+            self._enumerated = True
+            subscribers = list(self._subscribers)
+
+        events = [(PORT_REMOVED, info) for device, info in old.items() if device not in ports]
+        events += [(PORT_ADDED, info) for device, info in ports.items() if device not in old]
+        # 首次枚举只建立缓存，不作为插拔事件通知
+        if notify:
+            for event, info in events:
+                for callback in subscribers:
+                    try:
+                        callback(event, info)
+                    except Exception as e:
+                        log.log_wp(f"串口插拔回调异常: {e}")
+        return events
+
+    def ports(self, rescan=False):
+        """
+        缓存的串口信息列表；检测线程未运行时先做一次变化检测
+        rescan: 确认结果是最新的（如列出串口给用户选择时）：不支持变化检测的平台上重新枚举，其他平台做一次变化检测
+        """
+        if rescan:
+            self.refresh(force=self._fingerprint is None)
+        elif not self.is_alive():
+            self.refresh()
+        with self._lock:
+            return list(self._ports.values())
+
+    def devices(self, rescan=False):
+        """缓存的串口号列表，rescan同ports()"""
+        return [info['device'] for info in self.ports(rescan)]
+
+    def find(self, vid=None, pid=None, serial_number=None):
+        """按USB VID/PID/序列号查找串口，返回串口信息列表"""
+        return [info for info in self.ports()
+                if (vid is None or info['vid'] == vid)
+                and (pid is None or info['pid'] == pid)
+                and (serial_number is None or info['serial_number'] == serial_number)]
+
+    def run(self):
+        """插拔检测线程"""
+        while not self._stop_event.is_set():
+            try:
+                # 不支持变化检测的平台按较长的周期重新枚举
+                self.refresh(force=self._fingerprint is None
+                             and time.monotonic() - self._enumerated_at >= self.force_interval)
+            except Exception as e:
+                log.log_wp(f"串口插拔检测失败: {e}")
+            self._stop_event.wait(self.poll_interval)
+
+    def stop(self, timeout=1.0):
+        """停止插拔检测线程"""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+# 全局串口注册表
+port_registry = PortRegistry()
+
+
+if __name__ == "__main__":
+    # 打印当前串口，之后持续打印插拔事件
+    for info in port_registry.ports():
+        print(info)
+    port_registry.subscribe(lambda event, info: print(f"{time.strftime('%H:%M:%S')} {event}: {info}"))
+    port_registry.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        port_registry.stop()
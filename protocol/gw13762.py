@@ -1,12 +1,26 @@
 import ctypes
+import struct
 from enum import IntEnum
-from typing import Tuple
+from typing import Optional, Tuple
+
+import log
+from log import trace, TRACE_ERROR, TRACE_DEBUG
 
 # 常量定义
 LOCAL_ADDR_LEN = 6
 LOCAL_FRAME_LEN_MIN = 15
+LOCAL_FRAME_LEN_MAX = 4096  # 接收缓冲区大小（SLocalFrame.data）
 HOST_NODE = 0  # 主节点标识（无地址域）
 
+# AFN=15H 文件传输（F1 文件传输方式1）
+AFN_FILE_TRANSFER = 0x15
+FILE_ID_LOCAL_MODULE = 0x03  # 文件标识：本地通信模块升级文件
+FILE_ATTR_MIDDLE = 0x00  # 文件属性：起始帧、中间帧
+FILE_ATTR_END = 0x01  # 文件属性：结束帧
+FILE_CMD_PACKET = 0x00  # 文件指令：报文方式装载
+# 文件标识(1) + 文件属性(1) + 文件指令(1) + 总段数(2) + 段标识(4) + 段数据长度(2)
+FILE_SEGMENT_HEADER = struct.Struct('<BBBHIH')
+
 
 # 错误码枚举
 class ErrorCode(IntEnum):
@@ -16,6 +30,13 @@ class ErrorCode(IntEnum):
     FN_DENY_05H = 0x05  # 格式错误
 
 
+# 帧头(1) + 长度(2) + 控制域(1) + 信息域(6)
+FRAME_HEAD = struct.Struct('<BHB6s')
+# AFN(1) + DT1(1) + DT2(1)
+FRAME_AFN = struct.Struct('<BBB')
+_DT1_TO_FN = {1: 1, 2: 2, 4: 3, 8: 4, 16: 5, 32: 6, 64: 7, 128: 8}
+
+
 # 预定义数组类型
 Uint8Array6 = ctypes.c_uint8 * 6
 Uint8Array5 = ctypes.c_uint8 * 5
@@ -110,9 +131,7 @@ class SApsAffair(ctypes.Structure):
 
 def gw13762_dt_to_fn(dt1: int, dt2: int) -> int:
     """将DT1和DT2转换为FN码"""
-    tmp_x = 0
-    dt1_map = {1: 1, 2: 2, 4: 3, 8: 4, 16: 5, 32: 6, 64: 7, 128: 8}
-    tmp_x = dt1_map.get(dt1, 0)
+    tmp_x = _DT1_TO_FN.get(dt1, 0)
     return (tmp_x + (dt2 << 3)) if tmp_x else 0
 
 
@@ -128,159 +147,178 @@ def gw13762_fn_to_dt(fn: int) -> Tuple[int, int]:
     return dt1_rev_map.get(dt1_val, 0), dt2
 
 
-def gw13762_check(p_affair, dir: int) -> Tuple[bool, int]:
+class Frame13762:
     """
-    GW13762协议帧校验函数（带调试信息）
+    gw13762_parse解析出的帧
+    src/relay/dst/data为原始数据的memoryview切片（不拷贝），原始数据被覆盖后内容随之改变，需要保留时用bytes()拷贝；
+    原始数据为bytearray时，帧对象释放前不能改变其长度
+    无地址域时src/relay/dst为空
     """
-    crc = 0
-    tmp_buf = None
-    relaylen = 0
-    datalen = 0
-
-    # 获取帧数据
-    plocal_src = ctypes.pointer(p_affair.p_src.local)
-    p_rx = ctypes.pointer(plocal_src.contents.frame)
-    p_rxbuf = (ctypes.c_uint8 * plocal_src.contents.datalen).from_address(
-        ctypes.addressof(plocal_src.contents.data)
-    )
-
-    # 调试信息：打印原始数据
-    print("\n原始帧数据:")
-    print([hex(p_rxbuf[i]) for i in range(plocal_src.contents.datalen)])
-
-    # 拷贝信息域（至少需要10字节数据）
-    if plocal_src.contents.datalen >= 10:
-        # 信息域从第4字节开始，共6字节
-        tmp_buf = (ctypes.c_uint8 * 6).from_address(
-            ctypes.addressof(p_rxbuf) + 4  # p_rxbuf[4:]开始的6字节
-        )
-        # 复制到info.buff
-        for i in range(6):
-            p_rx.contents.info.buff[i] = tmp_buf[i]
-    else:
-        print("调试：数据长度不足10字节，无法解析信息域")
-        return False, ErrorCode.FN_DENY_05H
+    __slots__ = ('length', 'ctrl', 'info', 'src', 'relay', 'dst', 'afn', 'fn', 'data', 'cs')
+
+    def __init__(self, length, ctrl, info, src, relay, dst, afn, fn, data, cs):
+        self.length = length  # 帧长
+        self.ctrl = ctrl  # 控制域字节
+        self.info = info  # 信息域6字节（bytes）
+        self.src = src  # 源地址
+        self.relay = relay  # 中继地址（中继级别 * 6字节）
+        self.dst = dst  # 目的地址
+        self.afn = afn
+        self.fn = fn
+        self.data = data  # 数据域
+        self.cs = cs  # 校验和
+
+    @property
+    def dir(self):
+        return self.ctrl >> 7
+
+    @property
+    def prm(self):
+        return (self.ctrl >> 6) & 0x01
+
+    @property
+    def mode(self):
+        return self.ctrl & 0x3F
+
+    @property
+    def module_id(self):
+        return (self.info[0] >> 2) & 0x01
+
+    @property
+    def relay_lev(self):
+        return self.info[0] >> 4
+
+    @property
+    def serial_num(self):
+        return self.info[5]
+
+    def __repr__(self):
+        return (f"Frame13762(afn=0x{self.afn:02X}, fn={self.fn}, dir={self.dir}, length={self.length}, "
+                f"data={bytes(self.data).hex(' ').upper()})")
+
+
+def gw13762_parse(data, dir: int) -> Tuple[Optional[Frame13762], int]:
+    """
+    GW13762协议帧校验与解析（直接解析字节数据，不经过ctypes结构，数据域不拷贝）
+    data: bytes/bytearray/memoryview，从帧头0x68开始（帧之后可以有多余数据）
+    dir: 预期传输方向（0:下行, 1:上行）
+    返回: (Frame13762, FN_ACK_FFH) 或 (None, 错误码)，错误码同gw13762_check
+    调试信息（原始数据、各字段解析过程、失败原因）由log.set_trace_level()打开，输出到debug.txt
+    """
+    # 跟踪级别只判断一次，关闭时不格式化任何调试信息
+    trace_level = log.TRACE_LEVEL
+    debug = trace_level >= TRACE_DEBUG
+    error = trace_level >= TRACE_ERROR
+
+    buf = data if isinstance(data, memoryview) else memoryview(data)
+    if buf.format != 'B':
+        buf = buf.cast('B')
+    size = len(buf)
+    if debug:
+        trace(TRACE_DEBUG, "原始帧数据: %s", bytes(buf).hex(' ').upper())
+
+    # 至少需要帧头、长度、控制域和信息域
+    if size < FRAME_HEAD.size:
+        if error:
+            trace(TRACE_ERROR, "调试：数据长度不足10字节，无法解析信息域")
+        return None, ErrorCode.FN_DENY_05H
+    header, datalen, ctrl, info = FRAME_HEAD.unpack_from(buf)
 
     # 检测帧头
-    if p_rxbuf[0] != 0x68:
-        print(f"调试：帧头错误，预期0x68，实际0x{p_rxbuf[0]:02X}")
-        return False, ErrorCode.FN_DENY_05H
-
-    # 解析长度（大端模式）
-    datalen = (p_rxbuf[2] << 8) | p_rxbuf[1]
-    print(f"调试：解析得到长度: {datalen}")
+    if header != 0x68:
+        if error:
+            trace(TRACE_ERROR, "调试：帧头错误，预期0x68，实际0x%02X", header)
+        return None, ErrorCode.FN_DENY_05H
+    if debug:
+        trace(TRACE_DEBUG, "调试：解析得到长度: %d", datalen)
 
     # 检测长度合法性
-    if datalen < LOCAL_FRAME_LEN_MIN or plocal_src.contents.datalen < datalen:
-        print(f"调试：长度错误，datalen={datalen}, 实际数据长度={plocal_src.contents.datalen}")
-        return False, ErrorCode.FN_DENY_02H
-
-    # 解析控制域并检测方向
-    p_rx.contents.ctrl.ctrl = p_rxbuf[3]
-    print(f"调试：控制域值=0x{p_rxbuf[3]:02X}, 解析得到方向={p_rx.contents.ctrl.bit.dir}, 预期方向={dir}")
-    if p_rx.contents.ctrl.bit.dir != dir:
-        print(f"调试：方向错误，预期{dir}，实际{p_rx.contents.ctrl.bit.dir}")
-        return False, ErrorCode.FN_DENY_05H
+    if datalen < LOCAL_FRAME_LEN_MIN or size < datalen:
+        if error:
+            trace(TRACE_ERROR, "调试：长度错误，datalen=%d, 实际数据长度=%d", datalen, size)
+        return None, ErrorCode.FN_DENY_02H
+
+    # 检测方向
+    frame_dir = ctrl >> 7
+    if debug:
+        trace(TRACE_DEBUG, "调试：控制域值=0x%02X, 解析得到方向=%d, 预期方向=%d", ctrl, frame_dir, dir)
+    if frame_dir != dir:
+        if error:
+            trace(TRACE_ERROR, "调试：方向错误，预期%d，实际%d", dir, frame_dir)
+        return None, ErrorCode.FN_DENY_05H
 
     # 检测帧尾
-    if p_rxbuf[datalen - 1] != 0x16:
-        print(f"调试：帧尾错误，预期0x16，实际0x{p_rxbuf[datalen - 1]:02X}")
-        return False, ErrorCode.FN_DENY_05H
-
-    # 保存基本信息
-    p_rx.contents.header = p_rxbuf[0]
-    p_rx.contents.length = datalen
-    p_rx.contents.end_char = p_rxbuf[datalen - 1]
-
-    # 计算并校验校验和
-    crc = p_rxbuf[3]  # 从控制域开始计算
-    for i in range(datalen - 6):
-        crc += p_rxbuf[4 + i]
-    crc &= 0xFF  # 确保是8位
-    print(f"调试：计算得到校验和=0x{crc:02X}, 帧中校验和=0x{p_rxbuf[datalen - 2]:02X}")
-    if p_rxbuf[datalen - 2] != crc:
-        return False, ErrorCode.FN_DENY_03H
-
-    # 处理地址域和功能码
-    print(f"调试：module_id={p_rx.contents.info.down.module_id}, HOST_NODE={HOST_NODE}")
-    if p_rx.contents.info.down.module_id == HOST_NODE:
-        # 无地址域情况 - 正确解析AFN和FN的位置
-        if tmp_buf:
-            # AFN位于信息域后的第一个字节
-            afn_pos = 4 + 6  # 帧头(1) + 长度(2) + 控制域(1) + 信息域(6) = 10字节，AFN在第11字节
-            p_rx.contents.afn = p_rxbuf[afn_pos] if afn_pos < datalen else 0
-
-            dt1_pos = afn_pos + 1  # DT1在AFN后
-            dt2_pos = afn_pos + 2  # DT2在DT1后
-            dt1 = p_rxbuf[dt1_pos] if dt1_pos < datalen else 0
-            dt2 = p_rxbuf[dt2_pos] if dt2_pos < datalen else 0
-            p_rx.contents.fn = gw13762_dt_to_fn(dt1, dt2)
-
-            print(f"调试：无地址域 - AFN位置={afn_pos}, DT1位置={dt1_pos}, DT2位置={dt2_pos}")
-            print(f"调试：AFN=0x{p_rx.contents.afn:02X}, DT1=0x{dt1:02X}, DT2=0x{dt2:02X}, FN=0x{p_rx.contents.fn:02X}")
-
-            # 处理数据域
-            p_rx.contents.bufflen = datalen - LOCAL_FRAME_LEN_MIN
-            data_start = afn_pos + 3  # 数据在DT2之后
-            for i in range(p_rx.contents.bufflen):
-                if data_start + i < datalen - 2:  # 减去校验和和帧尾
-                    p_rx.contents.buff[i] = p_rxbuf[data_start + i]
+    if buf[datalen - 1] != 0x16:
+        if error:
+            trace(TRACE_ERROR, "调试：帧尾错误，预期0x16，实际0x%02X", buf[datalen - 1])
+        return None, ErrorCode.FN_DENY_05H
+
+    # 校验和：控制域到数据域结束的字节和
+    cs = buf[datalen - 2]
+    crc = sum(buf[3:datalen - 2]) & 0xFF
+    if debug:
+        trace(TRACE_DEBUG, "调试：计算得到校验和=0x%02X, 帧中校验和=0x%02X", crc, cs)
+    if cs != crc:
+        if error:
+            trace(TRACE_ERROR, "调试：校验和错误，计算得到0x%02X，帧中为0x%02X", crc, cs)
+        return None, ErrorCode.FN_DENY_03H
+
+    # 地址域：通信模块标识为主节点时没有地址域
+    module_id = (info[0] >> 2) & 0x01
+    if debug:
+        trace(TRACE_DEBUG, "调试：module_id=%d, HOST_NODE=%d", module_id, HOST_NODE)
+    afn_pos = FRAME_HEAD.size
+    if module_id == HOST_NODE:
+        src = relay = dst = buf[afn_pos:afn_pos]
     else:
-        # 有地址域情况
-        if p_rx.contents.info.down.relay_lev == 0:
-            # 无中继
-            if datalen < (LOCAL_FRAME_LEN_MIN + LOCAL_ADDR_LEN * 2):
-                return False, ErrorCode.FN_DENY_02H
-
-            # 复制源地址和目的地址
-            for i in range(LOCAL_ADDR_LEN):
-                p_rx.contents.addr.src[i] = tmp_buf[6 + i]
-                p_rx.contents.addr.dst[i] = tmp_buf[6 + LOCAL_ADDR_LEN + i]
-
-            # 解析AFN和FN
-            afn_pos = 6 + LOCAL_ADDR_LEN * 2
-            p_rx.contents.afn = tmp_buf[afn_pos] if afn_pos < len(tmp_buf) else 0
-            dt1 = tmp_buf[afn_pos + 1] if (afn_pos + 1) < len(tmp_buf) else 0
-            dt2 = tmp_buf[afn_pos + 2] if (afn_pos + 2) < len(tmp_buf) else 0
-            p_rx.contents.fn = gw13762_dt_to_fn(dt1, dt2)
-
-            # 处理数据域
-            p_rx.contents.bufflen = datalen - 27
-            for i in range(p_rx.contents.bufflen):
-                pos = 6 + LOCAL_ADDR_LEN * 2 + 3 + i
-                if pos < len(tmp_buf):
-                    p_rx.contents.buff[i] = tmp_buf[pos]
-        else:
-            # 有中继
-            relaylen = p_rx.contents.info.down.relay_lev * LOCAL_ADDR_LEN
-            if datalen < (LOCAL_FRAME_LEN_MIN + LOCAL_ADDR_LEN * 2 + relaylen):
-                return False, ErrorCode.FN_DENY_02H
-
-            # 复制源地址、中继地址和目的地址
-            for i in range(LOCAL_ADDR_LEN):
-                p_rx.contents.addr.src[i] = tmp_buf[6 + i]
-
-            for i in range(relaylen):
-                p_rx.contents.addr.relay[i] = tmp_buf[6 + LOCAL_ADDR_LEN + i]
-
-            for i in range(LOCAL_ADDR_LEN):
-                p_rx.contents.addr.dst[i] = tmp_buf[6 + LOCAL_ADDR_LEN + relaylen + i]
-
-            # 解析AFN和FN
-            afn_pos = 6 + LOCAL_ADDR_LEN * 2 + relaylen
-            p_rx.contents.afn = tmp_buf[afn_pos] if afn_pos < len(tmp_buf) else 0
-            dt1 = tmp_buf[afn_pos + 1] if (afn_pos + 1) < len(tmp_buf) else 0
-            dt2 = tmp_buf[afn_pos + 2] if (afn_pos + 2) < len(tmp_buf) else 0
-            p_rx.contents.fn = gw13762_dt_to_fn(dt1, dt2)
-
-            # 处理数据域
-            p_rx.contents.bufflen = datalen - 27 - relaylen
-            for i in range(p_rx.contents.bufflen):
-                pos = 6 + LOCAL_ADDR_LEN * 2 + relaylen + 3 + i
-                if pos < len(tmp_buf):
-                    p_rx.contents.buff[i] = tmp_buf[pos]
-
-    return True, ErrorCode.FN_ACK_FFH
+        relaylen = (info[0] >> 4) * LOCAL_ADDR_LEN
+        if datalen < LOCAL_FRAME_LEN_MIN + LOCAL_ADDR_LEN * 2 + relaylen:
+            if error:
+                trace(TRACE_ERROR, "调试：长度错误，有地址域的帧长度%d不足", datalen)
+            return None, ErrorCode.FN_DENY_02H
+        src = buf[afn_pos:afn_pos + LOCAL_ADDR_LEN]
+        afn_pos += LOCAL_ADDR_LEN
+        relay = buf[afn_pos:afn_pos + relaylen]
+        afn_pos += relaylen
+        dst = buf[afn_pos:afn_pos + LOCAL_ADDR_LEN]
+        afn_pos += LOCAL_ADDR_LEN
+
+    afn, dt1, dt2 = FRAME_AFN.unpack_from(buf, afn_pos)
+    fn_low = _DT1_TO_FN.get(dt1, 0)
+    fn = fn_low + (dt2 << 3) if fn_low else 0
+    if debug:
+        trace(TRACE_DEBUG, "调试：AFN位置=%d, AFN=0x%02X, DT1=0x%02X, DT2=0x%02X, FN=0x%02X", afn_pos, afn, dt1, dt2, fn)
+
+    return (Frame13762(datalen, ctrl, info, src, relay, dst, afn, fn, buf[afn_pos + 3:datalen - 2], cs),
+            ErrorCode.FN_ACK_FFH)
+
+
+def gw13762_check(p_affair, dir: int) -> Tuple[bool, int]:
+    """
+    GW13762协议帧校验函数（兼容接口）
+    校验p_affair接收缓冲区中的帧（gw13762_parse），成功时把解析结果填入p_affair.p_src.local.frame
+    """
+    local = p_affair.p_src.local
+    frame, err = gw13762_parse(memoryview(local.data).cast('B')[:local.datalen], dir)
+    if frame is None:
+        return False, err
+
+    rx = local.frame
+    rx.header = 0x68
+    rx.length = frame.length
+    rx.ctrl.ctrl = frame.ctrl
+    ctypes.memmove(rx.info.buff, frame.info, len(frame.info))
+    if frame.src:
+        ctypes.memmove(rx.addr.src, bytes(frame.src), LOCAL_ADDR_LEN)
+        ctypes.memmove(rx.addr.relay, bytes(frame.relay), min(len(frame.relay), len(rx.addr.relay)))
+        ctypes.memmove(rx.addr.dst, bytes(frame.dst), LOCAL_ADDR_LEN)
+    rx.afn = frame.afn
+    rx.fn = frame.fn
+    rx.bufflen = len(frame.data)
+    ctypes.memmove(rx.buff, bytes(frame.data), min(len(frame.data), len(rx.buff)))
+    rx.cs = frame.cs
+    rx.end_char = 0x16
+    return True, err
 
 
 def gw13762_build_frame(
@@ -437,6 +475,84 @@ def create_default_frame(afn: int, fn: int, serial_num: int, data: list) -> Tupl
     )
 
 
+def gw13762_file_segment(file_id: int, total_segments: int, segment_index: int,
+                         segment: bytes, file_cmd: int = FILE_CMD_PACKET) -> bytes:
+    """
+    构建AFN=15H F1文件传输的数据域（最后一段自动标记为结束帧）
+
+    参数:
+        file_id: 文件标识
+        total_segments: 总段数
+        segment_index: 当前段标识（从0开始）
+        segment: 当前段文件数据
+        file_cmd: 文件指令
+
+    返回:
+        数据域bytes，可作为FrameTemplate13762.build的data参数（gw13762_build_frame需要时用list()转换）
+    """
+    file_attr = FILE_ATTR_END if segment_index == total_segments - 1 else FILE_ATTR_MIDDLE
+    header = FILE_SEGMENT_HEADER.pack(file_id, file_attr, file_cmd, total_segments, segment_index, len(segment))
+    return header + bytes(segment)
+
+
+class FrameTemplate13762:
+    """
+    预编译的帧模板：帧头、控制域、信息域、地址域、AFN/DT只用gw13762_build_frame构建一次，
+    之后每帧只写入长度、帧序号和数据域，校验和 = 固定部分的和 + 帧序号 + 数据域的和
+    数据域的和可由调用者预先算好（如升级文件各段的数据域在所有串口、重发之间复用），此时构帧只有一次内存拷贝
+    帧写入模板自己的缓冲区，build()返回的memoryview在下一次build()前有效，一个模板只供一个发送者使用
+    用法：
+        template = FrameTemplate13762(dir=1, prm=0, mode=3, afn=0x15, fn=1)
+        frame, err = template.build(serial_num, data)
+    """
+
+    def __init__(self, dir: int, prm: int, mode: int, afn: int, fn: int, module_id: int = 0, relay_lev: int = 0,
+                 src_addr: list = None, dst_addr: list = None, relay_addrs: list = None):
+        head, err = gw13762_build_frame(dir=dir, prm=prm, mode=mode, afn=afn, fn=fn, serial_num=0,
+                                        module_id=module_id, relay_lev=relay_lev, src_addr=src_addr,
+                                        dst_addr=dst_addr, relay_addrs=relay_addrs)
+        if err != ErrorCode.FN_ACK_FFH:
+            raise ValueError(f"构帧失败，错误码: 0x{err:02X}")
+        del head[-2:]  # 去掉校验和与帧尾，保留到DT2
+        self.head_len = len(head)
+        self.head_sum = sum(head[3:])  # 控制域到DT2（帧序号为0）
+        self._buf = bytearray(LOCAL_FRAME_LEN_MAX)  # 按最大帧长分配，之后不再改变大小
+        self._buf[:self.head_len] = bytes(head)
+        self._view = memoryview(self._buf)
+
+    def build(self, serial_num: int, data=b'', data_sum: int = None) -> Tuple[Optional[memoryview], int]:
+        """
+        构建一帧
+        serial_num: 帧序号
+        data: 数据域，bytes/bytearray/memoryview
+        data_sum: 数据域各字节之和（可只取低8位），None时现算
+        返回: (帧数据memoryview, 0xFF)，帧长超过LOCAL_FRAME_LEN_MAX时返回(None, 0x02)
+        """
+        start = self.head_len
+        end = start + len(data)
+        frame_len = end + 2
+        if frame_len > LOCAL_FRAME_LEN_MAX:
+            return None, ErrorCode.FN_DENY_02H
+        if data_sum is None:
+            data_sum = sum(data)
+        serial_num &= 0xFF
+        buf = self._buf
+        buf[1] = frame_len & 0xFF
+        buf[2] = frame_len >> 8
+        buf[9] = serial_num
+        buf[start:end] = data
+        buf[end] = (self.head_sum + serial_num + data_sum) & 0xFF
+        buf[end + 1] = 0x16
+        return self._view[:frame_len], ErrorCode.FN_ACK_FFH
+
+
+def create_default_template(afn: int, fn: int) -> FrameTemplate13762:
+    """
+    创建默认参数的帧模板，构出的帧与create_default_frame相同
+    """
+    return FrameTemplate13762(dir=1, prm=0, mode=0x03, afn=afn, fn=fn, module_id=0, relay_lev=0)
+
+
 # 测试构帧函数
 def wwgw13762_check():
     """测试构帧后立即进行校验，验证两者的兼容性"""
@@ -0,0 +1,117 @@
+#这个文件提供1376.2帧的批量校验（离线分析、抓包回归用）：用NumPy一次找出大块数据中所有帧头0x68候选，
+#向量化读取长度域、检查帧尾、用累加和计算控制域到数据域的校验和、取AFN/FN，结果为结构化数组
+#帧的选取规则与comport.parse_process.FrameDecoder一致：从前往后，校验和正确的帧占用其字节，帧内的0x68不再作为帧头
+#NumPy为可选依赖，只在调用gw13762_batch_check()时需要
+
+try:
+    import numpy as np
+except ImportError:  # 未安装NumPy时其余模块照常使用
+    np = None
+
+from protocol.gw13762 import (LOCAL_ADDR_LEN, LOCAL_FRAME_LEN_MIN, LOCAL_FRAME_LEN_MAX, ErrorCode,
+                              gw13762_dt_to_fn)
+
+# 结果字段：帧在数据中的位置、帧长、控制域、AFN、FN、错误码（同gw13762_check）、是否通过校验
+BATCH_DTYPE = [
+    ('offset', '<i8'),
+    ('length', '<u2'),
+    ('ctrl', 'u1'),
+    ('afn', 'u1'),
+    ('fn', '<u2'),
+    ('err', 'u1'),
+    ('valid', '?'),
+]
+
+# DT1 -> FN的低3位（DT1不是单个bit时为0）
+_FN_LOW = [gw13762_dt_to_fn(dt1, 0) for dt1 in range(256)]
+
+
+def _select(starts, ends, cs_ok):
+    """
+    按FrameDecoder的规则选出不重叠的候选：校验和正确的帧占用其字节，落在其中的候选丢弃
+    返回保留的候选下标
+    """
+    good_starts = starts[cs_ok]
+    good_ends = ends[cs_ok]
+    if good_starts.size == 0:
+        return np.arange(starts.size)
+    if good_starts.size == 1 or np.all(good_starts[1:] >= good_ends[:-1]):
+        # 校验和正确的帧互不重叠（通常情况）：只需去掉落在这些帧内的候选
+        owner = np.searchsorted(good_starts, starts, side='right') - 1
+        inside = (owner >= 0) & (starts < good_ends[np.maximum(owner, 0)])
+        return np.flatnonzero(cs_ok | ~inside)
+
+    keep = []
+    last_end = 0
+    for i, (start, end, ok) in enumerate(zip(starts.tolist(), ends.tolist(), cs_ok.tolist())):
+        if start < last_end:
+            continue
+        keep.append(i)
+        if ok:
+            last_end = end
+    return np.array(keep, dtype=np.int64)
+
+
+def gw13762_batch_check(data, dir=None):
+    """
+    批量校验一大块数据中的所有1376.2帧
+    data: bytes/bytearray/memoryview/numpy uint8数组，可包含任意多帧和帧间的无效数据
+    dir: 预期传输方向（0:下行, 1:上行），None表示不检查方向
+    返回: BATCH_DTYPE结构化数组，每行一个帧头、长度、帧尾都正确的帧（按位置排序），
+          校验和错误的帧valid为False、err为0x03；数据末尾不完整的帧不包含在内
+    """
+    if np is None:
+        raise ImportError("gw13762_batch_check需要NumPy：pip install numpy")
+    if isinstance(data, np.ndarray):
+        buf = data.astype(np.uint8, copy=False).ravel()
+    else:
+        buf = np.frombuffer(data, dtype=np.uint8)
+    n = buf.size
+    if n < LOCAL_FRAME_LEN_MIN:
+        return np.zeros(0, dtype=BATCH_DTYPE)
+
+    # 帧头候选与长度域
+    starts = np.flatnonzero(buf[:n - LOCAL_FRAME_LEN_MIN + 1] == 0x68)
+    lengths = buf[starts + 1].astype(np.int64) | (buf[starts + 2].astype(np.int64) << 8)
+    ok = (lengths >= LOCAL_FRAME_LEN_MIN) & (lengths <= LOCAL_FRAME_LEN_MAX) & (starts + lengths <= n)
+    starts, lengths = starts[ok], lengths[ok]
+    ends = starts + lengths
+
+    # 帧尾
+    ok = buf[ends - 1] == 0x16
+    starts, lengths, ends = starts[ok], lengths[ok], ends[ok]
+
+    # 校验和：uint8累加和按256自然回绕，区间和即两点之差
+    csum = np.zeros(n + 1, dtype=np.uint8)
+    np.cumsum(buf, dtype=np.uint8, out=csum[1:])
+    cs_ok = (csum[ends - 2] - csum[starts + 3]) == buf[ends - 2]
+
+    keep = _select(starts, ends, cs_ok)
+    starts, lengths, ends, cs_ok = starts[keep], lengths[keep], ends[keep], cs_ok[keep]
+
+    # 地址域与AFN/FN
+    ctrl = buf[starts + 3]
+    info = buf[starts + 4]
+    addr_len = np.where(info & 0x04, LOCAL_ADDR_LEN * 2 + LOCAL_ADDR_LEN * (info >> 4).astype(np.int64), 0)
+    afn_pos = starts + 10 + addr_len
+    addr_ok = afn_pos + 3 <= ends - 2
+    afn_pos = np.where(addr_ok, afn_pos, starts)
+    fn_low = np.array(_FN_LOW, dtype=np.uint16)[buf[afn_pos + 1]]
+    fn = np.where(fn_low != 0, fn_low + (buf[afn_pos + 2].astype(np.uint16) << 3), 0)
+
+    # 错误码的优先级与gw13762_parse的检查顺序一致：方向 -> 校验和 -> 地址域长度
+    err = np.full(starts.size, int(ErrorCode.FN_ACK_FFH), dtype=np.uint8)
+    err[~addr_ok] = ErrorCode.FN_DENY_02H
+    err[~cs_ok] = ErrorCode.FN_DENY_03H
+    if dir is not None:
+        err[(ctrl >> 7) != dir] = ErrorCode.FN_DENY_05H
+
+    result = np.zeros(starts.size, dtype=BATCH_DTYPE)
+    result['offset'] = starts
+    result['length'] = lengths
+    result['ctrl'] = ctrl
+    result['afn'] = np.where(addr_ok, buf[afn_pos], 0)
+    result['fn'] = np.where(addr_ok, fn, 0)
+    result['err'] = err
+    result['valid'] = err == ErrorCode.FN_ACK_FFH
+    return result
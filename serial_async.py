@@ -0,0 +1,186 @@
+#这个文件提供SerialInterface的asyncio传输层：由串口文件描述符驱动（loop.add_reader），
+#一个事件循环即可同时服务多个串口、升级流程和请求/应答超时，无需每个串口一个线程加休眠轮询
+#目前只支持Linux等提供串口文件描述符的平台
+
+import asyncio
+import os
+import time
+
+from capture import CAP_RX, CAP_TX
+
+# 单次从文件描述符读取的最大字节数
+READ_CHUNK_SIZE = 4096
+# 接收队列最多缓存的数据块数，超出后丢弃最旧的数据块
+RX_QUEUE_MAX = 1024
+
+
+class SerialStreamProtocol(asyncio.Protocol):
+    """默认协议：把收到的数据块放入队列，供 async for / recv() 使用"""
+
+    def __init__(self, max_chunks=RX_QUEUE_MAX):
+        self.queue = asyncio.Queue()
+        self.max_chunks = max_chunks
+        self.dropped_chunks = 0  # 队列满时丢弃的数据块数
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data):
+        if self.queue.qsize() >= self.max_chunks:
+            self.queue.get_nowait()
+            self.dropped_chunks += 1
+        self.queue.put_nowait(data)
+
+    def connection_lost(self, exc):
+        # None作为结束标记，唤醒等待中的读取者
+        self.queue.put_nowait(None)
+
+
+class AsyncSerial:
+    """
+    SerialInterface的asyncio封装（同时充当Protocol的transport）
+    用法：
+        aser = AsyncSerial(serial_if)
+        await aser.start()
+        await aser.send(frame)
+        async for chunk in aser: ...
+    """
+
+    def __init__(self, serial_if, protocol=None):
+        """
+        serial_if: 已打开的SerialInterface
+        protocol: asyncio.Protocol实例，默认SerialStreamProtocol
+        """
+        self.serial_if = serial_if
+        self.protocol = protocol if protocol is not None else SerialStreamProtocol()
+        self.loop = None
+        self.fd = None
+        self._closing = False
+        self._send_lock = None
+        self._write_waiter = None  # send()等待可写的future
+        self._was_blocking = None  # start()前文件描述符的阻塞标志，关闭时恢复
+
+    async def start(self):
+        """注册到当前事件循环，开始接收数据"""
+        if not self.serial_if.is_open:
+            raise OSError("串口未打开")
+
+        self.loop = asyncio.get_running_loop()
+        self._send_lock = asyncio.Lock()
+        self.fd = self.serial_if.ser.fileno()
+        self._was_blocking = os.get_blocking(self.fd)
+        os.set_blocking(self.fd, False)
+        self.loop.add_reader(self.fd, self._on_readable)
+        self.protocol.connection_made(self)
+        return self
+
+    def _on_readable(self):
+        """文件描述符可读回调"""
+        try:
+            data = os.read(self.fd, READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._close(e)
+            return
+        if not data:
+            self._close(None)
+            return
+        # 事件驱动读取没有"读等待"，读等待时间计为0
+        self.serial_if.counters.on_read(len(data), 0.0)
+        if self.serial_if.capture is not None:
+            self.serial_if.capture.write(self.serial_if.capture_port_id, CAP_RX, data)
+        self.protocol.data_received(data)
+
+    def write(self, data):
+        """非阻塞写（transport接口）：调度一次send()，多次调用按顺序发送"""
+        self.loop.create_task(self.send(data))
+
+    async def send(self, data):
+        """
+        异步发送数据，等待全部写入内核后返回
+        data: bytes/bytearray/memoryview或整数列表
+        返回发送的字节数
+        """
+        if self._closing:
+            raise OSError("串口已关闭")
+
+        payload = memoryview(data if not isinstance(data, list) else bytes(data)).cast('B')
+        view = payload
+        total = len(view)
+        # 加锁保证多个发送者的数据不会交错
+        async with self._send_lock:
+            start = time.perf_counter()
+            while view:
+                try:
+                    n = os.write(self.fd, view)
+                except BlockingIOError:
+                    n = 0
+                view = view[n:]
+                if view:
+                    await self._wait_writable()
+            self.serial_if.counters.on_write(total, time.perf_counter() - start)
+            if self.serial_if.capture is not None:
+                self.serial_if.capture.write(self.serial_if.capture_port_id, CAP_TX, payload)
+            if self.serial_if.on_tx is not None:
+                self.serial_if.on_tx(payload.tobytes())
+        return total
+
+    def _wait_writable(self):
+        """等待文件描述符可写，等待中关闭时抛出OSError"""
+        future = self._write_waiter = self.loop.create_future()
+
+        def on_writable():
+            self.loop.remove_writer(self.fd)
+            if not future.done():
+                future.set_result(None)
+
+        self.loop.add_writer(self.fd, on_writable)
+        return future
+
+    async def recv(self, timeout=None):
+        """
+        接收一个数据块（仅默认协议可用）
+        timeout: 超时时间（秒），超时抛出asyncio.TimeoutError
+        返回bytes，串口关闭后返回b''
+        """
+        chunk = await asyncio.wait_for(self.protocol.queue.get(), timeout)
+        if chunk is None:
+            # 保留结束标记，让后续读取者同样结束
+            self.protocol.queue.put_nowait(None)
+            return b''
+        return chunk
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        chunk = await self.recv()
+        if not chunk:
+            raise StopAsyncIteration
+        return chunk
+
+    def is_closing(self):
+        return self._closing
+
+    def close(self):
+        """停止接收（不关闭底层串口，串口由SerialInterface.close_serial关闭）"""
+        self._close(None)
+
+    def _close(self, exc):
+        if self._closing:
+            return
+        self._closing = True
+        if self.loop is not None and self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            self.loop.remove_writer(self.fd)
+            try:
+                # 交还给SerialInterface的同步读写
+                os.set_blocking(self.fd, self._was_blocking)
+            except OSError:
+                pass  # 串口已被关闭
+        # 唤醒等待可写的send()，不再等待
+        if self._write_waiter is not None and not self._write_waiter.done():
+            self._write_waiter.set_exception(OSError("串口已关闭") if exc is None else exc)
+        self.protocol.connection_lost(exc)
@@ -1,20 +1,50 @@
 import serial
-import serial.tools.list_ports
 import re
+import time
+from collections import deque
+
+from comport.parse_process import FrameDecoder
+from virtual_port import VirtualPort, is_virtual_port
+from port_registry import port_registry
+from serial_stats import IoCounters
+from capture import CAP_RX, CAP_TX
+
+# 读模式：按块读取（原有方式）/ 按1376.2帧长读取
+READ_MODE_RAW = 'raw'
+READ_MODE_FRAME = 'frame'
+
+# 默认读超时（等待数据/帧头的时间）
+READ_TIMEOUT = 0.1
+# 帧内字节间超时 = max(INTER_BYTE_CHARS个字符时间, INTER_BYTE_MIN)
+# 下限考虑USB转串口芯片的延迟定时器（如FTDI默认16ms），避免把一帧拆断
+INTER_BYTE_CHARS = 4
+INTER_BYTE_MIN = 0.02
 
 
 class SerialInterface:
     def __init__(self):
         self.ser = None  # 串口对象
+        self.virtual = None  # 虚拟串口（pty:// / loop://），其master端模拟对端设备
         self.is_open = False  # 串口状态
+        self.read_mode = READ_MODE_RAW  # 读模式，见read_next()
+        self.read_timeout = READ_TIMEOUT
+        self.inter_byte_timeout = INTER_BYTE_MIN
+        # 按帧读取时的切帧（不完整的帧跨次保留，不按时间超时，由read_frame按字节间超时丢弃帧头）
+        self._rx_decoder = FrameDecoder(timeout=None)
+        self._rx_frames = deque()  # 已切出但还未返回的帧
+        self.counters = IoCounters()  # 收发统计，见stats()
+        self.capture = None  # 抓包写入（capture.CaptureWriter），见set_capture()
+        self.capture_port_id = 0
+        self.on_tx = None  # 发送回调on_tx(bytes)，如SerialThread把发送的数据送到收发记录视图
 
     def parse_config(self, config_str):
         """
-        解析格式如"COM3,9600,E,8,1"的配置字符串
+        解析格式如"COM3,9600,E,8,1"或"/dev/ttyUSB0,9600,E,8,1"的配置字符串
+        端口也可以是虚拟串口"pty://"、"loop://"（见virtual_port）
         返回: 配置字典或None(解析失败)
         """
-        # 正则匹配配置格式：端口,波特率,校验位,数据位,停止位
-        pattern = r'^(\w+),(\d+),(N|O|E|S|M),(\d+),(1|1.5|2)$'
+        # 正则匹配配置格式：端口,波特率,校验位,数据位,停止位（端口允许Linux设备路径）
+        pattern = r'^([^,\s]+),(\d+),(N|O|E|S|M),(\d+),(1|1\.5|2)$'
         match = re.match(pattern, config_str.strip())
 
         if not match:
@@ -61,23 +91,36 @@ class SerialInterface:
             return False, "配置格式错误，正确格式: COMx,波特率,校验位(N/O/E),数据位,停止位"
 
         try:
+            port = config['port']
+            parity = config['parity']
+            if is_virtual_port(port):
+                # 虚拟串口：创建伪终端对，slave端按普通串口打开
+                # pty不支持校验位（设置后重新配置超时会失败），校验位只用于计算限速的字符时间
+                self.virtual = VirtualPort(port, config['baudrate'], self.calc_char_bits(config))
+                port = self.virtual.device
+                parity = serial.PARITY_NONE
+
             # 初始化串口
             self.ser = serial.Serial(
-                port=config['port'],
+                port=port,
                 baudrate=config['baudrate'],
-                parity=config['parity'],
+                parity=parity,
                 bytesize=config['databits'],
                 stopbits=config['stopbits'],
-                timeout=0.1  # 读超时时间
+                timeout=self.read_timeout  # 读超时时间
             )
 
             if self.ser.is_open:
                 self.is_open = True
+                self.inter_byte_timeout = self.calc_inter_byte_timeout(config)
+                self._rx_decoder.reset()
+                self._rx_frames.clear()
                 return True, f"串口 {config['port']} 已打开"
             else:
                 return False, "串口打开失败"
 
         except Exception as e:
+            self._close_virtual()
             return False, f"打开失败: {str(e)}"
 
     def close_serial(self):
@@ -85,16 +128,25 @@ class SerialInterface:
         if self.is_open and self.ser:
             self.ser.close()
             self.is_open = False
+            self._close_virtual()
             return True, "串口已关闭"
         return False, "串口未打开"
 
+    def _close_virtual(self):
+        """关闭虚拟串口的伪终端对"""
+        if self.virtual is not None:
+            self.virtual.close()
+            self.virtual = None
+
     def send_data(self, data, is_hex=True):  # 修改：默认is_hex=True
         """
         发送数据
-        data: 待发送数据
+        data: 待发送数据（字符串；bytes/bytearray/memoryview/整数列表直接按原始数据发送，见send_raw）
         is_hex: 是否以十六进制发送（True=Hex格式，False=文本格式，默认True）
         返回: (成功标志, 消息)
         """
+        if not isinstance(data, str):
+            return self.send_raw(data)
         if not self.is_open:
             return False, "串口未打开"
 
@@ -107,20 +159,137 @@ class SerialInterface:
                 # 文本格式：UTF-8编码
                 data = data.encode('utf-8')
 
-            self.ser.write(data)
+            self._write(data)
             return True, f"发送成功: {len(data)}字节 (格式: {'Hex' if is_hex else '文本'})"
         except Exception as e:
+            self.counters.on_write_error()
             return False, f"发送失败: {str(e)}"
 
+    def send_raw(self, data):
+        """
+        发送原始数据（不经过十六进制字符串转换）
+        data: bytes/bytearray/memoryview或整数列表（如gw13762_build_frame构建的帧）
+        返回: (成功标志, 消息)
+        """
+        if not self.is_open:
+            return False, "串口未打开"
+
+        try:
+            if isinstance(data, list):
+                data = bytes(data)
+            n = self._write(data)
+            return True, f"发送成功: {n}字节"
+        except Exception as e:
+            self.counters.on_write_error()
+            return False, f"发送失败: {str(e)}"
+
+    def _write(self, data):
+        """写串口并计入收发统计，返回写入的字节数"""
+        start = time.perf_counter()
+        n = self.ser.write(data)
+        self.counters.on_write(n, time.perf_counter() - start)
+        if self.capture is not None:
+            self.capture.write(self.capture_port_id, CAP_TX, data)
+        if self.on_tx is not None:
+            self.on_tx(bytes(data))
+        return n
+
+    def set_capture(self, writer, port_name):
+        """
+        开始/停止抓包：之后收发的原始数据写入writer
+        writer: capture.CaptureWriter，None时停止抓包
+        port_name: 抓包记录中的串口名
+        """
+        if writer is not None:
+            self.capture_port_id = writer.port_id(port_name)
+        self.capture = writer
+
+    def stats(self):
+        """收发统计快照（速率由StatsSampler或counters.sample()按周期计算）"""
+        return self.counters.stats()
+
+    @staticmethod
+    def calc_char_bits(config):
+        """每个字符的位数：起始位 + 数据位 + 校验位 + 停止位"""
+        return 1 + config['databits'] + (0 if config['parity'] == serial.PARITY_NONE else 1) + config['stopbits']
+
+    @staticmethod
+    def calc_inter_byte_timeout(config):
+        """根据波特率和字符格式计算帧内字节间超时（秒）"""
+        return max(INTER_BYTE_CHARS * SerialInterface.calc_char_bits(config) / config['baudrate'], INTER_BYTE_MIN)
+
+    def _set_timeout(self, timeout):
+        """设置读超时（仅在变化时设置，避免重复配置串口）"""
+        if self.ser.timeout != timeout:
+            self.ser.timeout = timeout
+
+    @property
+    def rx_discarded(self):
+        """按帧读取时丢弃的非帧字节数"""
+        return self._rx_decoder.discarded
+
+    def read_next(self):
+        """按当前读模式读取：READ_MODE_FRAME按帧读取，否则按块读取"""
+        if self.read_mode == READ_MODE_FRAME:
+            return self.read_frame()
+        return self.read_data(1024)
+
+    def read_frame(self, timeout=None):
+        """
+        按1376.2帧读取一帧：接收的数据交给FrameDecoder切帧（校验和检查、假帧头重新同步），收到完整帧立即返回
+        timeout: 等待帧的超时（秒），默认read_timeout；帧内按字节间超时判断断帧
+        串口读超时固定为字节间超时（不随每次调用重新配置串口），总超时在这里判断
+        返回: (成功标志, 帧数据bytes)，超时返回(False, "")
+        """
+        if not self.is_open:
+            return False, "串口未打开"
+
+        start = time.perf_counter()
+        deadline = time.monotonic() + (self.read_timeout if timeout is None else timeout)
+        frames = self._rx_frames
+        try:
+            self._set_timeout(self.inter_byte_timeout)
+            while True:
+                if frames:
+                    frame = frames.popleft()
+                    self.counters.on_read(len(frame), time.perf_counter() - start)
+                    return True, frame
+
+                # 已到达的数据一次读出，否则最多等待一个字节间超时
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+                if chunk:
+                    # 抓包记录收到的原始数据（含重新同步时丢弃的字节），不是切出的帧
+                    if self.capture is not None:
+                        self.capture.write(self.capture_port_id, CAP_RX, chunk)
+                    frames.extend(self._rx_decoder.feed(chunk))
+                    continue
+
+                if self._rx_decoder.pending:
+                    # 字节间超时：当前帧不完整，丢弃帧头，从下一个0x68重新同步
+                    frames.extend(self._rx_decoder.skip_head())
+                    continue
+                if time.monotonic() >= deadline:
+                    self.counters.on_read(0, 0.0)
+                    return False, ""
+        except Exception as e:
+            self.counters.on_read_error()
+            print("读取失败")
+            return False, f"读取失败: {str(e)}"
+
     def read_data(self, max_bytes=2048, is_hex=True):  # 修改：默认is_hex=True
         if not self.is_open:
             print("串口未打开")
             return False, "串口未打开"
 
         try:
+            self._set_timeout(self.read_timeout)
+            start = time.perf_counter()
             data = self.ser.read(max_bytes)
+            self.counters.on_read(len(data), time.perf_counter() - start)
             if not data:
                 return False, ""  # 无数据但读取成功
+            if self.capture is not None:
+                self.capture.write(self.capture_port_id, CAP_RX, data)
             return True, data
             # if is_hex:
             #     # 转换为十六进制字符串
@@ -129,19 +298,20 @@ class SerialInterface:
             #     # 尝试解码为字符串
             #     return True, data.decode('utf-8', errors='replace')
         except Exception as e:
+            self.counters.on_read_error()
             print("读取失败")
             return False, f"读取失败: {str(e)}"
 
     def get_available_ports(self):
-        """获取可用串口号列表"""
-        ports = serial.tools.list_ports.comports()
-        return [port.device for port in ports]
+        """获取可用串口号列表（来自串口注册表的缓存，串口有变化时才重新枚举；没有变化检测的平台上重新枚举）"""
+        return port_registry.devices(rescan=True)
 
 if __name__ == '__main__':
     # 示例使用
     serial_if = SerialInterface()
     print(serial_if.get_available_ports())
-    print(serial_if.open_serial("COM71,9600,E,8,1"))
-    print(serial_if.send_data("Hello, World!"))
+    # 没有真实串口时使用回环虚拟串口，真实串口如"COM71,9600,E,8,1"
+    print(serial_if.open_serial("loop://,9600,E,8,1"))
+    print(serial_if.send_data("Hello, World!", is_hex=False))
     print(serial_if.read_data())
     print(serial_if.close_serial())
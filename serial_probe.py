@@ -0,0 +1,191 @@
+#这个文件提供串口参数自动探测：按候选的波特率/校验位/停止位依次打开串口，发送1376.2查询帧（AFN=03H F1），
+#收到能通过gw13762_check的应答即认为参数正确；多个串口并行探测（每个串口一个线程，串口内只能逐个尝试）
+#探测结果按适配器序列号（无序列号时按串口号）缓存到文件，重新连接时先验证缓存的参数，不再逐个尝试
+
+import itertools
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import log
+from serial_bsp import SerialInterface
+from port_registry import port_registry
+from comport.parse_process import load_frame_bytes
+from protocol.gw13762 import SApsAffair, gw13762_check, create_default_frame
+
+# 候选参数（按常用程度排序，排在前面的先尝试）
+PROBE_BAUDRATES = (9600, 115200, 2400, 4800, 19200, 38400, 57600)
+PROBE_PARITIES = ('E', 'N', 'O')
+PROBE_STOPBITS = ('1',)
+PROBE_DATABITS = 8
+# 每组参数等待应答的时间（秒）
+PROBE_TIMEOUT = 0.5
+# 查询帧：AFN=03H F1 查询厂商代码和版本信息
+PROBE_AFN = 0x03
+PROBE_FN = 1
+PROBE_RESPONSE_DIR = 1
+# 探测结果缓存文件
+PROBE_CACHE_PATH = './probe_cache.json'
+
+
+def probe_candidates(baudrates=PROBE_BAUDRATES, parities=PROBE_PARITIES, stopbits=PROBE_STOPBITS,
+                     databits=PROBE_DATABITS):
+    """生成候选参数列表，每项为"波特率,校验位,数据位,停止位"（不含端口）"""
+    return [f"{baud},{parity},{databits},{stop}"
+            for stop, baud, parity in itertools.product(stopbits, baudrates, parities)]
+
+
+class ProbeCache:
+    """探测结果缓存：适配器标识 -> 串口参数（不含端口），保存为json文件"""
+
+    def __init__(self, path=PROBE_CACHE_PATH):
+        """path: 缓存文件路径，None时只缓存在内存中"""
+        self.path = path
+        self._lock = threading.Lock()
+        self._settings = {}
+        if path is not None and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._settings = json.load(f)
+            except (OSError, ValueError) as e:
+                log.log_wp(f"读取串口参数缓存失败: {e}")
+
+    def get(self, key):
+        with self._lock:
+            return self._settings.get(key)
+
+    def set(self, key, settings):
+        with self._lock:
+            self._settings[key] = settings
+            self._save()
+
+    def remove(self, key):
+        with self._lock:
+            if self._settings.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        if self.path is None:
+            return
+        try:
+            with open(self.path, 'w', encoding='utf-8') as f:
+                json.dump(self._settings, f, ensure_ascii=False, indent=2)
+        except OSError as e:
+            log.log_wp(f"保存串口参数缓存失败: {e}")
+
+
+class SerialProber:
+    """
+    串口参数自动探测
+    用法：
+        results = SerialProber().probe(["/dev/ttyUSB0", "/dev/ttyUSB1"])
+        # {"/dev/ttyUSB0": "/dev/ttyUSB0,9600,E,8,1", "/dev/ttyUSB1": None}
+    """
+
+    def __init__(self, candidates=None, timeout=PROBE_TIMEOUT, cache=None, registry=port_registry):
+        """
+        candidates: 候选参数列表（见probe_candidates），默认全部常用组合
+        timeout: 每组参数等待应答的时间（秒）
+        cache: ProbeCache，默认使用PROBE_CACHE_PATH
+        registry: 用于查询适配器序列号的串口注册表，None时按串口号缓存
+        """
+        self.candidates = candidates if candidates is not None else probe_candidates()
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ProbeCache()
+        self.registry = registry
+        self.attempts = 0  # 实际尝试的参数组数（所有串口合计）
+        self._lock = threading.Lock()
+
+    def cache_key(self, port):
+        """缓存标识：USB适配器优先用序列号（换插口后仍然有效），否则用串口号"""
+        if self.registry is not None:
+            for info in self.registry.ports():
+                if info['device'] == port and info['serial_number']:
+                    return f"sn:{info['serial_number']}"
+        return f"dev:{port}"
+
+    def _try(self, serial_if, config_str, serial_num):
+        """用一组参数打开串口发送查询帧，返回是否收到有效应答"""
+        with self._lock:
+            self.attempts += 1
+        success, msg = serial_if.open_serial(config_str)
+        if not success:
+            log.log_wp(f"探测 {config_str}: {msg}")
+            return False
+
+        query, _ = create_default_frame(PROBE_AFN, PROBE_FN, serial_num, [])
+        query = bytes(query)
+        serial_if.ser.reset_input_buffer()
+        serial_if.send_raw(query)
+
+        affair = SApsAffair()
+        deadline = time.monotonic() + self.timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            success, frame = serial_if.read_frame(timeout=remaining)
+            if not success:
+                if frame:
+                    # 读取出错（如串口被拔出）：重试只会立即再次失败，放弃这组参数
+                    log.log_wp(f"探测 {config_str}: {frame}")
+                    return False
+                continue  # 超时
+            # 忽略回显（回环或RS485半双工时发送的帧会原样收回）
+            if frame == query:
+                continue
+            load_frame_bytes(affair, frame)
+            success, _ = gw13762_check(affair, PROBE_RESPONSE_DIR)
+            if success and affair.p_src.local.frame.afn == PROBE_AFN:
+                return True
+
+    def probe_port(self, port, use_cache=True):
+        """
+        探测一个串口
+        use_cache: 先验证缓存中的参数，有效时直接返回
+        返回: 配置字符串（可直接用于open_serial），所有候选参数都无应答时返回None
+        """
+        key = self.cache_key(port)
+        candidates = list(self.candidates)
+        cached = self.cache.get(key) if use_cache else None
+        if cached is not None:
+            # 缓存的参数放在最前面，失效时继续尝试其他参数
+            if cached in candidates:
+                candidates.remove(cached)
+            candidates.insert(0, cached)
+
+        serial_if = SerialInterface()
+        try:
+            for serial_num, settings in enumerate(candidates):
+                config_str = f"{port},{settings}"
+                if self._try(serial_if, config_str, serial_num & 0xFF):
+                    self.cache.set(key, settings)
+                    return config_str
+        finally:
+            serial_if.close_serial()
+        if cached is not None:
+            self.cache.remove(key)
+        return None
+
+    def probe(self, ports, use_cache=True):
+        """
+        并行探测多个串口
+        返回: {串口号: 配置字符串或None}
+        """
+        ports = list(ports)
+        if not ports:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+            results = executor.map(lambda port: self.probe_port(port, use_cache), ports)
+            return dict(zip(ports, results))
+
+
+if __name__ == "__main__":
+    # 探测本机所有串口
+    start = time.monotonic()
+    prober = SerialProber()
+    for port, config_str in prober.probe(port_registry.devices()).items():
+        print(f"{port}: {config_str or '无应答'}")
+    print(f"共尝试{prober.attempts}组参数，耗时{time.monotonic() - start:.1f}s")
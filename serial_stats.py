@@ -0,0 +1,185 @@
+#这个文件提供串口收发统计：IoCounters 由SerialInterface在收发时累加（只做整数加法，开销很小），
+#stats() 随时取快照；StatsSampler 按周期采样计算当前/峰值速率，GUI与命令行都可以订阅采样结果
+#升级慢时可据此区分瓶颈：线路（速率接近波特率上限）、设备（读等待时间长/空读多）、解析（fifo积压）
+
+import threading
+import time
+
+import log
+
+# 默认采样周期（秒）
+STATS_SAMPLE_INTERVAL = 1.0
+
+
+class IoCounters:
+    """单个串口的收发计数"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """清零所有计数"""
+        self.tx_bytes = 0
+        self.tx_frames = 0  # write()次数
+        self.tx_errors = 0
+        self.tx_latency_total = 0.0  # write()耗时合计（秒）
+        self.tx_latency_max = 0.0
+        self.rx_bytes = 0
+        self.rx_frames = 0  # 收到的数据块数（按帧读取时为帧数）
+        self.rx_errors = 0
+        self.read_calls = 0
+        self.empty_reads = 0  # 超时未读到数据的次数
+        self.rx_latency_total = 0.0  # 读调用到拿到数据的等待时间合计（秒）
+        self.rx_latency_max = 0.0
+        # 速率（由sample()计算）
+        self.rx_rate = 0.0
+        self.tx_rate = 0.0
+        self.rx_rate_peak = 0.0
+        self.tx_rate_peak = 0.0
+        self._sample_time = time.perf_counter()
+        self._sample_rx = 0
+        self._sample_tx = 0
+
+    def on_write(self, nbytes, latency):
+        """一次成功的write()"""
+        self.tx_bytes += nbytes
+        self.tx_frames += 1
+        self.tx_latency_total += latency
+        if latency > self.tx_latency_max:
+            self.tx_latency_max = latency
+
+    def on_write_error(self):
+        self.tx_errors += 1
+
+    def on_read(self, nbytes, latency):
+        """一次读调用：nbytes为0表示空读，latency为调用到返回数据的时间"""
+        self.read_calls += 1
+        if not nbytes:
+            self.empty_reads += 1
+            return
+        self.rx_bytes += nbytes
+        self.rx_frames += 1
+        self.rx_latency_total += latency
+        if latency > self.rx_latency_max:
+            self.rx_latency_max = latency
+
+    def on_read_error(self):
+        self.read_calls += 1
+        self.rx_errors += 1
+
+    def sample(self):
+        """计算自上次采样以来的收发速率（字节/秒）并更新峰值，返回stats()"""
+        now = time.perf_counter()
+        elapsed = now - self._sample_time
+        if elapsed > 0:
+            self.rx_rate = (self.rx_bytes - self._sample_rx) / elapsed
+            self.tx_rate = (self.tx_bytes - self._sample_tx) / elapsed
+            self.rx_rate_peak = max(self.rx_rate_peak, self.rx_rate)
+            self.tx_rate_peak = max(self.tx_rate_peak, self.tx_rate)
+        self._sample_time = now
+        self._sample_rx = self.rx_bytes
+        self._sample_tx = self.tx_bytes
+        return self.stats()
+
+    def stats(self):
+        """计数快照"""
+        return {
+            'tx_bytes': self.tx_bytes,
+            'tx_frames': self.tx_frames,
+            'tx_errors': self.tx_errors,
+            'tx_latency_avg': self.tx_latency_total / self.tx_frames if self.tx_frames else 0.0,
+            'tx_latency_max': self.tx_latency_max,
+            'rx_bytes': self.rx_bytes,
+            'rx_frames': self.rx_frames,
+            'rx_errors': self.rx_errors,
+            'read_calls': self.read_calls,
+            'empty_reads': self.empty_reads,
+            'rx_latency_avg': self.rx_latency_total / self.rx_frames if self.rx_frames else 0.0,
+            'rx_latency_max': self.rx_latency_max,
+            'rx_rate': self.rx_rate,
+            'tx_rate': self.tx_rate,
+            'rx_rate_peak': self.rx_rate_peak,
+            'tx_rate_peak': self.tx_rate_peak,
+        }
+
+
+def format_stats(stats):
+    """统计快照格式化为一行文本（用于日志/界面显示）"""
+    return (f"收 {stats['rx_bytes']}B/{stats['rx_frames']}帧 {stats['rx_rate']:.0f}B/s(峰值{stats['rx_rate_peak']:.0f}) "
+            f"发 {stats['tx_bytes']}B/{stats['tx_frames']}帧 {stats['tx_rate']:.0f}B/s(峰值{stats['tx_rate_peak']:.0f}) "
+            f"读{stats['read_calls']}次/空读{stats['empty_reads']}次 "
+            f"读等待{stats['rx_latency_avg'] * 1e3:.1f}ms 写耗时{stats['tx_latency_avg'] * 1e3:.2f}ms "
+            f"错误 收{stats['rx_errors']}/发{stats['tx_errors']}")
+
+
+class StatsSampler(threading.Thread):
+    """
+    周期采样线程：每个周期对所有注册的计数采样一次，并把结果传给回调
+    callback(name, stats) 在采样线程中调用，GUI中应通过信号转到主线程
+    """
+
+    def __init__(self, interval=STATS_SAMPLE_INTERVAL):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self._sources = {}  # 名称 -> IoCounters
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def add(self, name, counters):
+        """注册一个串口的计数，如 sampler.add(port, serial_if.counters)"""
+        with self._lock:
+            self._sources[name] = counters
+
+    def remove(self, name):
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def subscribe(self, callback):
+        with self._lock:
+            self._callbacks.append(callback)
+
+    def sample(self):
+        """立即采样一次，返回{名称: 统计快照}"""
+        with self._lock:
+            sources = list(self._sources.items())
+            callbacks = list(self._callbacks)
+        results = {name: counters.sample() for name, counters in sources}
+        for name, stats in results.items():
+            for callback in callbacks:
+                try:
+                    callback(name, stats)
+                except Exception as e:
+                    log.log_wp(f"统计回调异常: {e}")
+        return results
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.sample()
+
+    def stop(self, timeout=1.0):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+
+if __name__ == "__main__":
+    # 回环虚拟串口按115200波特率限速收发，每秒打印一次统计
+    from serial_bsp import SerialInterface
+
+    serial_if = SerialInterface()
+    print(serial_if.open_serial("loop://?emulate,115200,N,8,1"))
+    sampler = StatsSampler()
+    sampler.add("loop", serial_if.counters)
+    sampler.subscribe(lambda name, stats: print(f"{name}: {format_stats(stats)}"))
+    sampler.start()
+    deadline = time.monotonic() + 3
+
+    def sender():
+        while time.monotonic() < deadline:
+            serial_if.send_raw(bytes(256))
+    threading.Thread(target=sender, daemon=True).start()
+    while time.monotonic() < deadline:
+        serial_if.read_data(4096)
+    sampler.stop()
+    serial_if.close_serial()
@@ -1,45 +1,104 @@
-from PyQt6.QtCore import QThread, pyqtSignal
+from PyQt6.QtCore import QThread, QTimer, pyqtSignal
 import time
 import log
 import threading
-from kfifo import KFifoAps
+from collections import deque
+from kfifo import KFifoAps, OverflowPolicy
+
+# 串口线程写入、解析线程读取，跨线程使用同步模式；解析跟不上时扩容，最大256KB
+SERIAL_FIFO_MAX_LEN = 256 * 1024
+serial_fifo = KFifoAps(sync=True, policy=OverflowPolicy.GROW, max_size=SERIAL_FIFO_MAX_LEN)
+
+# 接收数据的调试日志合并：每RX_FLUSH_INTERVAL毫秒或累计RX_FLUSH_BYTES字节写入一次
+RX_FLUSH_INTERVAL = 50
+RX_FLUSH_BYTES = 4 * 1024
+# 待写入调试日志的数据块的最大缓存数，主线程跟不上时丢弃最旧的数据块（不影响fifo中的数据）
+RX_DISPLAY_MAX_CHUNKS = 4096
+
+
+def format_rx_chunks(chunks):
+    """待显示的数据块转为十六进制文本行，如 [uart]68 0F 00 ... 16"""
+    return [f"[uart]{data.hex(' ').upper()}" for _, data in chunks]
 
-serial_fifo = KFifoAps()
 
 class SerialThread(QThread):
     """串口线程：使用全局KFIFO缓冲区存储数据"""
-    data_received = pyqtSignal(str)
+    data_sent = pyqtSignal(bytes)  # 串口发送的数据（任意线程发送，由信号送到主线程）
+    _flush_requested = pyqtSignal()
 
-    def __init__(self, serial_if, parent=None):
+    def __init__(self, serial_if, parent=None, fifo=None):
         super().__init__(parent)
         self.serial_if = serial_if  # 使用传入的实例
+        serial_if.on_tx = self.data_sent.emit
+        # 接收数据写入的fifo，默认全局serial_fifo；跨进程解析时传入ShmKFifoAps
+        self.fifo = fifo if fifo is not None else serial_fifo
         self.is_running = False
 
+        # 待写入调试日志的数据块：读线程只追加原始数据，格式化与写日志在主线程的定时器中进行
+        # （收发记录视图的数据来自解析线程的frames_parsed）
+        self._rx_chunks = deque(maxlen=RX_DISPLAY_MAX_CHUNKS)
+        self._rx_lock = threading.Lock()  # 保护_rx_chunks/_rx_pending_bytes/_flush_pending（读线程与主线程）
+        self._rx_pending_bytes = 0
+        self._flush_pending = False
+        self.rx_display_dropped = 0  # 主线程跟不上时丢弃的数据块数
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setInterval(RX_FLUSH_INTERVAL)
+        self._flush_timer.timeout.connect(self.flush)
+        self._flush_requested.connect(self.flush)
+
     def run(self):
-        """线程主循环：读取串口数据并写入全局KFIFO缓冲区"""
+        """线程主循环：读取串口数据并写入全局KFIFO缓冲区，只做读取与入队"""
+        chunks = self._rx_chunks
         while self.is_running:
             if self.serial_if.is_open:
-                success, data = self.serial_if.read_data(1024)
+                # 按串口读模式读取；读超时本身即为等待，无需额外休眠
+                success, data = self.serial_if.read_next()
                 if success and data:
-                    hex_data = ' '.join(f"{b:02X}" for b in data)  # 新增：字节转十六进制
-                    data_with_prefix = f"[uart]{hex_data}"  # 修改：使用十六进制数据
-                    # [收]68 2C 00 03 04 00 00 00 00 0C 55 55 55 55 55 55 01 00 02 00 00 66 14 04 00 10 68 01 00 02
-                    # 00 00 66 68 11 04 34 34 39 38 27 16 06 16[收]68 2C 00 03 04 00 00 00 00 0C 55 55 55 55 55 55 01 00 02 00 00 66 14 04 00 10 68 01 00 02 00 00 66 68 11 04 34 34 39 38 27 16 06 16
-                    self.data_received.emit(data_with_prefix)
-                    print(data_with_prefix)
-                    log.log_info(log.LOG_DEBUG_CMD, data_with_prefix)
-                    serial_fifo.put(data)
-                    # fifo_data = serial_fifo.get(serial_fifo.get_data_length())
-                    # print(f"获取到的数据: {fifo_data}")
-                    # 获取到的数据: [104, 44, 0, 3, 4, 0, 0, 0, 0, 12, 85, 85, 85, 85, 85, 85, 1, 0, 2, 0, 0, 102, 20, 4,
-                    #                0, 16, 104, 1, 0, 2, 0, 0, 102, 104, 17, 4, 52, 52, 57, 56, 39, 22, 6, 22]
-
-            time.sleep(0.01)
+                    added = self.fifo.put(data)
+                    if added < len(data):
+                        log.log_wp(f"串口FIFO溢出，丢弃{len(data) - added}字节，统计：{self.fifo.stats()}")
+
+                    with self._rx_lock:
+                        if len(chunks) == chunks.maxlen:
+                            self.rx_display_dropped += 1
+                        chunks.append((time.monotonic(), data))
+                        self._rx_pending_bytes += len(data)
+                        # 累计数据较多时不等定时器，请求主线程立即刷新（每批只请求一次）
+                        request_flush = self._rx_pending_bytes >= RX_FLUSH_BYTES and not self._flush_pending
+                        if request_flush:
+                            self._flush_pending = True
+                    if request_flush:
+                        self._flush_requested.emit()
+                elif not success and data:
+                    # 读取出错（如串口被拔出）时稍作休眠，避免空转
+                    time.sleep(0.01)
+            else:
+                time.sleep(0.01)
+
+    def flush(self):
+        """
+        取出待写入的数据块，转为十六进制后一次性写入调试日志（在主线程中调用）
+        返回: 取出的数据块[(接收时间time.monotonic(), bytes)]
+        """
+        with self._rx_lock:
+            self._flush_pending = False
+            self._rx_pending_bytes = 0
+            chunks = list(self._rx_chunks)
+            self._rx_chunks.clear()
+        if not chunks:
+            return chunks
+
+        text = '\n'.join(format_rx_chunks(chunks))
+        # [uart]68 2C 00 03 04 00 00 00 00 0C 55 55 55 55 55 55 01 00 02 00 00 66 14 04 00 10 68 01 00 02
+        # 00 00 66 68 11 04 34 34 39 38 27 16 06 16
+        log.log_info(log.LOG_DEBUG_CMD, text)
+        return chunks
 
     def start_thread(self):
         if not self.is_running:
             self.is_running = True
             self.start()
+            self._flush_timer.start()
             log.write_to_plain_text_3("串口线程已启动")
 
     def stop_thread(self):
@@ -49,6 +108,8 @@ class SerialThread(QThread):
             if self.serial_if.is_open:
                 self.serial_if.close()  # 假设serial_if有close()方法
             self.wait(1000)  # 等待线程退出（超时1秒）
+            self._flush_timer.stop()
+            self.flush()
         log.write_to_plain_text_3("串口线程已停止")
 
 
@@ -0,0 +1,193 @@
+#这个文件提供串口发送队列：调用者只把帧放入队列即返回，后台线程把排队的多个小帧合并成一次write()，
+#减少批量升级等场景下的系统调用次数，并统计每次write的耗时与帧的排队时延
+#目前是供调用者按需创建的库组件，GUI的发送路径（SerialInterface.send_data）仍直接写串口
+
+import queue
+import threading
+import time
+from collections import deque
+
+import log
+
+# 一次write()最多合并的字节数
+TX_COALESCE_MAX = 4096
+# 发送线程检查停止标志的间隔（秒）
+TX_POLL_INTERVAL = 0.1
+# 保留最近多少次write()的耗时
+TX_LATENCY_HISTORY = 1024
+
+
+class SerialTxQueue(threading.Thread):
+    """
+    串口发送队列
+    用法：
+        tx = SerialTxQueue(serial_if)
+        tx.start()
+        tx.send(frame)
+        tx.flush()
+        tx.stop()
+    """
+
+    def __init__(self, serial_if, coalesce_max=TX_COALESCE_MAX):
+        """
+        serial_if: 已打开的SerialInterface
+        coalesce_max: 一次write()最多合并的字节数（单帧超过时单独发送）
+        """
+        super().__init__(daemon=True)
+        self.serial_if = serial_if
+        self.coalesce_max = coalesce_max
+        self._queue = queue.Queue()  # (帧数据bytes, 入队时间)
+        self._pending = None  # 超出合并上限、留到下一次write()的帧
+        self._stop_event = threading.Event()
+        self.latencies = deque(maxlen=TX_LATENCY_HISTORY)  # 最近每次write()的耗时（秒）
+        self.reset_stats()
+
+    def send(self, data):
+        """
+        帧放入发送队列（不阻塞）
+        data: bytes/bytearray/memoryview或整数列表
+        返回入队的字节数
+        """
+        data = bytes(data)
+        if data:
+            self._queue.put((data, time.monotonic()))
+        return len(data)
+
+    def flush(self, timeout=None):
+        """
+        等待队列中的帧全部写出
+        返回: 是否已全部写出（超时返回False）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def stop(self, timeout=1.0):
+        """写出已排队的帧后停止发送线程（线程未启动时排队的帧不写出）"""
+        if self.is_alive():
+            self.flush(timeout)
+        self._stop_event.set()
+        if self.is_alive():
+            self.join(timeout)
+
+    def _collect(self):
+        """取出排队的帧并合并，返回: (合并后的数据列表, 帧入队时间列表)，无数据时返回None"""
+        if self._pending is not None:
+            item, self._pending = self._pending, None
+        else:
+            try:
+                item = self._queue.get(timeout=TX_POLL_INTERVAL)
+            except queue.Empty:
+                return None
+
+        chunks, enqueued = [item[0]], [item[1]]
+        size = len(item[0])
+        while size < self.coalesce_max:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if size + len(item[0]) > self.coalesce_max:
+                self._pending = item
+                break
+            chunks.append(item[0])
+            enqueued.append(item[1])
+            size += len(item[0])
+        return chunks, enqueued
+
+    def run(self):
+        """发送线程主循环"""
+        while not self._stop_event.is_set():
+            collected = self._collect()
+            if collected is None:
+                continue
+            chunks, enqueued = collected
+            data = chunks[0] if len(chunks) == 1 else b''.join(chunks)
+
+            start = time.monotonic()
+            success, msg = self.serial_if.send_raw(data)
+            end = time.monotonic()
+
+            self.latencies.append(end - start)
+            self.writes += 1
+            self.frames += len(chunks)
+            if success:
+                self.bytes += len(data)
+            else:
+                self.errors += 1
+                log.log_wp(f"串口发送队列: {msg}")
+            self.max_write_latency = max(self.max_write_latency, end - start)
+            self.max_queue_latency = max(self.max_queue_latency, end - enqueued[0])
+            for _ in chunks:
+                self._queue.task_done()
+
+    def stats(self):
+        """发送统计：write次数、帧数、字节数、失败次数及write耗时/排队时延（秒）"""
+        latencies = list(self.latencies)
+        return {
+            'writes': self.writes,
+            'frames': self.frames,
+            'bytes': self.bytes,
+            'errors': self.errors,
+            'queued': self._queue.qsize(),
+            'avg_write_latency': sum(latencies) / len(latencies) if latencies else 0.0,
+            'max_write_latency': self.max_write_latency,
+            'max_queue_latency': self.max_queue_latency,
+        }
+
+    def reset_stats(self):
+        """清零发送统计"""
+        self.writes = 0
+        self.frames = 0
+        self.bytes = 0
+        self.errors = 0
+        self.max_write_latency = 0.0
+        self.max_queue_latency = 0.0
+        self.latencies.clear()
+
+
+if __name__ == "__main__":
+    # 回环虚拟串口上发送1000个小帧，比较逐帧发送与发送队列合并后的write次数与耗时
+    from serial_bsp import SerialInterface
+    from protocol.gw13762 import create_default_frame
+
+    serial_if = SerialInterface()
+    print(serial_if.open_serial("pty://,115200,N,8,1"))
+    peer = serial_if.virtual
+    frame, _ = create_default_frame(0x15, 1, 1, list(range(32)))
+    count = 1000
+
+    def start_drain(total):
+        """对端设备线程读出全部数据，避免pty缓冲区写满阻塞发送"""
+        def drain():
+            received = 0
+            while received < total:
+                received += len(peer.read(timeout=1))
+        thread = threading.Thread(target=drain)
+        thread.start()
+        return thread
+
+    drainer = start_drain(count * len(frame))
+    start = time.perf_counter()
+    for _ in range(count):
+        serial_if.send_data(' '.join(f"{b:02X}" for b in frame))
+    drainer.join()
+    print(f"逐帧(hex字符串): {count}次write {time.perf_counter() - start:.3f}s")
+
+    tx = SerialTxQueue(serial_if)
+    drainer = start_drain(count * len(frame))
+    start = time.perf_counter()
+    for _ in range(count):
+        tx.send(frame)
+    tx.start()
+    tx.flush()
+    drainer.join()
+    print(f"发送队列: {tx.stats()['writes']}次write {time.perf_counter() - start:.3f}s")
+    print(tx.stats())
+    tx.stop()
+    serial_if.close_serial()
@@ -0,0 +1,274 @@
+import ctypes
+import re
+import time
+from functools import lru_cache
+from multiprocessing import shared_memory
+
+from kfifo import KFifoAps, _roundup_pow_of_two
+
+# 共享内存布局：各计数器独占一个64字节缓存行，之后为数据区
+_SIZE_OFFSET = 0
+_IN_OFFSET = 64
+_OUT_OFFSET = 128
+_WAKEUP_OFFSET = 192
+_DATA_OFFSET = 256
+
+# wait_for轮询退避：先短暂让出CPU，逐步退避到最大间隔
+_POLL_MIN = 0.00005
+_POLL_MAX = 0.001
+
+
+@lru_cache(maxsize=16)
+def _pattern_regex(pattern):
+    """查找用的正则：re可直接在共享内存的memoryview上查找，不拷贝数据"""
+    return re.compile(re.escape(pattern))
+
+
+class ShmKFifoAps:
+    """
+    基于 multiprocessing.shared_memory 的跨进程环形队列，接口与 KFifoAps 一致
+
+    单生产者/单消费者：in计数只由生产者写，out计数只由消费者写，
+    两个计数均为对齐的64位整数，通过ctypes一次性读写，因此无需跨进程锁。
+    跨进程没有条件变量，wait_for()为退避轮询，wakeup()通过共享的唤醒计数打断任一进程中的等待。
+    用法：串口进程创建队列并put，解析进程用 ShmKFifoAps(name=fifo.name, create=False)
+    （或直接把对象传给 multiprocessing.Process）挂接后get。
+    """
+
+    def __init__(self, buffer_size=None, name=None, create=True):
+        """
+        buffer_size: 队列容量（向上取整为2的幂），挂接已有队列时忽略
+        name: 共享内存名称，创建时为None则自动生成
+        create: True创建新队列，False按name挂接已有队列
+        """
+        if create:
+            size = _roundup_pow_of_two(buffer_size if buffer_size else KFifoAps.FIFO_QUEUE_LEN)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=_DATA_OFFSET + size)
+            ctypes.c_uint64.from_buffer(self.shm.buf, _SIZE_OFFSET).value = size
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            size = ctypes.c_uint64.from_buffer(self.shm.buf, _SIZE_OFFSET).value
+
+        self.name = self.shm.name
+        self.size = size
+        self.mask = size - 1
+        self._in = ctypes.c_uint64.from_buffer(self.shm.buf, _IN_OFFSET)
+        self._out = ctypes.c_uint64.from_buffer(self.shm.buf, _OUT_OFFSET)
+        self._wakeups = ctypes.c_uint64.from_buffer(self.shm.buf, _WAKEUP_OFFSET)
+        self.buffer = self.shm.buf[_DATA_OFFSET:_DATA_OFFSET + size]
+
+        # 生产者侧统计（仅统计当前进程的put）
+        self._accepted = 0
+        self._dropped = 0
+        self._high_water = 0
+        self._overflow_events = 0
+
+    def __reduce__(self):
+        """传给子进程时按名称重新挂接"""
+        return self.__class__, (None, self.name, False)
+
+    def close(self):
+        """断开当前进程与共享内存的连接"""
+        if self.shm is None:
+            return
+        # 释放对共享内存的所有引用后才能关闭
+        del self._in, self._out, self._wakeups
+        self.buffer.release()
+        self.shm.close()
+        self.shm = None
+
+    def unlink(self):
+        """销毁共享内存（由创建者在所有进程关闭后调用）"""
+        shared_memory.SharedMemory(name=self.name).unlink()
+
+    def get_data_length(self):
+        """获取队列当前数据长度"""
+        return self._in.value - self._out.value
+
+    @property
+    def length(self):
+        """当前数据长度"""
+        return self._in.value - self._out.value
+
+    def get_remaining_length(self):
+        """获取剩余空间大小"""
+        return self.size - (self._in.value - self._out.value)
+
+    def put(self, data):
+        """
+        写入数据（生产者调用），返回实际写入长度（空间不足时截断）
+        data: bytes/bytearray/memoryview或整数列表
+        """
+        src = KFifoAps._to_buffer(data)
+        if src is None or not len(src):
+            return 0
+
+        src = memoryview(src)
+        in_pos = self._in.value
+        n = min(len(src), self.size - (in_pos - self._out.value))
+        if n < len(src):
+            self._overflow_events += 1
+            self._dropped += len(src) - max(n, 0)
+        if n <= 0:
+            return 0
+
+        off = in_pos & self.mask
+        first = min(n, self.size - off)
+        self.buffer[off:off + first] = src[:first]
+        if n > first:
+            self.buffer[:n - first] = src[first:n]
+        # 数据写完后再发布in计数
+        self._in.value = in_pos + n
+
+        self._accepted += n
+        length = in_pos + n - self._out.value
+        if length > self._high_water:
+            self._high_water = length
+        return n
+
+    def stats(self):
+        """获取统计信息（写入/丢弃字节数、最高水位、溢出次数为当前进程put的统计）"""
+        return {
+            'accepted': self._accepted,
+            'dropped': self._dropped,
+            'high_water': self._high_water,
+            'overflow_events': self._overflow_events,
+            'size': self.size,
+            'length': self.get_data_length(),
+            'policy': 'TRUNCATE',
+        }
+
+    def peek_views(self, length=None):
+        """
+        零拷贝查看队列头部数据，不移动读指针（同KFifoAps.peek_views）
+        返回memoryview片段列表：数据未回绕时1段，回绕时2段，无数据时为空列表，在commit()之前有效
+        """
+        out_pos = self._out.value
+        avail = self._in.value - out_pos
+        n = avail if length is None else min(length, avail)
+        if n <= 0:
+            return []
+        off = out_pos & self.mask
+        first = min(n, self.size - off)
+        if first == n:
+            return [self.buffer[off:off + n]]
+        return [self.buffer[off:], self.buffer[:n - first]]
+
+    def readinto(self, buf, index=0):
+        """把队列数据拷贝到buf（不移动读指针），返回拷贝的字节数"""
+        dst = memoryview(buf)
+        if dst.format != 'B' or dst.ndim != 1:
+            dst = dst.cast('B')
+
+        out_pos = self._out.value
+        n = min(len(dst), self._in.value - out_pos - index)
+        if index < 0 or n <= 0:
+            return 0
+
+        off = (out_pos + index) & self.mask
+        first = min(n, self.size - off)
+        dst[:first] = self.buffer[off:off + first]
+        if n > first:
+            dst[first:n] = self.buffer[:n - first]
+        return n
+
+    def commit(self, length):
+        """确认消费length字节（消费者调用），返回实际消费的字节数"""
+        if length <= 0:
+            return 0
+        out_pos = self._out.value
+        n = min(length, self._in.value - out_pos)
+        self._out.value = out_pos + n
+        return n
+
+    def free(self, length):
+        """释放指定长度的数据"""
+        self.commit(length)
+
+    def read(self, length):
+        """读取数据但不消费，返回字节列表"""
+        buf = bytearray(max(min(length, self.get_data_length()), 0))
+        n = self.readinto(buf)
+        return list(buf[:n])
+
+    def get(self, length, timeout=0):
+        """
+        取出数据（消费者调用），返回字节列表
+        timeout: 队列为空时的等待时间（秒），0不等待，None一直等待
+        """
+        if length <= 0 or not self.wait_for(1, timeout):
+            return []
+        buf = bytearray(min(length, self.get_data_length()))
+        n = self.readinto(buf)
+        self.commit(n)
+        return list(buf[:n])
+
+    def find(self, pattern, start=0):
+        """
+        查找字节或字节串，返回相对于读位置的索引，未找到返回-1
+        直接在共享内存上查找（跨回绕边界时只拼接边界两侧各len(pattern)-1字节）
+        """
+        if isinstance(pattern, int):
+            pattern = bytes((pattern,))
+        plen = len(pattern)
+        avail = self.get_data_length()
+        if start < 0 or start + plen > avail:
+            return -1
+
+        search = _pattern_regex(bytes(pattern)).search
+        off = (self._out.value + start) & self.mask
+        first = min(avail - start, self.size - off)
+        match = search(self.buffer, off, off + first)
+        if match:
+            return start + match.start() - off
+
+        rest = avail - start - first
+        if rest <= 0:
+            return -1
+        if plen > 1:
+            head = min(plen - 1, first)
+            seam = bytes(self.buffer[off + first - head:off + first]) + bytes(self.buffer[:min(plen - 1, rest)])
+            pos = seam.find(pattern)
+            if pos >= 0:
+                return start + first - head + pos
+        match = search(self.buffer, 0, rest)
+        return start + first + match.start() if match else -1
+
+    def discard_until(self, pattern):
+        """丢弃pattern之前的数据，未找到时保留末尾len(pattern)-1字节，返回丢弃的字节数"""
+        plen = 1 if isinstance(pattern, int) else len(pattern)
+        pos = self.find(pattern)
+        if pos < 0:
+            pos = max(self.get_data_length() - (plen - 1), 0)
+        return self.commit(pos)
+
+    def wait_for(self, min_len=1, timeout=None):
+        """
+        等待队列中至少有min_len字节数据
+        跨进程没有条件变量，采用退避轮询（50us起，最大1ms）
+        返回数据是否已满足，被wakeup()打断时返回False
+        """
+        if self.get_data_length() >= min_len:
+            return True
+        if timeout == 0:
+            return False
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delay = _POLL_MIN
+        wakeups = self._wakeups.value
+        while self.get_data_length() < min_len:
+            if self._wakeups.value != wakeups:
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(delay)
+            delay = min(delay * 2, _POLL_MAX)
+        return True
+
+    def wakeup(self):
+        """唤醒所有进程中等待的消费者（如线程退出时），被唤醒的等待在下一次轮询时返回False"""
+        self._wakeups.value += 1
+
+    def __str__(self):
+        """打印队列信息"""
+        return f"ShmKFifoAps(name={self.name}, size={self.size}, length={self.length})"
@@ -0,0 +1,262 @@
+#这个文件提供收发记录视图：固定容量的环形记录（QAbstractListModel）+ 过滤代理 + QListView，
+#替代plainTextEdit_3逐条appendPlainText：内存不随运行时间增长，界面只格式化可见的行，
+#可按方向/AFN/FN/错误过滤，向上滚动查看历史时自动暂停自动滚动
+
+import time
+
+from PyQt6 import QtCore, QtWidgets
+from PyQt6.QtCore import Qt
+
+from protocol.gw13762 import LOCAL_FRAME_LEN_MIN, LOCAL_ADDR_LEN, gw13762_dt_to_fn
+
+# 记录容量，超出后覆盖最旧的记录
+TRAFFIC_LOG_CAPACITY = 100000
+
+# 记录方向
+DIR_RX = "收"
+DIR_TX = "发"
+DIR_LOG = "日志"
+
+# 记录字段下标：(时间time.time(), 方向, AFN, FN, 错误码, 内容bytes或str)
+REC_TIME = 0
+REC_DIR = 1
+REC_AFN = 2
+REC_FN = 3
+REC_ERR = 4
+REC_DATA = 5
+
+# 自定义数据角色：取整条记录
+RecordRole = Qt.ItemDataRole.UserRole + 1
+
+
+def frame_afn_fn(data):
+    """
+    从完整的1376.2帧中取AFN和FN（不做校验）
+    返回: (AFN, FN)，不是完整帧时返回(None, None)
+    """
+    if len(data) < LOCAL_FRAME_LEN_MIN or data[0] != 0x68:
+        return None, None
+    info = data[4]
+    afn_pos = 10
+    if info & 0x04:
+        # 有地址域：源地址 + 中继地址 + 目的地址
+        afn_pos += LOCAL_ADDR_LEN * (2 + (info >> 4))
+    if afn_pos + 2 >= len(data):
+        return None, None
+    return data[afn_pos], gw13762_dt_to_fn(data[afn_pos + 1], data[afn_pos + 2])
+
+
+def make_record(direction, content, err=None, timestamp=None):
+    """
+    生成一条记录
+    content: bytes（帧数据，显示时转为十六进制）或str（文本日志）
+    err: 错误码，None表示无错误
+    """
+    if isinstance(content, (bytes, bytearray)):
+        afn, fn = frame_afn_fn(content)
+        content = bytes(content)
+    else:
+        afn, fn = None, None
+    return (time.time() if timestamp is None else timestamp, direction, afn, fn, err, content)
+
+
+def format_record(record):
+    """记录格式化为显示文本（只对可见的行调用）"""
+    content = record[REC_DATA]
+    if isinstance(content, bytes):
+        content = content.hex(' ').upper()
+    stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record[REC_TIME]))
+    if record[REC_DIR] == DIR_LOG:
+        return f"[{stamp}] {content}"
+    err = f" 错误0x{record[REC_ERR]:02X}" if record[REC_ERR] is not None else ""
+    return f"[{stamp}] [{record[REC_DIR]}]{err} {content}"
+
+
+class TrafficLogModel(QtCore.QAbstractListModel):
+    """固定容量的环形记录模型"""
+
+    def __init__(self, capacity=TRAFFIC_LOG_CAPACITY, parent=None):
+        super().__init__(parent)
+        self.capacity = capacity
+        self._ring = [None] * capacity
+        self._start = 0  # 最旧记录在环中的位置
+        self._count = 0
+        self.total = 0  # 累计追加的记录数（含已被覆盖的）
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else self._count
+
+    def record(self, row):
+        """第row行（0为最旧）的记录"""
+        return self._ring[(self._start + row) % self.capacity]
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._count:
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return format_record(self.record(index.row()))
+        if role == RecordRole:
+            return self.record(index.row())
+        return None
+
+    def append_records(self, records):
+        """批量追加记录，容量不足时先移除最旧的记录"""
+        records = list(records)
+        self.total += len(records)
+        records = records[-self.capacity:]
+        if not records:
+            return
+        overflow = self._count + len(records) - self.capacity
+        if overflow > 0:
+            self.beginRemoveRows(QtCore.QModelIndex(), 0, overflow - 1)
+            self._start = (self._start + overflow) % self.capacity
+            self._count -= overflow
+            self.endRemoveRows()
+
+        first = self._count
+        self.beginInsertRows(QtCore.QModelIndex(), first, first + len(records) - 1)
+        for record in records:
+            self._ring[(self._start + self._count) % self.capacity] = record
+            self._count += 1
+        self.endInsertRows()
+
+    def append(self, direction, content, err=None):
+        """追加一条记录"""
+        self.append_records([make_record(direction, content, err)])
+
+    def append_text(self, text):
+        """追加文本日志（可直接连接到str信号，多行文本按行拆分）"""
+        now = time.time()
+        self.append_records(make_record(DIR_LOG, line, timestamp=now) for line in str(text).split('\n'))
+
+    def append_frames(self, frames):
+        """追加解析结果[(方向, 帧bytes, 错误码或None)]（可直接连接到ParsingThread.frames_parsed）"""
+        now = time.time()
+        self.append_records(make_record(direction, data, err, timestamp=now) for direction, data, err in frames)
+
+    def append_chunks(self, chunks, direction=DIR_RX):
+        """追加原始数据块[(接收时间time.monotonic(), bytes)]（如SerialThread.flush()的返回值）"""
+        offset = time.time() - time.monotonic()
+        self.append_records(make_record(direction, data, timestamp=stamp + offset) for stamp, data in chunks)
+
+    def clear(self):
+        """清空记录"""
+        self.beginResetModel()
+        self._ring = [None] * self.capacity
+        self._start = 0
+        self._count = 0
+        self.endResetModel()
+
+
+class TrafficFilterProxy(QtCore.QSortFilterProxyModel):
+    """按方向/AFN/FN/错误过滤记录"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.directions = None  # 显示的方向集合，None表示全部
+        self.afn = None
+        self.fn = None
+        self.errors_only = False
+
+    def set_filter(self, directions=None, afn=None, fn=None, errors_only=False):
+        """设置过滤条件，参数为None表示不按该项过滤"""
+        self.directions = set(directions) if directions is not None else None
+        self.afn = afn
+        self.fn = fn
+        self.errors_only = errors_only
+        self.invalidateFilter()
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        if self.directions is None and self.afn is None and self.fn is None and not self.errors_only:
+            return True
+        record = self.sourceModel().record(source_row)
+        if self.directions is not None and record[REC_DIR] not in self.directions:
+            return False
+        if self.afn is not None and record[REC_AFN] != self.afn:
+            return False
+        if self.fn is not None and record[REC_FN] != self.fn:
+            return False
+        if self.errors_only and record[REC_ERR] is None:
+            return False
+        return True
+
+
+class TrafficView(QtWidgets.QListView):
+    """收发记录视图：新记录到达时自动滚动到底部，向上滚动后暂停，回到底部后恢复"""
+
+    def __init__(self, model=None, parent=None):
+        super().__init__(parent)
+        self.log_model = model if model is not None else TrafficLogModel(parent=self)
+        self.proxy = TrafficFilterProxy(self)
+        self.proxy.setSourceModel(self.log_model)
+        self.setModel(self.proxy)
+        # 所有行等高：视图不需要逐行计算高度，只绘制可见的行
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QtWidgets.QListView.LayoutMode.Batched)
+        self.setEditTriggers(QtWidgets.QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.ExtendedSelection)
+        self.autoscroll_paused = False
+        self.proxy.rowsInserted.connect(self._on_rows_inserted)
+        self.verticalScrollBar().valueChanged.connect(self._on_scrolled)
+        self.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.customContextMenuRequested.connect(self._show_menu)
+
+    def set_autoscroll_paused(self, paused):
+        """暂停/恢复自动滚动"""
+        self.autoscroll_paused = paused
+        if not paused:
+            self.scrollToBottom()
+
+    def _on_rows_inserted(self, parent, first, last):
+        if not self.autoscroll_paused:
+            self.scrollToBottom()
+
+    def _on_scrolled(self, value):
+        # 用户向上滚动时暂停，滚动回底部时恢复
+        self.autoscroll_paused = value < self.verticalScrollBar().maximum()
+
+    def _show_menu(self, pos):
+        menu = QtWidgets.QMenu(self)
+        pause = menu.addAction("暂停自动滚动")
+        pause.setCheckable(True)
+        pause.setChecked(self.autoscroll_paused)
+        pause.toggled.connect(self.set_autoscroll_paused)
+        errors = menu.addAction("只显示错误")
+        errors.setCheckable(True)
+        errors.setChecked(self.proxy.errors_only)
+        errors.toggled.connect(lambda checked: self.proxy.set_filter(
+            self.proxy.directions, self.proxy.afn, self.proxy.fn, checked))
+        copy = menu.addAction("复制选中")
+        copy.triggered.connect(self.copy_selection)
+        menu.addAction("清空").triggered.connect(self.log_model.clear)
+        menu.exec(self.viewport().mapToGlobal(pos))
+
+    def copy_selection(self):
+        """复制选中的行到剪贴板"""
+        rows = sorted(index.row() for index in self.selectedIndexes())
+        text = '\n'.join(self.proxy.index(row, 0).data() for row in rows)
+        QtWidgets.QApplication.clipboard().setText(text)
+
+
+if __name__ == "__main__":
+    # 写入100万条记录，验证内存不增长、界面保持流畅
+    import sys
+
+    app = QtWidgets.QApplication(sys.argv)
+    view = TrafficView()
+    view.resize(800, 400)
+    view.show()
+    frame = bytes([0x68, 0x0F, 0x00, 0x43, 0, 0, 0, 0, 0, 1, 0x03, 0x01, 0x00, 0x48, 0x16])
+    sent = [0]
+
+    def feed():
+        view.log_model.append_records(make_record(DIR_RX, frame) for _ in range(1000))
+        sent[0] += 1000
+        view.setWindowTitle(f"已写入{sent[0]}条，当前保留{view.log_model.rowCount()}条")
+        if sent[0] >= 1000000:
+            timer.stop()
+
+    timer = QtCore.QTimer()
+    timer.timeout.connect(feed)
+    timer.start(10)
+    sys.exit(app.exec())
@@ -0,0 +1,297 @@
+#这个文件提供多串口并行升级：每个串口一个独立会话（串口、接收fifo、解析、升级状态），
+#所有会话运行在同一个asyncio事件循环中（serial_async按文件描述符驱动），32个以上串口也不需要额外线程
+#命令行用法：python upgrade_manager.py 文件1 文件2 --port /dev/ttyUSB0,9600,E,8,1 --port /dev/ttyUSB1,9600,E,8,1
+#serial_async依赖串口文件描述符，只支持Linux等POSIX平台，Windows下直接报错退出
+
+import argparse
+import asyncio
+import math
+import os
+import time
+
+import log
+from kfifo import KFifoAps
+from serial_bsp import SerialInterface
+from serial_async import AsyncSerial
+from comport.parse_process import load_complete_frame
+from protocol.gw13762 import (
+    SApsAffair, gw13762_check, create_default_frame, create_default_template, gw13762_file_segment,
+    AFN_FILE_TRANSFER, FILE_ID_LOCAL_MODULE, ErrorCode,
+)
+
+# 默认升级参数
+DEFAULT_FRAME_LENGTH = 512  # 每段文件数据长度
+DEFAULT_TIMEOUT = 3.0  # 每段等待应答的超时（秒）
+DEFAULT_RETRIES = 3  # 每段最大重发次数
+RESPONSE_DIR = 1  # 应答帧的预期方向，与解析线程一致
+
+# AFN=00H 确认/否认
+AFN_CONFIRM = 0x00
+FN_CONFIRM = 1
+FN_DENY = 2
+
+# 会话状态
+STATE_IDLE = "空闲"
+STATE_RUNNING = "升级中"
+STATE_DONE = "完成"
+STATE_FAILED = "失败"
+
+
+class UpgradePlan:
+    """升级计划：依次下发的升级文件及分段参数，所有串口共用"""
+
+    def __init__(self, file_paths, frame_length=DEFAULT_FRAME_LENGTH, rounds=1,
+                 file_id=FILE_ID_LOCAL_MODULE, timeout=DEFAULT_TIMEOUT, retries=DEFAULT_RETRIES):
+        self.files = []  # [(文件路径, 文件内容)]
+        for path in file_paths:
+            with open(path, "rb") as f:
+                self.files.append((path, f.read()))
+        self.frame_length = frame_length
+        self.rounds = rounds
+        self.file_id = file_id
+        self.timeout = timeout
+        self.retries = retries
+        # 各文件分段后的数据域及其校验和，所有串口、轮次、重发共用，构帧时只需拷贝
+        self.segments = [self._split(data) for _, data in self.files]
+
+    def _split(self, data):
+        """返回[(段数据长度, 数据域bytes, 数据域字节和的低8位)]"""
+        total_segments = max(math.ceil(len(data) / self.frame_length), 1)
+        segments = []
+        for index in range(total_segments):
+            segment = data[index * self.frame_length:(index + 1) * self.frame_length]
+            payload = gw13762_file_segment(self.file_id, total_segments, index, segment)
+            segments.append((len(segment), payload, sum(payload) & 0xFF))
+        return segments
+
+    def total_bytes(self):
+        """一个串口需要下发的文件总字节数"""
+        return sum(len(data) for _, data in self.files) * self.rounds
+
+
+class PortSession:
+    """单个串口的升级会话"""
+
+    def __init__(self, config_str):
+        self.config_str = config_str
+        self.serial_if = SerialInterface()
+        self.fifo = KFifoAps()  # 接收数据缓存，只在事件循环中访问，无需同步模式
+        self.affair = SApsAffair()
+        self.template = create_default_template(AFN_FILE_TRANSFER, 1)  # 升级帧模板，只在本会话中使用
+        self.aser = None
+        self.frames = None  # 已校验的应答帧队列：(AFN, FN, 数据域bytes)
+        self._reader = None
+        self.serial_num = 0
+
+        # 升级状态与统计
+        self.state = STATE_IDLE
+        self.message = ""
+        self.current_file = ""
+        self.segment = 0
+        self.total_segments = 0
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.retries = 0
+        self.start_time = None
+        self.end_time = None
+
+    async def open(self):
+        """打开串口并开始接收"""
+        success, msg = self.serial_if.open_serial(self.config_str)
+        if not success:
+            raise OSError(msg)
+        self.frames = asyncio.Queue()
+        self.aser = await AsyncSerial(self.serial_if).start()
+        self._reader = asyncio.get_running_loop().create_task(self._read_loop())
+
+    async def close(self):
+        """停止接收并关闭串口"""
+        if self.aser is not None:
+            self.aser.close()
+            try:
+                await self._reader
+            except Exception as e:
+                # 接收任务的异常不影响关闭串口
+                log.log_wp(f"[{self.config_str}] 接收任务异常: {e}")
+            self.aser = None
+        self.serial_if.close_serial()
+
+    async def _read_loop(self):
+        """接收数据块，按帧解析后放入应答队列"""
+        async for chunk in self.aser:
+            self.fifo.put(chunk)
+            while load_complete_frame(self.fifo, self.affair):
+                success, err = gw13762_check(self.affair, RESPONSE_DIR)
+                if not success:
+                    log.log_wp(f"[{self.config_str}] 应答帧校验失败: 错误码=0x{err:02X}")
+                    continue
+                frame = self.affair.p_src.local.frame
+                self.frames.put_nowait((frame.afn, frame.fn, bytes(frame.buff[:frame.bufflen])))
+
+    def _next_serial_num(self):
+        self.serial_num = (self.serial_num + 1) & 0xFF
+        return self.serial_num
+
+    async def request(self, afn, fn, data, match, timeout):
+        """
+        发送一帧并等待匹配的应答
+        match: 判断应答的函数 match(afn, fn, data) -> True确认 / False否认 / None不相关
+        返回: 是否收到确认应答
+        """
+        frame, err = create_default_frame(afn, fn, self._next_serial_num(), data)
+        if err != ErrorCode.FN_ACK_FFH:
+            raise ValueError(f"构帧失败，错误码: 0x{err:02X}")
+        return await self.send_request(frame, match, timeout)
+
+    async def send_request(self, frame, match, timeout):
+        """发送已构建的帧并等待匹配的应答，参数和返回值同request()"""
+        # 丢弃上一次请求残留的应答
+        while not self.frames.empty():
+            self.frames.get_nowait()
+        await self.aser.send(frame)
+        self.frames_sent += 1
+
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                result = match(*await asyncio.wait_for(self.frames.get(), remaining))
+            except asyncio.TimeoutError:
+                return False
+            if result is not None:
+                return result
+
+    async def upgrade_file(self, path, segments, plan):
+        """按AFN=15H F1分段下发一个升级文件（segments为UpgradePlan分好的段），每段等待应答，超时或否认时重发"""
+        self.current_file = path
+        self.total_segments = len(segments)
+        for index, (segment_len, payload, payload_sum) in enumerate(segments):
+            self.segment = index
+
+            def match(afn, fn, rsp, index=index):
+                if afn == AFN_FILE_TRANSFER and fn == 1 and len(rsp) >= 4:
+                    return int.from_bytes(rsp[:4], 'little') == index or None
+                if afn == AFN_CONFIRM:
+                    return fn == FN_CONFIRM
+                return None
+
+            for attempt in range(plan.retries + 1):
+                if attempt:
+                    self.retries += 1
+                # 每次发送（含重发）使用新的帧序号，send_request返回前帧已写完，模板缓冲区可复用
+                frame, err = self.template.build(self._next_serial_num(), payload, payload_sum)
+                if err != ErrorCode.FN_ACK_FFH:
+                    raise ValueError(f"构帧失败，错误码: 0x{err:02X}")
+                if await self.send_request(frame, match, plan.timeout):
+                    break
+            else:
+                raise TimeoutError(f"第{index}段无应答（已重发{plan.retries}次）")
+            self.bytes_sent += segment_len
+
+    async def run(self, plan):
+        """执行升级计划，异常只影响本串口"""
+        self.state = STATE_RUNNING
+        self.start_time = time.monotonic()
+        try:
+            await self.open()
+            for _ in range(plan.rounds):
+                for (path, _), segments in zip(plan.files, plan.segments):
+                    await self.upgrade_file(path, segments, plan)
+            self.state = STATE_DONE
+        except Exception as e:
+            self.state = STATE_FAILED
+            self.message = str(e)
+            log.log_wp(f"[{self.config_str}] 升级失败: {e}")
+        finally:
+            self.end_time = time.monotonic()
+            await self.close()
+
+    def report(self):
+        """本串口的升级统计"""
+        end = self.end_time if self.end_time is not None else time.monotonic()
+        elapsed = end - self.start_time if self.start_time is not None else 0.0
+        return {
+            'port': self.config_str,
+            'state': self.state,
+            'message': self.message,
+            'file': self.current_file,
+            'segment': self.segment,
+            'total_segments': self.total_segments,
+            'bytes_sent': self.bytes_sent,
+            'frames_sent': self.frames_sent,
+            'retries': self.retries,
+            'elapsed': elapsed,
+            'throughput': self.bytes_sent / elapsed if elapsed > 0 else 0.0,
+        }
+
+
+class UpgradeManager:
+    """多串口升级管理：所有会话并发执行同一个升级计划"""
+
+    def __init__(self, port_configs=()):
+        self.sessions = [PortSession(config_str) for config_str in port_configs]
+        self.start_time = None
+        self.end_time = None
+
+    def add_port(self, config_str):
+        """增加一个串口会话"""
+        session = PortSession(config_str)
+        self.sessions.append(session)
+        return session
+
+    async def run(self, plan):
+        """并发执行升级计划，返回report()"""
+        self.start_time = time.monotonic()
+        await asyncio.gather(*(session.run(plan) for session in self.sessions))
+        self.end_time = time.monotonic()
+        return self.report()
+
+    def run_sync(self, plan):
+        """在新的事件循环中执行升级计划（供线程或命令行调用）"""
+        return asyncio.run(self.run(plan))
+
+    def report(self):
+        """各串口及汇总的升级统计"""
+        ports = [session.report() for session in self.sessions]
+        end = self.end_time if self.end_time is not None else time.monotonic()
+        elapsed = end - self.start_time if self.start_time is not None else 0.0
+        total_bytes = sum(port['bytes_sent'] for port in ports)
+        return {
+            'ports': ports,
+            'total': {
+                'ports': len(ports),
+                'done': sum(port['state'] == STATE_DONE for port in ports),
+                'failed': sum(port['state'] == STATE_FAILED for port in ports),
+                'bytes_sent': total_bytes,
+                'elapsed': elapsed,
+                'throughput': total_bytes / elapsed if elapsed > 0 else 0.0,
+            },
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多串口并行升级（仅支持Linux等POSIX平台）")
+    parser.add_argument("files", nargs="+", help="升级文件（按顺序下发）")
+    parser.add_argument("--port", action="append", required=True, help="串口配置，如/dev/ttyUSB0,9600,E,8,1，可重复")
+    parser.add_argument("--frame-length", type=int, default=DEFAULT_FRAME_LENGTH, help="每段文件数据长度")
+    parser.add_argument("--rounds", type=int, default=1, help="测试轮次")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="每段应答超时（秒）")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES, help="每段最大重发次数")
+    args = parser.parse_args()
+    if os.name != "posix":
+        parser.error("serial_async需要串口文件描述符，多串口并行升级只支持Linux等POSIX平台")
+
+    plan = UpgradePlan(args.files, args.frame_length, args.rounds, timeout=args.timeout, retries=args.retries)
+    report = UpgradeManager(args.port).run_sync(plan)
+    for port in report['ports']:
+        print(f"{port['port']}: {port['state']} {port['bytes_sent']}字节 {port['frames_sent']}帧 "
+              f"重发{port['retries']}次 {port['elapsed']:.1f}s {port['throughput']:.0f}B/s {port['message']}")
+    total = report['total']
+    print(f"汇总: {total['done']}/{total['ports']}完成 {total['bytes_sent']}字节 "
+          f"{total['elapsed']:.1f}s {total['throughput']:.0f}B/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#这个文件提供虚拟串口：基于Linux伪终端(pty)对，没有真实串口时也能端到端驱动SerialThread、解析线程和升级流程
+#SerialInterface.open_serial 的端口名可写为：
+#   pty://          伪终端对，slave端作为串口，master端（VirtualPort.write/read）模拟对端设备
+#   loop://         回环，串口发送的数据原样回到串口接收
+#   末尾加 ?emulate 按配置的波特率限速（如 loop://?emulate,9600,E,8,1），否则以内存速度传输
+
+import os
+import select
+import threading
+import time
+
+PTY_SCHEME = "pty"
+LOOP_SCHEME = "loop"
+OPTION_EMULATE = "emulate"  # 按波特率限速
+
+# 单次读写的最大字节数
+READ_CHUNK_SIZE = 4096
+# 限速时每次写入约10ms的数据量，避免一次写入大块数据后长时间休眠
+EMULATE_SLICE = 0.01
+
+
+def is_virtual_port(port):
+    """端口名是否为虚拟串口（pty:// 或 loop://）"""
+    scheme, sep, _ = port.partition("://")
+    return bool(sep) and scheme in (PTY_SCHEME, LOOP_SCHEME)
+
+
+class VirtualPort:
+    """
+    pty伪终端对
+    device: slave端设备路径，交给serial.Serial按普通串口打开
+    write()/read(): master端，即串口的对端设备
+    """
+
+    def __init__(self, url, baudrate=9600, bits_per_char=10):
+        """
+        url: pty://[?emulate] 或 loop://[?emulate]
+        baudrate, bits_per_char: 限速时每个字符的传输时间 = bits_per_char / baudrate
+        """
+        if not hasattr(os, "openpty"):
+            raise OSError("当前平台不支持虚拟串口（需要pty）")
+
+        scheme, _, rest = url.partition("://")
+        if scheme not in (PTY_SCHEME, LOOP_SCHEME):
+            raise ValueError(f"不支持的虚拟串口: {url}")
+        options = rest.partition("?")[2].split("&")
+
+        self.scheme = scheme
+        self.emulate = OPTION_EMULATE in options
+        self.char_time = bits_per_char / baudrate
+        self.master_fd, self.slave_fd = os.openpty()
+        # master端非阻塞：串口不读取、pty缓冲区满时写入在select中等待，可被close()唤醒
+        os.set_blocking(self.master_fd, False)
+        # 保持slave端打开：串口关闭/重新打开期间master端读取不会出错
+        self.device = os.ttyname(self.slave_fd)
+        # close()写入_wake_w，唤醒在select中等待的读写（回环线程、对端设备的read/write）
+        self._wake_r, self._wake_w = os.pipe()
+        self.closed = False
+        self._next_time = 0.0  # 限速：下一个字节最早的发送时间
+        self._loop_thread = None
+        if scheme == LOOP_SCHEME:
+            self._loop_thread = threading.Thread(target=self._loop_run, daemon=True)
+            self._loop_thread.start()
+
+    def fileno(self):
+        """master端文件描述符（可用于select/asyncio）"""
+        return self.master_fd
+
+    def write(self, data):
+        """
+        对端设备发送数据到串口
+        data: bytes/bytearray或整数列表
+        返回写入的字节数
+        """
+        view = memoryview(bytes(data) if isinstance(data, list) else data).cast("B")
+        total = len(view)
+        if self.emulate:
+            # 按波特率分片写入，每片写入前等待上一片在线路上"传输"完成
+            slice_len = max(int(EMULATE_SLICE / self.char_time), 1)
+            while view and not self.closed:
+                delay = self._next_time - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                n = self._write_all(view[:slice_len])
+                self._next_time = max(self._next_time, time.monotonic()) + n * self.char_time
+                view = view[n:]
+        else:
+            self._write_all(view)
+        return total
+
+    def _write_all(self, view):
+        """写入全部数据（pty缓冲区满时等待可写），返回写入的字节数，关闭时未写入的数据丢弃"""
+        total = len(view)
+        while view and not self.closed:
+            try:
+                view = view[os.write(self.master_fd, view):]
+            except BlockingIOError:
+                select.select([self._wake_r], [self.master_fd], [])
+        return total - len(view)
+
+    def read(self, max_bytes=READ_CHUNK_SIZE, timeout=None):
+        """
+        读取串口发送给对端设备的数据
+        timeout: 超时时间（秒），None一直等待
+        返回bytes，超时或已关闭返回b''
+        """
+        readable, _, _ = select.select([self.master_fd, self._wake_r], [], [], timeout)
+        if self.master_fd not in readable or self.closed:
+            return b""
+        try:
+            return os.read(self.master_fd, max_bytes)
+        except OSError:
+            return b""
+
+    def _loop_run(self):
+        """回环线程：把串口发送的数据写回串口接收"""
+        while not self.closed:
+            data = self.read()
+            if data and not self.closed:
+                self.write(data)
+
+    def close(self):
+        """关闭伪终端对"""
+        if self.closed:
+            return
+        self.closed = True
+        os.write(self._wake_w, b"\0")
+        # 回环线程退出后才关闭文件描述符，避免线程使用已关闭（或被重新分配）的文件描述符
+        if self._loop_thread is not None:
+            self._loop_thread.join()
+        os.close(self.master_fd)
+        os.close(self.slave_fd)
+        os.close(self._wake_r)
+        os.close(self._wake_w)
+
+
+if __name__ == "__main__":
+    # 回环吞吐量测试：不限速 / 按115200波特率限速
+    from serial_bsp import SerialInterface
+
+    for config_str in ("loop://,115200,N,8,1", "loop://?emulate,115200,N,8,1"):
+        serial_if = SerialInterface()
+        print(serial_if.open_serial(config_str))
+        payload = bytes(range(256)) * 64
+        start = time.perf_counter()
+        serial_if.ser.write(payload)
+        received = 0
+        while received < len(payload):
+            success, data = serial_if.read_data(READ_CHUNK_SIZE)
+            received += len(data) if success else 0
+        elapsed = time.perf_counter() - start
+        print(f"{config_str}: {received}字节 {elapsed:.3f}s {received / elapsed:.0f}B/s")
+        serial_if.close_serial()